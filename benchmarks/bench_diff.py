@@ -0,0 +1,48 @@
+"""
+Time diffing two consecutive synthetic filings of the same filer, as lists of
+holdings and as HoldingsTables.
+
+    $ python -m benchmarks.bench_diff [rows]
+"""
+import sys
+import random
+import timeit
+
+from holdings import diff
+from holdings.dto import base
+
+def make_filings(count, seed=13):
+    """
+    Return two quarters of `count` holdings where roughly 5% of positions
+    are closed, 5% are new and the rest changed size.
+    """
+    rng = random.Random(seed)
+    old = [base.Holding('ISSUER %06d CORP' % i,
+                        rng.randrange(1, 10 ** 7),
+                        rng.randrange(1, 10 ** 6))
+           for i in range(count)]
+    new = [base.Holding('ISSUER %06d CORP' % i,
+                        rng.randrange(1, 10 ** 7),
+                        rng.randrange(1, 10 ** 6))
+           for i in range(count // 20, count + count // 20)]
+    return old, new
+
+def main(count=50000, repeat=5):
+    old, new = make_filings(count)
+    old_table = base.HoldingsTable.from_holdings(old)
+    new_table = base.HoldingsTable.from_holdings(new)
+
+    results = [('lists', min(timeit.repeat(lambda: diff.diff_holdings(old, new),
+                                           number=1, repeat=repeat))),
+               ('tables', min(timeit.repeat(lambda: diff.diff_holdings(old_table, new_table),
+                                            number=1, repeat=repeat)))]
+
+    print('{count:,}-row filings'.format(count=count))
+    for name, seconds in results:
+        print('  {name:<8} {ms:8.1f} ms'.format(name=name, ms=seconds * 1000))
+
+    return results
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
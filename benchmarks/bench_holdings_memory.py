@@ -0,0 +1,57 @@
+"""
+Compare the memory held by a large number of holdings in each representation:
+the original dict-backed Holding, the slotted Holding, and a HoldingsTable.
+
+    $ python -m benchmarks.bench_holdings_memory [rows]
+"""
+import sys
+import tracemalloc
+
+from holdings.dto import base
+
+class DictHolding():
+    """The original Holding layout, with a per-instance __dict__."""
+
+    def __init__(self, entity, shares, value):
+        self.entity = entity
+        self.shares = shares
+        self.value  = value
+
+def _rows(count):
+    # Issuers repeat across filings, so reuse a realistic number of names
+    for i in range(count):
+        yield ('ISSUER NUMBER %d' % (i % 5000), 1000 + i * 7, 50 + i * 3)
+
+def measure(build, count):
+    """Return the bytes still allocated after build() made `count` rows."""
+    tracemalloc.start()
+    result = build(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def build_dict_holdings(count):
+    return [DictHolding(*row) for row in _rows(count)]
+
+def build_slotted_holdings(count):
+    return [base.Holding(*row) for row in _rows(count)]
+
+def build_table(count):
+    return base.HoldingsTable.from_holdings(base.Holding(*row) for row in _rows(count))
+
+def main(count=200000):
+    results = [('dict Holding', measure(build_dict_holdings, count)),
+               ('slotted Holding', measure(build_slotted_holdings, count)),
+               ('HoldingsTable', measure(build_table, count))]
+
+    print('{count:,} holdings'.format(count=count))
+    for name, size in results:
+        print('  {name:<16} {mb:8.1f} MB  {per_row:6.1f} B/row'.format(
+            name=name, mb=size / 1024 ** 2, per_row=size / count))
+
+    return results
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
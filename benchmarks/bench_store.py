@@ -0,0 +1,79 @@
+"""
+Time loading synthetic 13F-HR filings into a HoldingsStore, then looking up
+the holders of an issuer by CUSIP and by name and the holdings of a filer.
+
+    $ python -m benchmarks.bench_store [filers] [rows]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import timeit
+import tempfile
+import datetime
+
+from holdings import store
+from holdings.dto import report13fhr
+
+ISSUERS = 20000
+
+class _Report():
+    """The attributes of a Report13FHR that HoldingsStore.load_report reads"""
+
+    submission_type = '13F-HR'
+
+    def __init__(self, cik, accepted_date, holdings):
+        self.cik           = cik
+        self.accepted_date = accepted_date
+        self.holdings      = holdings
+
+def make_reports(filers, count, seed=13):
+    """
+    Yield a filing of `count` holdings for each of `filers` filers, drawn
+    from a universe of ISSUERS issuers.
+    """
+    rng  = random.Random(seed)
+    date = datetime.date(2016, 11, 15)
+
+    for cik in range(1, filers + 1):
+        holdings = report13fhr.Holdings13FTable()
+        for issuer in rng.sample(range(ISSUERS), min(count, ISSUERS)):
+            holdings.append(report13fhr.Holding13F('ISSUER %06d CORP' % issuer,
+                                                   rng.randrange(1, 10 ** 7),
+                                                   rng.randrange(1, 10 ** 6),
+                                                   cusip='%08d0' % issuer))
+        yield _Report(str(cik), date, holdings)
+
+def main(filers=200, count=2000, repeat=20):
+    directory = tempfile.mkdtemp()
+    holdings  = store.HoldingsStore(os.path.join(directory, 'holdings.db'))
+
+    try:
+        start = time.perf_counter()
+        for report in make_reports(filers, count):
+            holdings.load_report(report)
+        loading = time.perf_counter() - start
+
+        results = [('load', loading),
+                   ('cusip', min(timeit.repeat(lambda: holdings.holders('000012340'),
+                                               number=1, repeat=repeat))),
+                   ('name', min(timeit.repeat(lambda: holdings.holders('Issuer 001234 Corp'),
+                                              number=1, repeat=repeat))),
+                   ('filer', min(timeit.repeat(lambda: holdings.filer_holdings(str(filers // 2)),
+                                               number=1, repeat=repeat)))]
+
+        print('{filers:,} filers, {rows:,} holdings'.format(filers=filers,
+                                                          rows=holdings.counts()[1]))
+        for name, seconds in results:
+            print('  {name:<8} {ms:10.2f} ms'.format(name=name, ms=seconds * 1000))
+    finally:
+        holdings.close()
+        shutil.rmtree(directory)
+
+    return results
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
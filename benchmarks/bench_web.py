@@ -0,0 +1,65 @@
+"""
+Throughput of the batch runner against a local mock EDGAR with injected
+latency, for a range of worker counts, and how many CIKs still succeed when
+the server throttles and cuts responses short. Nothing is sent to sec.gov.
+
+    $ python -m benchmarks.bench_web [copies] [latency]
+"""
+import os
+import sys
+import shutil
+import tempfile
+from unittest import mock
+
+from holdings import web
+from holdings import batch
+from holdings import mock_edgar
+
+def run(edgar, ciks, workers, rate):
+    """Return the BatchSummary of a batch over ciks against edgar."""
+    web.use_edgar(edgar.url)
+    try:
+        with mock.patch.object(web, 'rate_limiter', web.RateLimiter(rate, burst=workers)), \
+             mock.patch.object(web, 'BACKOFF', 0.01):
+            return batch.run_batch(ciks, workers=workers)
+    finally:
+        web.use_edgar()
+
+def main(copies=20, latency=0.05, rate=1000):
+    cwd       = os.getcwd()
+    directory = tempfile.mkdtemp()
+    os.makedirs(os.path.join(directory, 'reports'))
+    os.chdir(directory)
+
+    try:
+        print('{count} CIKs, {latency:.0f} ms latency per request'.format(
+            count=2 * (copies + 1), latency=latency * 1000))
+
+        edgar = mock_edgar.MockEdgar(latency=latency)
+        ciks  = mock_edgar.load_fixtures(edgar, copies)
+        edgar.start()
+        for workers in (1, 4, 16):
+            summary = run(edgar, ciks, workers, rate)
+            print('  {workers:>2} workers {rate:8.2f} CIKs/s'.format(
+                workers=workers, rate=summary.throughput))
+        edgar.stop()
+
+        edgar = mock_edgar.MockEdgar(latency=latency, throttle=0.1, truncate=0.05, seed=1)
+        ciks  = mock_edgar.load_fixtures(edgar, copies)
+        edgar.start()
+        summary = run(edgar, ciks, 16, rate)
+        edgar.stop()
+        print('  with 10% throttled and 5% truncated responses: {rate:.2f} CIKs/s, '
+              '{ok} succeeded, {failed} failed, {requests} requests'.format(
+                  rate=summary.throughput,
+                  ok=len(summary.succeeded),
+                  failed=len(summary.failed),
+                  requests=edgar.stats['requests']))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.05)
@@ -0,0 +1,274 @@
+"""
+Offline benchmark suite over the fixtures in resources/, and synthetic
+versions of them with every holding repeated 10x to 1000x. Times the 13F-HR
+and N-Q parsers and the report writers, reporting throughput and peak
+memory, and compares the results to the stored baselines so that a
+slowdown fails loudly.
+
+    $ python -m benchmarks.suite              # run and compare to baselines
+    $ python -m benchmarks.suite --save       # record new baselines
+    $ python -m benchmarks.suite --scales 1,10 --max-mb 256
+
+Timings are normalized by a fixed pure Python workload timed alongside, so
+baselines recorded on one machine stay meaningful on a faster or slower one.
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import timeit
+import argparse
+import tempfile
+import tracemalloc
+
+from holdings.dto import reportnq
+from holdings.dto import report13fhr
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'resources')
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+SCALES = (1, 10, 100, 1000)
+
+# A case slower than its baseline by more than this fraction, after
+# normalizing for the machine, or using more memory than this fraction
+# over its baseline, is a regression
+TIME_TOLERANCE   = 0.5
+MEMORY_TOLERANCE = 0.25
+
+# Timer noise on sub-millisecond cases is larger than any tolerance
+TIME_SLACK = 0.001
+
+_INFO_TABLE_START = re.compile(r'<(\w+:)?infoTable>')
+_INFO_TABLE_END   = re.compile(r'</(\w+:)?informationTable>')
+
+class Case():
+    """One benchmark: a function run on an input prepared beforehand."""
+
+    def __init__(self, name, scale, rows, size, run):
+        self.name  = name
+        self.scale = scale
+        self.rows  = rows
+        self.size  = size
+        self.run   = run
+
+    @property
+    def key(self):
+        return '{name}@{scale}x'.format(name=self.name, scale=self.scale)
+
+def _read(name):
+    with open(os.path.join(RESOURCES, name), 'r') as fixture:
+        return fixture.read()
+
+def scale_13f_submission(text, scale):
+    """Repeat every infoTable of a 13F-HR complete submission `scale` times."""
+    start = _INFO_TABLE_START.search(text).start()
+    end   = _INFO_TABLE_END.search(text, start).start()
+    return text[:start] + text[start:end] * scale + text[end:]
+
+def scale_nq_submission(text, scale):
+    """Repeat the html tables of an N-Q complete submission `scale` times."""
+    html  = text.find('<HTML>')
+    start = text.find('<TABLE', html)
+    end   = text.rfind('</TABLE>', html, text.find('</HTML>', html)) + len('</TABLE>')
+    return text[:start] + text[start:end] * scale + text[end:]
+
+def _write_report(report, fmt):
+    # Overwriting a file that was just written can flush it to disk first on
+    # some filesystems, so write each report to a new file as a real run does
+    for name in os.listdir('reports'):
+        os.remove(os.path.join('reports', name))
+    return report.generate_report(fmt)
+
+def _nq_rows(report):
+    # Series reporting the same schedule share one list of holdings
+    return sum(len(holdings) for holdings
+               in {id(series.holdings): series.holdings for series in report.series}.values())
+
+def build_cases(scales, max_mb):
+    """
+    Return the benchmark cases for each scale whose input fits in max_mb.
+    The writer cases write under reports/ in the working directory.
+    """
+    gates    = _read('gates_fund_complete_text_submission.txt')
+    vanguard = _read('vanguard_complete_text_submission.txt')
+    cases    = []
+
+    for scale in scales:
+        text = scale_13f_submission(gates, scale)
+        if len(text) <= max_mb * 2 ** 20:
+            accepted_date, submission_type, holdings_xml = report13fhr.get_13f_xml(text)
+            report = report13fhr.get_13f_holdings('0001418814', accepted_date,
+                                                  submission_type, holdings_xml)
+            rows   = len(report.holdings)
+            cases += [
+                Case('get_13f_xml', scale, rows, len(text),
+                     lambda text=text: report13fhr.get_13f_xml(text)),
+                Case('get_13f_holdings', scale, rows, len(holdings_xml),
+                     lambda xml=holdings_xml, date=accepted_date, form=submission_type:
+                         report13fhr.get_13f_holdings('0001418814', date, form, xml)),
+                Case('read_13f_report', scale, rows, len(text),
+                     lambda text=text: report13fhr.read_13f_report('0001418814', [text])),
+                Case('13fhr_report_tsv', scale, rows, len(holdings_xml),
+                     lambda report=report: _write_report(report, 'tsv')),
+                Case('13fhr_report_columnar', scale, rows, len(holdings_xml),
+                     lambda report=report: _write_report(report, 'columnar')),
+            ]
+
+        text = scale_nq_submission(vanguard, scale)
+        if len(text) <= max_mb * 2 ** 20:
+            report = reportnq.get_nq_report(text)
+            rows   = _nq_rows(report)
+            html   = text[text.find('<HTML>'):text.find('</HTML>') + len('</HTML>')]
+            cases += [
+                Case('get_nq_report', scale, rows, len(text),
+                     lambda text=text: reportnq.get_nq_report(text)),
+                Case('parse_nq_report_html', scale, rows, len(html),
+                     lambda html=html: reportnq.parse_nq_report_html(html)),
+                Case('read_nq_report', scale, rows, len(text),
+                     lambda text=text: reportnq.read_nq_report([text])),
+                Case('nq_report_tsv', scale, rows, len(html),
+                     lambda report=report: _write_report(report, 'tsv')),
+                Case('nq_report_columnar', scale, rows, len(html),
+                     lambda report=report: _write_report(report, 'columnar')),
+            ]
+            # A full BeautifulSoup tree is too slow and large beyond the fixture
+            if scale == 1:
+                cases.append(Case('parse_nq_report_html_soup', scale, rows, len(html),
+                                  lambda html=html: reportnq.parse_nq_report_html(html, 'soup')))
+
+    return cases
+
+def calibrate(repeat=5):
+    """Time a fixed pure Python workload, the yardstick for this machine."""
+    return min(timeit.repeat(lambda: sorted(str(i) for i in range(200000)),
+                             number=1, repeat=repeat))
+
+def measure(case, repeat):
+    """Return the best of `repeat` timings of a case and its peak memory."""
+    seconds = min(timeit.repeat(case.run, number=1, repeat=repeat))
+
+    tracemalloc.start()
+    case.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'rows':       case.rows,
+            'bytes':      case.size,
+            'seconds':    seconds,
+            'peak_bytes': peak}
+
+def compare(results, baselines, time_tolerance=TIME_TOLERANCE,
+            memory_tolerance=MEMORY_TOLERANCE):
+    """
+    Given the results of a run and the stored baselines, return a list of
+    messages describing each case that regressed. Cases without a baseline
+    are not compared.
+    """
+    ratio       = results['calibration'] / baselines['calibration']
+    regressions = []
+
+    for key, result in results['cases'].items():
+        baseline = baselines['cases'].get(key)
+        if baseline is None:
+            continue
+
+        allowed = baseline['seconds'] * ratio * (1 + time_tolerance) + TIME_SLACK
+        if result['seconds'] > allowed:
+            regressions.append('{key}: {seconds:.4f}s, baseline {baseline:.4f}s '
+                               '(allowed {allowed:.4f}s on this machine)'.format(
+                                   key=key,
+                                   seconds=result['seconds'],
+                                   baseline=baseline['seconds'],
+                                   allowed=allowed))
+
+        allowed = baseline['peak_bytes'] * (1 + memory_tolerance)
+        if result['peak_bytes'] > allowed:
+            regressions.append('{key}: peak {peak:,} bytes, baseline {baseline:,} bytes'.format(
+                key=key,
+                peak=result['peak_bytes'],
+                baseline=baseline['peak_bytes']))
+
+    return regressions
+
+def load_baselines(path=BASELINES):
+    try:
+        with open(path, 'r') as baselines:
+            return json.load(baselines)
+    except FileNotFoundError:
+        return None
+
+def save_baselines(results, path=BASELINES):
+    with open(path, 'w') as baselines:
+        json.dump(results, baselines, indent=1, sort_keys=True)
+        baselines.write('\n')
+
+def run(scales=SCALES, max_mb=64, repeat=3):
+    """Run every case and return the results, keyed by case@scale."""
+    directory = tempfile.mkdtemp()
+    cwd       = os.getcwd()
+    results   = {'calibration': calibrate(), 'cases': {}}
+
+    # The report writers write under reports/ in the working directory
+    os.makedirs(os.path.join(directory, 'reports'))
+    os.chdir(directory)
+    try:
+        for case in build_cases(scales, max_mb):
+            result = measure(case, repeat)
+            results['cases'][case.key] = result
+            print('  {key:<34} {rows:>10,} rows {ms:10.1f} ms {rate:12,.0f} rows/s '
+                  '{mbs:8.1f} MB/s {peak:8.1f} MB peak'.format(
+                      key=case.key,
+                      rows=result['rows'],
+                      ms=result['seconds'] * 1000,
+                      rate=result['rows'] / result['seconds'],
+                      mbs=result['bytes'] / result['seconds'] / 2 ** 20,
+                      peak=result['peak_bytes'] / 2 ** 20))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in SCALES),
+                        help='comma-separated row multipliers (default: 1,10,100,1000)')
+    parser.add_argument('--max-mb', type=int, default=64,
+                        help='skip scaled inputs larger than this (default: 64)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timings per case, the best is kept (default: 3)')
+    parser.add_argument('--tolerance', type=float, default=TIME_TOLERANCE,
+                        help='allowed slowdown as a fraction of the baseline')
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the new baselines')
+    args = parser.parse_args(argv)
+
+    scales  = [int(scale) for scale in args.scales.split(',')]
+    results = run(scales, args.max_mb, args.repeat)
+
+    if args.save:
+        save_baselines(results, args.baselines)
+        print('Saved baselines to ' + args.baselines)
+        return 0
+
+    baselines = load_baselines(args.baselines)
+    if baselines is None:
+        print('No baselines at ' + args.baselines + ', run with --save to record them')
+        return 0
+
+    regressions = compare(results, baselines, args.tolerance)
+    for message in regressions:
+        print('REGRESSION ' + message)
+    if regressions:
+        print(str(len(regressions)) + ' benchmark(s) regressed')
+        return 1
+
+    print('No regressions against ' + args.baselines)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings import web
+from holdings import store
+from holdings import metrics
+from holdings import writers
+from holdings import discovery
+
+FORMS = ['13F-HR', '13F-HR/A', 'N-Q']
+
+################################### Class Definitions #######################################
+
+class ReportSink():
+    """Base class of where fetch_holdings hands each report it reads."""
+
+    def emit(self, report):
+        """Given a Report13FHR or ReportNQ, do something with it."""
+        raise NotImplementedError('Please implement this method.')
+
+
+class NullSink(ReportSink):
+    """Keeps reports in memory only."""
+
+    def emit(self, report):
+        return None
+
+
+class FileSink(ReportSink):
+    """
+    Writes each report into the writers module's output directory in one of
+    its formats, remembering the names of the reports written.
+    """
+
+    def __init__(self, fmt='tsv'):
+        # Fail on an unknown format, or a missing optional dependency, now
+        writers.get_writer(fmt)
+        self.fmt         = fmt
+        self.reportnames = []
+        self._lock       = threading.Lock()
+
+    def emit(self, report):
+        reportnames = report.generate_report(self.fmt)
+        with self._lock:
+            self.reportnames.extend(reportnames)
+        return reportnames
+
+
+class CallbackSink(ReportSink):
+    """Calls a function with each report."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, report):
+        return self.callback(report)
+
+################################ Helper Methods ##########################################
+
+def get_sink(sink):
+    """
+    Given None, the name of a report format, a callable or a ReportSink,
+    return the ReportSink standing for it: one keeping reports in memory,
+    writing them in that format, or calling the callable with each.
+    """
+    if sink is None:
+        return NullSink()
+    if isinstance(sink, ReportSink):
+        return sink
+    if isinstance(sink, str):
+        return FileSink(sink)
+    if callable(sink):
+        return CallbackSink(sink)
+    raise ValueError('Unknown report sink: ' + repr(sink))
+
+def read_report(filing):
+    """
+    Given a Filing found by discovery, download and parse it, returning its
+    Report13FHR or ReportNQ. Its tickers are added to the web module's
+    ticker index and its holdings to the current holdings store, if any.
+    """
+    with metrics.stage('read'):
+        report = discovery.backend.read_report(filing)
+
+    if hasattr(report, 'series') and web.ticker_index is not None:
+        web.ticker_index.add_series(report.series)
+    count_rows(report)
+
+    if store.current is not None:
+        with metrics.stage('store'):
+            store.current.load_report(report)
+
+    return report
+
+def count_rows(report):
+    """Given a Report13FHR or ReportNQ, count its holdings in the current metrics."""
+    if hasattr(report, 'series'):
+        # Series reporting the same schedule share one list of holdings
+        metrics.count('rows', sum(len(holdings) for holdings
+                                  in {id(series.holdings): series.holdings
+                                      for series in report.series}.values()))
+    else:
+        metrics.count('rows', len(report.holdings))
+
+def fetch_holdings(cik, forms=None, sink=None):
+    """
+    Given a ticker or CIK number, find its most recent filing of the given
+    forms (13F-HR and N-Q by default) and return its Report13FHR or ReportNQ
+    once handed to the sink: None keeps it in memory only, a report format
+    such as 'tsv' or 'columnar' writes its reports, a callable is called
+    with it. Raise web.TickerNotFoundException for an unknown ticker,
+    discovery.FilingNotFoundException when it has no such filing and
+    discovery.UnsupportedFormException for a form no parser exists for.
+    """
+    if forms is None:
+        forms = FORMS
+    sink = get_sink(sink)
+
+    with metrics.stage('discover'):
+        filings = discovery.backend.find_filings(cik, forms)
+    if not filings:
+        raise discovery.FilingNotFoundException(
+            'No ' + ', '.join(forms) + ' filings found for ' + cik)
+
+    return fetch_filing(filings[0], sink)
+
+def fetch_filing(filing, sink=None):
+    """
+    Given a Filing found by discovery, read its Report13FHR or ReportNQ as
+    read_report does, hand it to the sink as fetch_holdings does and
+    return it.
+    """
+    sink = get_sink(sink)
+
+    with metrics.filing(filing.accession):
+        report = read_report(filing)
+        with metrics.stage('write'):
+            sink.emit(report)
+
+    return report
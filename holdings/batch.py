@@ -0,0 +1,153 @@
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings import cli
+from holdings import web
+from holdings import metrics
+from holdings import tickers
+from holdings import main
+
+################################### Class Definitions #######################################
+
+class BatchResult():
+
+    def __init__(self, cik, reportnames=None, error=None, elapsed=0.0):
+        self.cik = cik
+        if reportnames is None:
+            reportnames = []
+        self.reportnames = reportnames
+        self.error       = error
+        self.elapsed     = elapsed
+
+    def __repr__(self):
+        return '{cik}::{status}'.format(
+            cik=self.cik,
+            status='ok' if self.ok else type(self.error).__name__)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BatchSummary():
+
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def throughput(self):
+        """CIKs processed per second of wall-clock time."""
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.results) / self.elapsed
+
+    def failures_by_type(self):
+        """Return a dict of exception name --> list of CIKs that raised it."""
+        failures = {}
+        for result in self.failed:
+            failures.setdefault(type(result.error).__name__, []).append(result.cik)
+        return failures
+
+    def format(self):
+        lines = ['Processed {total} CIKs in {elapsed:.1f}s ({rate:.2f} CIKs/s): '
+                 '{ok} succeeded, {failed} failed'.format(
+                     total=len(self.results),
+                     elapsed=self.elapsed,
+                     rate=self.throughput,
+                     ok=len(self.succeeded),
+                     failed=len(self.failed))]
+
+        for name, ciks in sorted(self.failures_by_type().items()):
+            lines.append('  {name}: {ciks}'.format(name=name,
+                                                   ciks=', '.join(ciks)))
+
+        return '\n'.join(lines)
+
+################################ Helper Methods ##########################################
+
+def run_one(cik, forms, fmt='tsv'):
+    """
+    Generate the reports for a single ticker or CIK, capturing any failure
+    in the returned BatchResult instead of raising it.
+    """
+    start = time.perf_counter()
+
+    try:
+        reportnames = main.generate_report(cik, forms, fmt)
+    except Exception as e:
+        # One bad CIK must not take the rest of the batch down with it
+        logger.error('Failed to generate reports for ' + cik + ': ' + repr(e))
+        return BatchResult(cik, error=e, elapsed=time.perf_counter() - start)
+
+    return BatchResult(cik, reportnames, elapsed=time.perf_counter() - start)
+
+def run_batch(ciks, forms=None, workers=4, fmt='tsv'):
+    """
+    Given a list of tickers or CIKs, generate their reports on a pool of
+    at most `workers` threads and return a BatchSummary of the results,
+    in the same order as the input.
+    """
+    if forms is None:
+        forms = main.FORMS
+    if workers < 1:
+        raise ValueError('workers must be at least 1')
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda cik: run_one(cik, forms, fmt), ciks))
+
+    return BatchSummary(results, time.perf_counter() - start)
+
+def main_batch(argv=None):
+    """Entry point for generating reports for a list of tickers or CIKs"""
+    parser = argparse.ArgumentParser(
+        prog='python -m holdings.batch',
+        description='Generate holdings reports for many tickers or CIKs.')
+    cli.add_source_argument(parser)
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='maximum number of CIKs processed at once')
+    parser.add_argument('--ticker-index', nargs='?', const=tickers.INDEX_FILE,
+                        help='resolve tickers with a local index (see holdings.tickers), '
+                             'adding the tickers of the N-Q filings parsed to it')
+    parser.add_argument('--profile',
+                        help='profile the run into this file (see holdings.main)')
+    cli.add_common_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cli.apply_common_arguments(args)
+    if args.ticker_index:
+        try:
+            web.use_ticker_index(tickers.TickerIndex.load(args.ticker_index))
+        except FileNotFoundError:
+            web.use_ticker_index(tickers.TickerIndex())
+
+    ciks = cli.read_source(args.source)
+
+    with metrics.profiled(args.profile):
+        summary = run_batch(ciks, workers=args.workers, fmt=args.format)
+    print(summary.format())
+    metrics.emit(metrics.totals)
+
+    if args.ticker_index:
+        web.ticker_index.save(args.ticker_index)
+
+    return 0 if not summary.failed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main_batch())
@@ -0,0 +1,168 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import tempfile
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+################################### Class Definitions #######################################
+
+class CacheEntry():
+
+    def __init__(self, url, key, size, stored_at, compressed,
+                 etag=None, last_modified=None, encoding=None):
+        self.url           = url
+        self.key           = key
+        self.size          = size
+        self.stored_at     = stored_at
+        self.compressed    = compressed
+        self.etag          = etag
+        self.last_modified = last_modified
+        self.encoding      = encoding
+
+    def __repr__(self):
+        return '{key}::{url}'.format(
+            key=self.key[:12],
+            url=self.url)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class DiskCache():
+    """
+    Content cache of HTTP response bodies keyed by the sha256 of their URL.
+    Each body is stored (optionally gzipped) next to a small JSON file of its
+    validators, and the least recently used bodies are evicted once the cache
+    grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3, ttl=24 * 60 * 60,
+                 compress=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        self.compress  = compress
+        self._lock     = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(os.path.getsize(path) for path in self._body_paths())
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _body_paths(self):
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith('.body')]
+
+    def lookup(self, url):
+        """Return the CacheEntry stored for url, or None on a miss."""
+        key = _key(url)
+
+        try:
+            with open(self._path(key, '.json'), 'r') as meta:
+                entry = CacheEntry(**json.load(meta))
+            # The body's mtime records when it was last used, for eviction
+            os.utime(self._path(key, '.body'))
+        except (OSError, ValueError, TypeError):
+            return None
+
+        return entry
+
+    def is_fresh(self, entry):
+        """Whether entry was stored or revalidated within the ttl."""
+        return time.time() - entry.stored_at < self.ttl
+
+    def open(self, entry):
+        """Return a binary file object reading entry's (decompressed) body."""
+        path = self._path(entry.key, '.body')
+        if entry.compressed:
+            return gzip.open(path, 'rb')
+        return open(path, 'rb')
+
+    def store(self, url, chunks, etag=None, last_modified=None, encoding=None):
+        """
+        Given a URL and an iterable of the byte chunks of its body, write the
+        body to the cache and return its new CacheEntry.
+        """
+        key = _key(url)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                body = gzip.GzipFile(fileobj=raw, mode='wb') if self.compress else raw
+                for chunk in chunks:
+                    body.write(chunk)
+                if self.compress:
+                    body.close()
+            size = os.path.getsize(tmp_path)
+
+            entry = CacheEntry(url, key, size, time.time(), self.compress,
+                               etag, last_modified, encoding)
+            with self._lock:
+                old_size = self._size_of(key)
+                os.replace(tmp_path, self._path(key, '.body'))
+                self._write_meta(entry)
+                self._total += size - old_size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict()
+        return entry
+
+    def refresh(self, entry):
+        """Mark entry as revalidated with the server just now."""
+        entry.stored_at = time.time()
+        with self._lock:
+            self._write_meta(entry)
+
+    def evict(self):
+        """Remove least recently used bodies until the cache fits max_bytes."""
+        with self._lock:
+            if self._total <= self.max_bytes:
+                return
+
+            paths = sorted(self._body_paths(), key=os.path.getmtime)
+            for path in paths:
+                if self._total <= self.max_bytes:
+                    break
+                key = os.path.basename(path)[:-len('.body')]
+                self._total -= self._size_of(key)
+                for suffix in ('.body', '.json'):
+                    try:
+                        os.remove(self._path(key, suffix))
+                    except OSError:
+                        pass
+                logger.info('Evicted ' + key + ' from the response cache')
+
+    def _size_of(self, key):
+        try:
+            return os.path.getsize(self._path(key, '.body'))
+        except OSError:
+            return 0
+
+    def _write_meta(self, entry):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as meta:
+            json.dump(entry.to_dict(), meta)
+        os.replace(tmp_path, self._path(entry.key, '.json'))
+
+################################ Helper Methods ##########################################
+
+def _key(url):
+    """Helper method to turn a URL into its cache file name"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+def is_immutable(url):
+    """
+    Whether the document at url can never change once published, which
+    holds for everything under EDGAR's /Archives/ accession paths.
+    """
+    return '/Archives/' in url
@@ -0,0 +1,93 @@
+import sys
+
+from holdings import web
+from holdings import store
+from holdings import metrics
+from holdings import writers
+from holdings import discovery
+
+################################ Helper Methods ##########################################
+
+def add_common_arguments(parser, edgar=True):
+    """
+    Given an argparse parser, add the options every entry point shares: the
+    report format and output directory, the holdings store and, unless edgar
+    is False, which EDGAR to use and how to find filings on it, the response
+    cache and the metrics file.
+    """
+    parser.add_argument('-f', '--format', default='tsv', choices=sorted(writers.WRITERS),
+                        help='report format (default: tsv)')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='directory the reports are written to '
+                             '(default: ' + writers.REPORTS_DIR + ')')
+    parser.add_argument('--store', nargs='?', const='',
+                        help='also load the holdings into this local index, queried with '
+                             'holdings.store (default: ' + store.STORE_FILE
+                             + ' in the output directory)')
+    if not edgar:
+        return
+
+    parser.add_argument('--edgar', default=None,
+                        help='base url of the EDGAR to use, i.e. a local '
+                             'holdings.mock_edgar server (default: ' + web.BASE_URL + ')')
+    parser.add_argument('--discovery', default='html', choices=sorted(discovery.BACKENDS),
+                        help='how filings are found on EDGAR: by scraping its html '
+                             'pages or from its json listings (default: html)')
+    parser.add_argument('--cache-dir',
+                        help='keep EDGAR responses in this directory between runs')
+    parser.add_argument('--metrics',
+                        help='append a JSON line of stage timings and counters '
+                             'for each filing, then for the whole run, to this file')
+
+def apply_common_arguments(args):
+    """
+    Given the arguments parsed by a parser given add_common_arguments, set
+    up the writers, web, discovery, store and metrics modules accordingly.
+    """
+    if args.output_dir:
+        writers.use_output_dir(args.output_dir)
+    # After the output directory, which the store's default path is in
+    if args.store is not None:
+        store.use_store(store.HoldingsStore(args.store or None))
+    if not hasattr(args, 'edgar'):
+        return
+
+    if args.edgar:
+        web.use_edgar(args.edgar)
+    discovery.use_backend(args.discovery)
+    if args.cache_dir:
+        web.enable_cache(args.cache_dir)
+    metrics.write_summaries(args.metrics)
+
+def add_source_argument(parser):
+    """
+    Given an argparse parser, add the positional argument naming the file
+    of tickers or CIKs to process, read with read_source.
+    """
+    parser.add_argument('source', nargs='?', default='-',
+                        help='file listing one ticker or CIK per line '
+                             '(default: read from stdin)')
+
+def read_source(source):
+    """
+    Given the path of a file of tickers or CIKs, or - for stdin, return the
+    tickers or CIKs it lists as read_ciks does.
+    """
+    if source == '-':
+        return read_ciks(sys.stdin)
+    with open(source, 'r') as lines:
+        return read_ciks(lines)
+
+def read_ciks(lines):
+    """
+    Given an iterable of text lines, return the tickers or CIKs they list,
+    one per line, skipping blank lines and # comments.
+    """
+    ciks = []
+
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if line:
+            ciks.append(line)
+
+    return ciks
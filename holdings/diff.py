@@ -0,0 +1,169 @@
+import re
+
+from holdings.dto import base
+
+NEW       = 'new'
+CLOSED    = 'closed'
+INCREASED = 'increased'
+DECREASED = 'decreased'
+UNCHANGED = 'unchanged'
+
+################################### Class Definitions #######################################
+
+class PositionChange():
+
+    __slots__ = ('key', 'entity', 'status',
+                 'old_shares', 'new_shares', 'old_value', 'new_value')
+
+    def __init__(self, key, entity, status, old_shares, new_shares,
+                 old_value, new_value):
+        self.key        = key
+        self.entity     = entity
+        self.status     = status
+        self.old_shares = old_shares
+        self.new_shares = new_shares
+        self.old_value  = old_value
+        self.new_value  = new_value
+
+    @property
+    def share_delta(self):
+        return self.new_shares - self.old_shares
+
+    @property
+    def value_delta(self):
+        return self.new_value - self.old_value
+
+    def __repr__(self):
+        return '{entity}::{status}/{delta:+d}'.format(
+            entity=self.entity,
+            status=self.status,
+            delta=self.share_delta)
+
+
+class HoldingsDiff():
+
+    def __init__(self, changes=None):
+        if changes is None:
+            changes = []
+        self.changes = changes
+
+    def by_status(self, status):
+        """Return the changes with the given status, i.e. diff.NEW"""
+        return [change for change in self.changes if change.status == status]
+
+    def counts(self):
+        """Return a dict of status --> number of positions with that status."""
+        counts = dict.fromkeys((NEW, CLOSED, INCREASED, DECREASED, UNCHANGED), 0)
+        for change in self.changes:
+            counts[change.status] += 1
+        return counts
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __iter__(self):
+        return iter(self.changes)
+
+################################ Helper Methods ##########################################
+
+_NOT_WORD = re.compile(r'[^0-9A-Z&]+')
+
+def normalize_issuer(name):
+    """
+    Given an issuer name as reported in a filing, return a form of it that
+    matches across filings, i.e. '* Amazon.com Inc.' --> 'AMAZON COM INC'.
+    """
+    return _NOT_WORD.sub(' ', name.upper()).strip()
+
+def holding_key(holding):
+    """
+    Return the key a holding is matched on between filings. A 13F-HR
+    position is its CUSIP with its put/call and amount type, so options and
+    principal amounts aren't mixed up with the shares of the same security.
+    An N-Q holding has no CUSIP and is matched on its normalized issuer name.
+    """
+    if hasattr(holding, 'cusip'):
+        return (holding.cusip, holding.put_call, holding.amount_type)
+    return normalize_issuer(holding.entity)
+
+def _positions(holdings):
+    """
+    Helper method to total the shares and value of each position, returning
+    a dict of key --> [entity, shares, value] in filing order
+    """
+    positions = {}
+
+    if hasattr(holdings, 'cusips'):
+        # The columns of a 13F table make its join keys without any row objects
+        rows = zip(zip(holdings.cusips, holdings.coded['put_call'], holdings.coded['amount_type']),
+                   holdings.entities, holdings.shares, holdings.values)
+    elif isinstance(holdings, base.HoldingsTable):
+        rows = zip(map(normalize_issuer, holdings.entities),
+                   holdings.entities, holdings.shares, holdings.values)
+    else:
+        rows = ((holding_key(holding), holding.entity, holding.shares, holding.value)
+                for holding in holdings)
+
+    for key, entity, shares, value in rows:
+        position = positions.get(key)
+        if position is None:
+            positions[key] = [entity, shares, value]
+        else:
+            position[1] += shares
+            position[2] += value
+
+    return positions
+
+def diff_holdings(old, new):
+    """
+    Given the holdings of two filings (lists of holdings or HoldingsTables),
+    line up their positions with a hash join and return a HoldingsDiff
+    classifying each one as new, closed, increased, decreased or unchanged.
+    Positions still held come first in the new filing's order, followed by
+    the closed positions in the old filing's order.
+    """
+    old_positions = _positions(old)
+    new_positions = _positions(new)
+    changes       = []
+
+    for key, (entity, shares, value) in new_positions.items():
+        previous = old_positions.get(key)
+        if previous is None:
+            changes.append(PositionChange(key, entity, NEW, 0, shares, 0, value))
+            continue
+
+        if shares > previous[1]:
+            status = INCREASED
+        elif shares < previous[1]:
+            status = DECREASED
+        else:
+            status = UNCHANGED
+        changes.append(PositionChange(key, entity, status, previous[1], shares,
+                                      previous[2], value))
+
+    for key, (entity, shares, value) in old_positions.items():
+        if key not in new_positions:
+            changes.append(PositionChange(key, entity, CLOSED, shares, 0, value, 0))
+
+    return HoldingsDiff(changes)
+
+def diff_13fhr(old_report, new_report):
+    """Given two Report13FHR objects, return the HoldingsDiff between them."""
+    return diff_holdings(old_report.holdings, new_report.holdings)
+
+def diff_nq(old_report, new_report):
+    """
+    Given two ReportNQ objects, return a dict of series ID --> HoldingsDiff
+    for each series in either report. A series missing from one report is
+    diffed against no holdings.
+    """
+    old_series = {series.ID: series for series in old_report.series}
+    new_series = {series.ID: series for series in new_report.series}
+    diffs      = {}
+
+    for ID in list(new_series) + [ID for ID in old_series if ID not in new_series]:
+        old_holdings = old_series[ID].holdings if ID in old_series else []
+        new_holdings = new_series[ID].holdings if ID in new_series else []
+        diffs[ID]    = diff_holdings(old_holdings, new_holdings)
+
+    return diffs
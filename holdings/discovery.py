@@ -0,0 +1,287 @@
+import threading
+from datetime import datetime
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings import web
+from holdings import tickers
+
+from holdings.dto import reportnq
+from holdings.dto import report13fhr
+
+################################### Class Definitions #######################################
+
+class FilingNotFoundException(Exception):
+    pass
+
+class UnsupportedFormException(ValueError):
+    pass
+
+
+class Filing():
+    """
+    A filing found by a discovery backend. The archive is the link to its
+    filing index page, which identifies the filing whichever backend found it.
+    """
+
+    __slots__ = ('form', 'cik', 'archive', 'accepted_date', 'primary_document')
+
+    def __init__(self, form, cik, archive, accepted_date=None, primary_document=None):
+        self.form             = form
+        self.cik              = cik
+        self.archive          = archive
+        self.accepted_date    = accepted_date
+        self.primary_document = primary_document
+
+    def __repr__(self):
+        return '{form}::{accession}'.format(
+            form=self.form,
+            accession=self.accession)
+
+    @property
+    def accession(self):
+        return web.accession_number(self.archive)
+
+    @property
+    def directory(self):
+        """The link to the archive directory holding the filing's documents."""
+        return self.archive[:self.archive.rfind('/') + 1]
+
+
+class DiscoveryBackend():
+    """
+    Base class of the ways of finding filings on EDGAR and downloading the
+    documents that hold their holdings.
+    """
+
+    name = ''
+
+    def find_filings(self, ticker, forms, history=False, fresh=False):
+        """
+        Given a ticker or CIK number and a list of forms, return the Filings
+        of those forms, most recent first. Only the most recent page of
+        filings is searched unless history is True. Listings in the web
+        module's response cache are revalidated with EDGAR first when fresh
+        is True, so filings made since they were cached aren't missed.
+        """
+        raise NotImplementedError('Please implement this method.')
+
+    def read_report(self, filing):
+        """
+        Given a Filing, download and parse its holdings while they are read,
+        returning its Report13FHR or ReportNQ DTO object.
+        """
+        raise NotImplementedError('Please implement this method.')
+
+    def submission_url(self, filing):
+        """Given a Filing, return the link to its complete submission text file."""
+        raise NotImplementedError('Please implement this method.')
+
+    def information_table_url(self, filing):
+        """
+        Given a Filing, return the link to its 13F-HR information table xml
+        on its own, or None when its holdings have to be read from the
+        complete submission text file.
+        """
+        return None
+
+
+class HTMLDiscovery(DiscoveryBackend):
+    """
+    Finds filings by scraping the EDGAR company page, then each filing's
+    index page for its complete submission text file.
+    """
+
+    name = 'html'
+
+    def find_filings(self, ticker, forms, history=False, fresh=False):
+        if history:
+            results = web.get_filing_history(ticker, *forms, fresh=fresh)
+        else:
+            results = web.find_archive_links(web.get_company_page(ticker, fresh=fresh),
+                                              forms)[1]
+
+        # The reports and the store need the filer's CIK, not the ticker typed
+        return [Filing(form, ticker if ticker.isdigit() else web.archive_cik(archive) or ticker,
+                       archive)
+                for form, archive in results]
+
+    def read_report(self, filing):
+        check_form(filing.form)
+        return _read_submission(filing, web.stream_holding_info(filing.archive))
+
+    def submission_url(self, filing):
+        holding_info = web.get_submission_link(filing.archive)
+
+        if holding_info == '':
+            raise web.HoldingInfoNotFoundException(filing.archive)
+        return holding_info
+
+
+class JSONDiscovery(DiscoveryBackend):
+    """
+    Finds filings in EDGAR's JSON submissions listing of a CIK (see
+    https://www.sec.gov/edgar/sec-api-documentation), which gives
+    the accession number of each filing and so the location of its
+    documents without any filing index page. 13F-HR holdings are read from
+    the information table xml alone, found in the filing directory's
+    index.json; N-Q holdings from the complete submission text file.
+    """
+
+    name = 'json'
+
+    def __init__(self, data_url=None, archives_url=None):
+        self._data_url     = data_url
+        self._archives_url = archives_url
+        self._index        = None
+        self._lock         = threading.Lock()
+
+    @property
+    def data_url(self):
+        """Where EDGAR's JSON listings are served, the web module's by default."""
+        return self._data_url or web.data_url
+
+    @property
+    def archives_url(self):
+        return self._archives_url or web.base_url + '/Archives'
+
+    def resolve_cik(self, ticker):
+        """
+        Given a ticker or CIK number, return its 10 digit CIK. The listing is
+        only available by CIK, so tickers the web module's ticker index can't
+        resolve are looked up in EDGAR's ticker files, downloaded once.
+        """
+        cik = web.resolve_cik(ticker)
+        if cik.isdigit():
+            return tickers.normalize_cik(cik)
+
+        with self._lock:
+            if self._index is None:
+                self._index = tickers.build_index()
+
+        entry = self._index.lookup(ticker)
+        if entry is None:
+            raise web.TickerNotFoundException(ticker)
+        return entry.cik
+
+    def find_filings(self, ticker, forms, history=False, fresh=False):
+        cik     = self.resolve_cik(ticker)
+        listing = self._get_json(self.data_url + '/submissions/CIK' + cik + '.json', fresh)
+        filings = self._filings(cik, listing['filings']['recent'], forms)
+
+        if history:
+            # Older filings are listed in further files of the same layout
+            for page in listing['filings'].get('files', []):
+                columns = self._get_json(self.data_url + '/submissions/' + page['name'], fresh)
+                filings.extend(self._filings(cik, columns, forms))
+
+        return filings
+
+    def read_report(self, filing):
+        check_form(filing.form)
+
+        information_table = self.information_table_url(filing)
+        if information_table:
+            return report13fhr.read_13f_information_table(
+                filing.cik,
+                filing.accepted_date,
+                filing.form,
+                web.stream_document(information_table))
+
+        return _read_submission(filing, web.stream_document(self.submission_url(filing)))
+
+    def submission_url(self, filing):
+        return filing.directory + filing.accession + '.txt'
+
+    def information_table_url(self, filing):
+        if filing.form not in report13fhr.FORMS_13FHR:
+            return None
+        information_table = self._find_information_table(filing)
+        return filing.directory + information_table if information_table else None
+
+    def _get_json(self, url, fresh=False):
+        response = web.get(url, fresh=fresh)
+        response.raise_for_status()
+        return response.json()
+
+    def _filings(self, cik, columns, forms):
+        """
+        Helper method to turn a listing's columns of filing attributes into
+        the Filings of the given forms
+        """
+        filings = []
+
+        for accession, form, accepted, document in zip(columns['accessionNumber'],
+                                                       columns['form'],
+                                                       columns['acceptanceDateTime'],
+                                                       columns['primaryDocument']):
+            if form in forms:
+                archive = (self.archives_url + '/edgar/data/' + str(int(cik)) + '/'
+                           + accession.replace('-', '') + '/' + accession + '-index.htm')
+                filings.append(Filing(form, cik, archive,
+                                      _parse_acceptance_datetime(accepted), document))
+
+        return filings
+
+    def _find_information_table(self, filing):
+        """
+        Helper method to return the name of the information table xml in a
+        13F-HR filing's directory, or None if it doesn't have one
+        """
+        listing = self._get_json(filing.directory + 'index.json')
+        primary = (filing.primary_document or '').rsplit('/', 1)[-1]
+
+        for item in listing['directory']['item']:
+            name = item['name']
+            if name.lower().endswith('.xml') and name not in (primary, 'primary_doc.xml'):
+                return name
+
+        logger.info('No information table found for ' + filing.archive
+                    + ', reading the complete submission instead')
+        return None
+
+################################ Helper Methods ##########################################
+
+BACKENDS = {
+    'html': HTMLDiscovery,
+    'json': JSONDiscovery,
+}
+
+backend = HTMLDiscovery()
+
+def get_backend(name):
+    """Given the name of a discovery backend, return a new instance of it."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError('Unknown discovery backend: ' + str(name))
+
+def use_backend(name):
+    """Find and download filings with the named backend from now on."""
+    global backend
+    backend = get_backend(name)
+    return backend
+
+def check_form(form):
+    """
+    Given a form type, raise UnsupportedFormException if no parser exists
+    for it, so a filing can be rejected before it is downloaded.
+    """
+    if form not in report13fhr.FORMS_13FHR and form not in reportnq.FORMS_NQ:
+        raise UnsupportedFormException('Don\'t know how to parse form ' + form)
+
+def _read_submission(filing, chunks):
+    """Helper method to parse a complete submission text with its form's parser"""
+    if filing.form in report13fhr.FORMS_13FHR:
+        return report13fhr.read_13f_report(filing.cik, chunks)
+    return reportnq.read_nq_report(chunks)
+
+def _parse_acceptance_datetime(text):
+    """
+    Helper method to read the date of a listing's acceptanceDateTime,
+    i.e. 2016-11-15T11:19:26.000Z
+    """
+    if not text:
+        return None
+    return datetime.strptime(text[:10], '%Y-%m-%d').date()
@@ -1,4 +1,19 @@
+import sys
+import codecs
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 class Holding():
+    """
+    A holding of one issuer, with its shares and value parsed into ints.
+    They are formatted again only when a report is written.
+    """
+
+    __slots__ = ('entity', 'shares', 'value')
 
     def __init__(self, entity, shares, value):
         self.entity = entity
@@ -18,6 +33,80 @@ class Holding():
             value=self.value)
 
 
+class HoldingsTable():
+    """
+    Columnar, memory-efficient container of holdings. Issuer names are kept
+    interned in a list while shares and values are kept in arrays of 64-bit
+    integers, so a row costs a few bytes instead of three objects. Indexing
+    and iterating produce Holding objects, which makes a table a drop-in
+    replacement for a list of holdings in the report classes.
+    """
+
+    __slots__ = ('entities', 'shares', 'values')
+
+    def __init__(self, entities=None, shares=None, values=None):
+        self.entities = [] if entities is None else entities
+        self.shares   = array('q') if shares is None else array('q', shares)
+        self.values   = array('q') if values is None else array('q', values)
+
+    @classmethod
+    def from_holdings(cls, holdings):
+        """Given an iterable of holdings, return a table of their rows."""
+        table = cls()
+        table.extend(holdings)
+        return table
+
+    def to_holdings(self):
+        """Return the rows as a list of holdings."""
+        return list(self)
+
+    def append(self, holding):
+        self.entities.append(sys.intern(holding.entity))
+        self.shares.append(holding.shares)
+        self.values.append(holding.value)
+
+    def extend(self, holdings):
+        for holding in holdings:
+            self.append(holding)
+
+    def rows(self):
+        """Return an iterator over the (entity, shares, value) of each row."""
+        return zip(self.entities, self.shares, self.values)
+
+    def as_numpy(self):
+        """
+        Return the shares and values columns as NumPy arrays sharing the
+        table's memory. Requires NumPy.
+        """
+        if numpy is None:
+            raise ImportError('as_numpy requires numpy to be installed')
+        return (numpy.frombuffer(self.shares, dtype=numpy.int64),
+                numpy.frombuffer(self.values, dtype=numpy.int64))
+
+    def nbytes(self):
+        """Approximate memory used by the table's containers, in bytes."""
+        return (sys.getsizeof(self.entities)
+                + self.shares.itemsize * len(self.shares)
+                + self.values.itemsize * len(self.values))
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return HoldingsTable(self.entities[index],
+                                 self.shares[index],
+                                 self.values[index])
+        return Holding(self.entities[index], self.shares[index], self.values[index])
+
+    def __iter__(self):
+        for entity, shares, value in self.rows():
+            yield Holding(entity, shares, value)
+
+    def __repr__(self):
+        return 'HoldingsTable({rows} rows)'.format(rows=len(self))
+
+
 class SECForm():
 
     def __init__(self, cik, accepted_date, submission_type):
@@ -27,3 +116,35 @@ class SECForm():
 
     def generate_report(self):
         raise NotImplementedError('Please implement this method.')
+
+################################### Helper Methods #######################################
+
+def parse_amount(text):
+    """
+    Given a share count or dollar value as reported in a filing, such as
+    '1,234,567' or '(1,500)', return it as an int.
+    """
+    text = text.strip().replace(',', '')
+    if text.startswith('(') and text.endswith(')'):
+        return -int(text[1:-1])
+    return int(text)
+
+def iter_lines(chunks):
+    """
+    Given an iterable of text or byte chunks (the lines of an open file, the
+    blocks of an HTTP response body, ...), yield its lines one at a time
+    without their trailing newline.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        lines   = (pending + chunk).split('\n')
+        pending = lines.pop()
+        yield from lines
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
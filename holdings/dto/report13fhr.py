@@ -1,15 +1,151 @@
-import csv
+import sys
 import xml
 import xml.etree.ElementTree as ET
+from array import array
 from datetime import datetime
 
 import logging
 logger = logging.getLogger(__name__)
 
+from holdings import metrics
+from holdings import writers
 from holdings.dto import base
+from holdings.dto import submission
+
+# The form types this module parses
+FORMS_13FHR = ('13F-HR', '13F-HR/A')
+
+# The infoTable fields a Holding13F keeps besides entity, shares and value.
+# Repetitive ones are dictionary-encoded in a Holdings13FTable
+CODED_FIELDS  = ('title_of_class', 'amount_type', 'put_call',
+                 'investment_discretion', 'other_manager')
+VOTING_FIELDS = ('voting_sole', 'voting_shared', 'voting_none')
 
 ################################### Class Definitions #######################################
 
+class Holding13F(base.Holding):
+    """
+    A holding with every field of its 13F-HR infoTable. Text fields are
+    interned, so rows sharing a class title, discretion code or CUSIP share
+    one string, and the amounts and voting authority are parsed into ints.
+    """
+
+    __slots__ = ('cusip',) + CODED_FIELDS + VOTING_FIELDS
+
+    def __init__(self, entity, shares, value, cusip=None, title_of_class=None,
+                 amount_type=None, put_call=None, investment_discretion=None,
+                 other_manager=None, voting_sole=0, voting_shared=0, voting_none=0):
+        super().__init__(entity, shares, value)
+        self.cusip                 = cusip
+        self.title_of_class        = title_of_class
+        self.amount_type           = amount_type
+        self.put_call              = put_call
+        self.investment_discretion = investment_discretion
+        self.other_manager         = other_manager
+        self.voting_sole           = voting_sole
+        self.voting_shared         = voting_shared
+        self.voting_none           = voting_none
+
+    def __repr__(self):
+        return '{cusip}::{entity}::{shares}/{value}'.format(
+            cusip=self.cusip,
+            entity=self.entity,
+            shares=self.shares,
+            value=self.value)
+
+
+class _CodedColumn():
+    """
+    Dictionary-encoded column of repetitive values: each distinct value is
+    kept once and every row is a 4 byte code into them.
+    """
+
+    __slots__ = ('values', 'codes', '_index')
+
+    def __init__(self):
+        self.values = []
+        self.codes  = array('I')
+        self._index = {}
+
+    def append(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code               = len(self.values)
+            self._index[value] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def nbytes(self):
+        return sys.getsizeof(self.values) + self.codes.itemsize * len(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return self.values[self.codes[index]]
+
+    def __iter__(self):
+        values = self.values
+        for code in self.codes:
+            yield values[code]
+
+
+class Holdings13FTable(base.HoldingsTable):
+    """
+    HoldingsTable that also keeps every infoTable field of its rows: the
+    CUSIPs as interned strings, usable directly as join keys, the class
+    titles, amount types, put/call, discretion codes and other managers
+    dictionary-encoded, and the voting authority as int64 arrays. Indexing
+    and iterating produce Holding13F objects. A table starts out empty and
+    is filled a holding at a time, so every column stays the same length.
+    """
+
+    __slots__ = ('cusips', 'coded', 'voting')
+
+    def __init__(self):
+        super().__init__()
+        self.cusips = []
+        self.coded  = {field: _CodedColumn() for field in CODED_FIELDS}
+        self.voting = {field: array('q') for field in VOTING_FIELDS}
+
+    def append(self, holding):
+        super().append(holding)
+        cusip = getattr(holding, 'cusip', None)
+        self.cusips.append(sys.intern(cusip) if cusip else None)
+        for field, column in self.coded.items():
+            column.append(getattr(holding, field, None))
+        for field, column in self.voting.items():
+            column.append(getattr(holding, field, 0))
+
+    def nbytes(self):
+        return (super().nbytes()
+                + sys.getsizeof(self.cusips)
+                + sum(column.nbytes() for column in self.coded.values())
+                + sum(column.itemsize * len(column) for column in self.voting.values()))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Holdings13FTable.from_holdings(
+                self._row(row) for row in range(*index.indices(len(self))))
+        return self._row(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._row(index)
+
+    def _row(self, index):
+        fields = {field: column[index] for field, column in self.coded.items()}
+        fields.update((field, column[index]) for field, column in self.voting.items())
+        return Holding13F(self.entities[index],
+                          self.shares[index],
+                          self.values[index],
+                          self.cusips[index],
+                          **fields)
+
+    def __repr__(self):
+        return 'Holdings13FTable({rows} rows)'.format(rows=len(self))
+
+
 class Report13FHR(base.SECForm):
 
     def __init__(self, cik, accepted_date, submission_type, holdings=None):
@@ -24,27 +160,63 @@ class Report13FHR(base.SECForm):
             cik=self.cik,
             date=self.accepted_date)
 
-    def generate_report(self):
+    def compact_holdings(self):
         """
-        Given the current reports' list of holdings, generate a tab-delimited
-        report of the holdings.
+        Replace the report's list of holdings with an equivalent, smaller
+        Holdings13FTable.
         """
+        self.holdings = Holdings13FTable.from_holdings(self.holdings)
+
+    def generate_report(self, fmt='tsv'):
+        """
+        Given the current reports' list of holdings, generate a report of the
+        holdings in the given format, tab-delimited text by default.
+        """
+        writer     = writers.get_writer(fmt)
         reportname = (self.cik + '_'
                       + self.accepted_date.isoformat().replace('-', '_')
-                      + '.txt')
+                      + writer.extension)
 
-        with open('reports/' + reportname, 'w') as csvfile:
-            fields = ['entity', 'shares', 'value']
-            writer = csv.DictWriter(csvfile, fieldnames=fields, delimiter='\t')
-
-            writer.writeheader()
-            for holding in self.holdings:
-                writer.writerow({'entity': holding.entity,
-                                 'shares': holding.shares,
-                                 'value':  holding.value})
+        writers.write_report(writer, reportname, self.holdings)
 
         return [reportname]
 
+
+class _InfoTableReader():
+    """
+    Incremental parser for an informationTable. Each infoTable is turned into
+    a holding as soon as it closes and then dropped from the tree, so memory
+    use stays flat however many rows the filing reports.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root   = None
+
+    def feed(self, data):
+        """Parse the next piece of xml and return the holdings it completed."""
+        self._parser.feed(data)
+        return self._read_events()
+
+    def close(self):
+        """Finish parsing and return any remaining holdings."""
+        self._parser.close()
+        return self._read_events()
+
+    def _read_events(self):
+        holdings = []
+
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    self._root = element
+            elif _short_tag(element.tag) == 'infoTable':
+                holdings.append(_holding_from_infotable(element))
+                element.clear()
+                if element in self._root:
+                    self._root.remove(element)
+
+        return holdings
 ################################ Helper Methods ##########################################
 
 def _short_tag(tag):
@@ -68,6 +240,19 @@ def _tags_and_vals(root):
 
     return result
 
+def _parse_acceptance_date(line):
+    """Helper method to read the date out of the ACCEPTANCE-DATETIME line"""
+    full_date      = line[line.rfind('>')+1:len(line)]
+    year           = full_date[:4]
+    month          = full_date[4:6]
+    day            = full_date[6:8]
+    formatted_date = year + ' ' + month + ' ' + day
+    try:
+        return datetime.strptime(formatted_date, '%Y %m %d').date()
+    except ValueError:
+        logger.warning('get_13f_xml expected a well-formatted date')
+        raise
+
 def get_infotables(root):
     """
     Given the root XML element informationTable, search through all infoTable
@@ -106,39 +291,137 @@ def get_13f_xml(holdings_statement):
         elif 'CONFORMED SUBMISSION TYPE' in line:
             submission_type = line[line.find(':')+1:].strip()
         elif 'ACCEPTANCE-DATETIME' in line:
-            full_date      = line[line.rfind('>')+1:len(line)]
-            year           = full_date[:4]
-            month          = full_date[4:6]
-            day            = full_date[6:8]
-            formatted_date = year + ' ' + month + ' ' + day
-            try:
-                accepted_date  = datetime.strptime(formatted_date,
-                                                '%Y %m %d').date()
-            except ValueError:
-                logger.warn('get_13f_xml expected a well-formatted date')
-                raise
+            accepted_date = _parse_acceptance_date(line)
 
     return accepted_date, submission_type, ''.join(holdings_xml)
 
-def get_13f_holdings(cik, accepted_date, submission_type, holdings_xml):
+def _interned_text(element):
+    """Helper method to get an element's stripped text, interned, or None"""
+    if element is None or element.text is None:
+        return None
+    text = element.text.strip()
+    return sys.intern(text) if text else None
+
+def _int_text(element):
+    """Helper method to get an element's text as an int, 0 if it has none"""
+    if element is None or element.text is None or not element.text.strip():
+        return 0
+    return base.parse_amount(element.text)
+
+def _holding_from_infotable(infotable):
     """
-    Given a well-formed xml containing the holding data from a 13F-HR filing,
-    parse the xml and return a 13FHR object containing a list of holdings DTO objects.
+    Helper method to convert an infoTable element into a Holding13F DTO object
+    """
+    fields = {_short_tag(child.tag): child for child in infotable}
+    amount = {_short_tag(child.tag): child for child in fields['shrsOrPrnAmt']}
+    voting = {_short_tag(child.tag): child for child in fields.get('votingAuthority', ())}
+    cusip  = _interned_text(fields.get('cusip'))
+
+    return Holding13F(sys.intern(fields['nameOfIssuer'].text),
+                      _int_text(amount['sshPrnamt']),
+                      _int_text(fields['value']),
+                      cusip=sys.intern(cusip.upper()) if cusip else None,
+                      title_of_class=_interned_text(fields.get('titleOfClass')),
+                      amount_type=_interned_text(amount.get('sshPrnamtType')),
+                      put_call=_interned_text(fields.get('putCall')),
+                      investment_discretion=_interned_text(fields.get('investmentDiscretion')),
+                      other_manager=_interned_text(fields.get('otherManager')),
+                      voting_sole=_int_text(voting.get('Sole')),
+                      voting_shared=_int_text(voting.get('Shared')),
+                      voting_none=_int_text(voting.get('None')))
+
+def iter_13f_holdings(chunks):
+    """
+    Given the information table xml from a 13F-HR filing as an iterable of
+    text chunks, parse it incrementally and yield a Holding13F DTO object as
+    soon as each infoTable element is complete.
     """
+    reader = _InfoTableReader()
+
     try:
-        tree = ET.fromstring(holdings_xml)
+        for chunk in chunks:
+            yield from reader.feed(chunk)
+        yield from reader.close()
     except xml.etree.ElementTree.ParseError:
-        # TODO Change this to actual logging
-        print('get_13f_holdings expected a well-formed xml but ParseError occured')
+        logger.warning('get_13f_holdings expected a well-formed xml '
+                       'but ParseError occured')
         raise
 
-    infotables = get_infotables(tree)
-    holdings   = [base.Holding(h['nameOfIssuer'],
-                               h['shrsOrPrnAmt']['sshPrnamt'],
-                               h['value'])
-                  for h
-                  in infotables]
+def get_13f_holdings(cik, accepted_date, submission_type, holdings_xml):
+    """
+    Given a well-formed xml containing the holding data from a 13F-HR filing,
+    parse the xml and return a 13FHR object containing a list of holdings DTO objects.
+    """
+    with metrics.stage('parse_xml'):
+        holdings = list(iter_13f_holdings([holdings_xml]))
+    metrics.count('rows_parsed', len(holdings))
+
+    return Report13FHR(cik, accepted_date, submission_type, holdings)
+
+def read_13f_information_table(cik, accepted_date, submission_type, chunks):
+    """
+    Given the information table xml document of a 13F-HR filing on its own,
+    as an iterable of text chunks, parse it while it is read and return the
+    filing's Report13FHR DTO object. The document has none of the filing's
+    metadata, so the caller supplies it.
+    """
+    holdings = list(iter_13f_holdings(chunks))
 
     return Report13FHR(cik, accepted_date, submission_type, holdings)
 
+def read_13f_report(cik, chunks):
+    """
+    Given the complete submission text for a 13F-HR filing as an iterable of
+    lines or chunks, parse the information table while the text is read and
+    return the filing's Report13FHR DTO object.
+    """
+    report       = Report13FHR(cik, '', '')
+    reader       = _InfoTableReader()
+    info_started = False
+
+    for line in base.iter_lines(chunks):
+        # Parse only the lines between the <informationTable> tags
+        if info_started:
+            if '</XML>' in line:
+                break
+            report.holdings.extend(reader.feed(line))
+        elif 'informationTable' in line:
+            info_started = True
+            report.holdings.extend(reader.feed(line))
+        elif 'CONFORMED SUBMISSION TYPE' in line:
+            report.submission_type = line[line.find(':')+1:].strip()
+        elif 'ACCEPTANCE-DATETIME' in line:
+            report.accepted_date = _parse_acceptance_date(line)
+        elif 'CENTRAL INDEX KEY' in line and not report.cik.isdigit():
+            # Given a ticker, the filer's CIK is the first in the header
+            report.cik = line[line.find(':')+1:].strip()
+
+    report.holdings.extend(reader.close())
+
+    return report
+
+def parse_13f_submission(cik, buffer):
+    """
+    Given the complete submission text for a 13F-HR filing as bytes or an
+    mmap, index its documents and parse only the xml of its information
+    table, returning the filing's Report13FHR DTO object. A filing without
+    an information table has no holdings.
+    """
+    filing = submission.index_submission(buffer)
+    report = Report13FHR(cik, filing.accepted_date, filing.submission_type)
+    doc    = filing.document('INFORMATION TABLE')
+
+    if doc is None:
+        return report
+
+    # The xml declaration has to be the first thing the parser sees
+    start = filing.find(b'<XML>', doc.start, doc.end)
+    start = doc.start if start == -1 else start + len(b'<XML>')
+    end   = filing.find(b'</XML>', start, doc.end)
+    end   = doc.end if end == -1 else end
+    while start < end and filing.buffer[start:start + 1].isspace():
+        start += 1
+
+    report.holdings = list(iter_13f_holdings(filing.iter_text(start, end)))
 
+    return report
@@ -1,8 +1,19 @@
-import csv
+import re
+
 from bs4 import BeautifulSoup
 from datetime import datetime
+from html.parser import HTMLParser
+
+import logging
+logger = logging.getLogger(__name__)
 
+from holdings import metrics
+from holdings import writers
 from holdings.dto import base
+from holdings.dto import submission
+
+# The form types this module parses
+FORMS_NQ = ('N-Q', 'N-Q/A')
 
 ################################## Class Definitions #########################################
 
@@ -53,31 +64,292 @@ class ReportNQ(base.SECForm):
             cik=self.cik,
             date=self.accepted_date)
 
-    def generate_report(self):
+    def compact_holdings(self):
         """
-        Given the current reports' list of holdings, generate a tab-delimited
-        report of the holdings.
+        Replace each series' list of holdings with an equivalent, smaller
+        HoldingsTable. Series sharing a list of holdings share one table.
         """
-        reportnames = []
-
+        tables = {}
         for series in self.series:
-            reportname = (self.cik + '_'
-                          + series.ID + '_'
-                          + self.accepted_date.isoformat().replace('-', '_')
-                          + '.txt')
-            reportnames.append(reportname)
+            key = id(series.holdings)
+            if key not in tables:
+                tables[key] = base.HoldingsTable.from_holdings(series.holdings)
+            series.holdings = tables[key]
+
+    def generate_report(self, fmt='tsv'):
+        """
+        Given the current reports' list of holdings, generate a report of each
+        series' holdings in the given format, tab-delimited text by default.
+        """
+        writer  = writers.get_writer(fmt)
+        reports = [(self.cik + '_'
+                    + series.ID + '_'
+                    + self.accepted_date.isoformat().replace('-', '_')
+                    + writer.extension, series.holdings)
+                   for series in self.series]
+
+        # Each series' report is written on its own thread
+        writers.write_reports(writer, reports)
+
+        return [reportname for reportname, holdings in reports]
+
+
+class _TableLayout():
+    """
+    Where a holding's security, shares and value are among the cells of a
+    row, once empty cells, currency signs and footnote markers are dropped.
+    """
+
+    __slots__ = ('cells', 'entity', 'shares', 'value')
+
+    def __init__(self, cells, entity, shares, value):
+        self.cells  = cells
+        self.entity = entity
+        self.shares = shares
+        self.value  = value
+
+    def __repr__(self):
+        return '{cells}::{entity}/{shares}/{value}'.format(
+            cells=self.cells,
+            entity=self.entity,
+            shares=self.shares,
+            value=self.value)
+
+    def __eq__(self, other):
+        return (isinstance(other, _TableLayout)
+                and (self.cells, self.entity, self.shares, self.value)
+                == (other.cells, other.entity, other.shares, other.value))
+
+    def extract(self, texts):
+        """
+        Given the text of each cell in a table row, return the row as a
+        holding if it fits the layout, otherwise None.
+        """
+        cells = _clean_cells(texts)
+        if len(cells) != self.cells:
+            return None
+
+        shares = _parse_number(cells[self.shares])
+        value  = _parse_number(cells[self.value])
+        if shares is None or value is None:
+            return None
+
+        return base.Holding(cells[self.entity], shares, value)
+
 
-            with open('reports/' + reportname, 'w') as csvfile:
-                fields = ['entity', 'shares', 'value']
-                writer = csv.DictWriter(csvfile, fieldnames=fields, delimiter='\t')
+# The layout of the schedules this parser started out reading:
+# Security | Shares | Value
+DEFAULT_LAYOUT = _TableLayout(3, 0, 1, 2)
 
-                writer.writeheader()
-                for holding in series.holdings:
-                    writer.writerow({'entity': holding.entity,
-                                    'shares': holding.shares,
-                                    'value':  holding.value})
+# Rows with the shape of a holding to sample before settling on a layout,
+# and rows of any shape after which to settle regardless
+SAMPLE_ROWS     = 50
+MAX_SAMPLE_ROWS = 1000
+
+# Layout of the holdings tables last read for each filer CIK
+_layouts = {}
+
+
+class _ScheduleReader():
+    """
+    Turns the rows and the text between the tables of a schedule of
+    investments into holdings, in document order, for either html engine.
 
-        return reportnames
+    The layout of the holdings' columns is detected from a sample of the
+    first rows, or taken from the layout last found for the same filer, and
+    every row is then read with it. Given the series of the filing, rows and
+    text naming one of them are emitted as that FundSeries.
+    """
+
+    def __init__(self, series=None, cik=None):
+        self._holdings = []
+        self._current  = None
+        self._sample   = []
+        self._votes    = {}
+        self._layout   = None
+        self._found    = 0
+        self.track_series(series or [], cik)
+
+    def track_series(self, series, cik=None):
+        """Look for headings naming any of the given series from now on."""
+        self.headings = _series_headings(series)
+        self._cik     = cik
+        if self._layout is None and cik in _layouts:
+            metrics.count('layout_cache_hits')
+            self._start(_layouts[cik])
+
+    def row(self, texts):
+        if self._layout is not None:
+            self._read_row(texts)
+            return
+
+        self._sample.append(texts)
+        signature = _row_signature(texts)
+        if signature is not None:
+            self._votes[signature] = self._votes.get(signature, 0) + 1
+            if self._votes[signature] >= SAMPLE_ROWS:
+                self._start(self._detect())
+                return
+        if len(self._sample) >= MAX_SAMPLE_ROWS:
+            self._start(self._detect())
+
+    def heading(self, text):
+        if not self.headings:
+            return
+        series = self.headings.get(_normalize_heading(text))
+        if series is None:
+            return
+        if self._layout is None:
+            self._sample.append(series)
+        else:
+            self._emit(series)
+
+    def close(self):
+        if self._layout is None:
+            self._start(self._detect())
+
+        # A cached layout that finds nothing is detected afresh next time
+        if self._cik is not None:
+            if self._found:
+                _layouts[self._cik] = self._layout
+            else:
+                _layouts.pop(self._cik, None)
+
+    def drain(self):
+        """
+        Return the holdings read since the last call, each preceded by
+        the FundSeries whose schedule it was found in when that changed.
+        """
+        holdings, self._holdings = self._holdings, []
+        return holdings
+
+    def _detect(self):
+        metrics.count('layouts_detected')
+        if not self._votes:
+            return DEFAULT_LAYOUT
+        # The most common shape wins, the first one seen on a tie
+        return _TableLayout(*max(self._votes, key=self._votes.get))
+
+    def _start(self, layout):
+        self._layout = layout
+        sample, self._sample = self._sample, None
+        for item in sample:
+            if isinstance(item, FundSeries):
+                self._emit(item)
+            else:
+                self._read_row(item)
+
+    def _read_row(self, texts):
+        holding = self._layout.extract(texts)
+        if holding is not None:
+            self._found += 1
+            self._holdings.append(holding)
+        elif self.headings:
+            self.heading(' '.join(texts))
+
+    def _emit(self, series):
+        if series is not self._current:
+            self._current = series
+            self._holdings.append(series)
+
+
+class _HoldingsTableParser(HTMLParser):
+    """
+    Event-driven counterpart to the BeautifulSoup scan in parse_nq_report_html.
+    Each <tr> is read as soon as it closes, so the HTML can be fed in pieces
+    and never has to be held in memory as a whole.
+
+    Given the series of the filing, the text between block elements outside
+    of table cells is also checked for a series name, and the FundSeries is
+    emitted among the holdings where its schedule starts.
+    """
+
+    def __init__(self, series=None, cik=None):
+        super().__init__(convert_charrefs=True)
+        # Stack of the open table, tr and td elements as [tag, payload] pairs,
+        # where a tr's payload is its list of cells and a td's is its text
+        self._open   = []
+        self._text   = []
+        self._length = 0
+        self._reader = _ScheduleReader()
+        self.track_series(series or [], cik)
+
+    def track_series(self, series, cik=None):
+        """
+        Look for headings naming any of the given series from now on, and
+        read the holdings with the layout last found for the filer's CIK.
+        """
+        self._reader.track_series(series, cik)
+        # Whitespace between tags counts towards the text of a heading too
+        self._longest = 2 * max((len(name) for name in self._reader.headings), default=0)
+
+    def handle_starttag(self, tag, attrs):
+        if self._text and tag in _BLOCK_TAGS:
+            self._end_text()
+
+        if tag == 'tr':
+            self._open.append(['tr', []])
+        elif tag == 'td':
+            # Like row.find_all('td'), a row sees every td nested inside it
+            cell = []
+            for element in self._open:
+                if element[0] == 'tr':
+                    element[1].append(cell)
+            self._open.append(['td', cell])
+        elif tag == 'table':
+            self._open.append(['table', None])
+
+    def handle_endtag(self, tag):
+        if self._text and tag in _BLOCK_TAGS:
+            self._end_text()
+
+        if not any(element[0] == tag for element in self._open):
+            return
+
+        # Closing a tag closes everything opened inside it, as in the soup
+        while self._open:
+            element = self._open.pop()
+            if element[0] == 'tr':
+                self._add_row(element[1])
+            if element[0] == tag:
+                break
+
+    def handle_data(self, data):
+        in_cell = False
+        for element in self._open:
+            if element[0] == 'td':
+                element[1].append(data)
+                in_cell = True
+
+        # Text too long to be a series name is not kept
+        if not in_cell and self._longest and self._length <= self._longest:
+            self._text.append(data)
+            self._length += len(data)
+
+    def close(self):
+        super().close()
+        while self._open:
+            element = self._open.pop()
+            if element[0] == 'tr':
+                self._add_row(element[1])
+        self._end_text()
+        self._reader.close()
+
+    def _add_row(self, cells):
+        self._reader.row([''.join(cell) for cell in cells])
+
+    def _end_text(self):
+        text         = ''.join(self._text)
+        self._text   = []
+        self._length = 0
+        self._reader.heading(text)
+
+    def drain(self):
+        """
+        Return the holdings parsed since the last call, each preceded by
+        the FundSeries whose schedule it was found in when that changed.
+        """
+        return self._reader.drain()
 
 
 class InvalidContractTextException(Exception):
@@ -92,6 +364,114 @@ def _chunks(l, n):
     for i in range(0, len(l), n):
         yield l[i:i + n]
 
+def _parse_acceptance_date(line):
+    """
+    Given the ACCEPTANCE-DATETIME line of a submission header,
+    return the date the filing was accepted.
+    """
+    full_date      = line[line.rfind('>')+1:len(line)]
+    year           = full_date[:4]
+    month          = full_date[4:6]
+    day            = full_date[6:8]
+    formatted_date = year + ' ' + month + ' ' + day
+    try:
+        return datetime.strptime(formatted_date, '%Y %m %d').date()
+    except ValueError:
+        logger.warning('read_nq_report expected a well-formatted date, got ' + repr(full_date))
+        raise
+
+# A whole number, negative in parentheses, with any footnote markers after it
+_NUMBER = re.compile(r'(?:(?P<paren>\()|(?P<minus>-))?(?P<digits>\d[\d,]*)(?(paren)\))'
+                     r'(?:\s*(?:\([a-z]\)|[*\u2020\u2021]+))*')
+
+# Cells that only hold a currency or percent sign or a footnote marker
+_FILLER = re.compile(r'[$%*\u2020\u2021]*|\([a-z]\)')
+
+# Percentages and other decimals, such as a percent of net assets column
+_DECIMAL = re.compile(r'\(?-?\d*\.\d+\)?%?|\d+%')
+
+def _clean_cells(texts):
+    """
+    Helper method to strip the text of each cell in a row, dropping empty
+    cells and those only holding a currency sign or footnote marker
+    """
+    cells = []
+    for text in texts:
+        text = text.strip()
+        if not _FILLER.fullmatch(text):
+            cells.append(text)
+    return cells
+
+def _parse_number(text):
+    """
+    Given the text of a cell, return the whole number in it as an int,
+    negative if it was in parentheses, otherwise None.
+    """
+    match = _NUMBER.fullmatch(text)
+    if match is None:
+        return None
+    number = int(match.group('digits').replace(',', ''))
+    if match.group('paren') or match.group('minus'):
+        return -number
+    return number
+
+def _row_signature(texts):
+    """
+    Given the text of each cell in a table row, return the (cells, entity,
+    shares, value) positions of a holding in it, taking the first text cell
+    as the security and the first two whole numbers as its shares and value,
+    or None if the row doesn't look like a holding.
+    """
+    cells   = _clean_cells(texts)
+    entity  = None
+    numbers = []
+
+    for index, cell in enumerate(cells):
+        if _NUMBER.fullmatch(cell):
+            numbers.append(index)
+        elif entity is None and not _DECIMAL.fullmatch(cell):
+            entity = index
+
+    if entity is None or len(numbers) < 2:
+        return None
+    return (len(cells), entity, numbers[0], numbers[1])
+
+# Elements that end a run of text that could be a series heading
+_BLOCK_TAGS = frozenset(('p', 'div', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+                         'li', 'center', 'table', 'tr', 'td'))
+
+def _normalize_heading(text):
+    """Helper method to compare headings regardless of case and whitespace"""
+    return ' '.join(text.split()).lower()
+
+def _series_headings(series):
+    """
+    Given the series of a filing, return a mapping of the normalized name of
+    each one to the series
+    """
+    return {_normalize_heading(fund.name): fund for fund in series if fund.name.strip()}
+
+def _assign_holdings(all_series, items):
+    """
+    Given the series of a filing, and its holdings as parsed from the html
+    with each FundSeries found preceding the holdings of its schedule, give
+    each series its own list of holdings. Holdings found before the first
+    series heading belong to the first series named.
+
+    If no series was named in the html, every series shares all holdings.
+    """
+    lists   = {}
+    current = []
+
+    for item in items:
+        if isinstance(item, FundSeries):
+            current = lists.setdefault(item.ID, [] if lists else current)
+        else:
+            current.append(item)
+
+    for series in all_series:
+        series.holdings = lists.get(series.ID, []) if lists else current
+
 def _get_line_element_value(element, line, current_exception):
     """
     Given an element to search for in a line of text,
@@ -139,6 +519,22 @@ def parse_series(text):
 
     return FundSeries(ID, ownerCIK, name)
 
+def _iter_series_text(lines):
+    """
+    Helper method to yield the list of text lines of each <SERIES> block
+    in the given lines
+    """
+    series_text = None
+
+    for line in lines:
+        if '<SERIES>' in line:
+            series_text = [line]
+        elif series_text is not None:
+            series_text.append(line)
+            if '</SERIES>' in line:
+                yield series_text
+                series_text = None
+
 def parse_series_and_contracts(text):
     """
     Given a list of text lines containing series and contract info from an N-Q
@@ -154,42 +550,76 @@ def parse_series_and_contracts(text):
 
     return series
 
-def parse_nq_report_html(html_text):
+def _parse_nq_report_soup(html_text, series=None, cik=None):
     """
-    Given the html from the complete submission text for an N-Q filing,
-    find and return the list of holdings for each series in the fund.
+    Find the holdings in an N-Q filing's html by building the complete
+    BeautifulSoup tree and searching its rows. Block elements outside of
+    table cells whose text names one of the given series are kept in
+    document order ahead of the holdings that follow them.
     """
-    # TODO expand this for multipe N-Q submission formats
-    # This will currently only support reports whose security,
-    # shares, and values are in the same rows
-    soup     = BeautifulSoup(html_text, 'html.parser')
-    rows     = soup.find_all('tr')
-    holdings = []
-
-    for row in rows:
-        tds = row.find_all('td')
-
-        if (len(tds) == 3):
-            try:
-                # If the 2nd and 3rd columns are valid numbers, it's probably
-                # a holding 
-                int(tds[1].get_text().replace(',', ''))
-                int(tds[2].get_text().replace(',', ''))
-            except ValueError:
-                pass
-            else:
-                name   = tds[0].get_text()
-                shares = tds[1].get_text()
-                value  = tds[2].get_text()
+    soup   = BeautifulSoup(html_text, 'html.parser')
+    reader = _ScheduleReader(series, cik)
+    names  = ['tr'] + sorted(_BLOCK_TAGS - {'br', 'hr', 'table', 'tr', 'td'}) if series else 'tr'
+
+    for element in soup.find_all(names):
+        if element.name == 'tr':
+            reader.row([td.get_text() for td in element.find_all('td')])
+        elif element.find_parent('td') is None:
+            reader.heading(element.get_text())
+    reader.close()
+
+    return reader.drain()
+
+def _parse_nq_report_events(html_text, series=None, cik=None):
+    """
+    Find the holdings in an N-Q filing's html by checking each row as the
+    parser reaches its closing tag, without building a tree.
+    """
+    table_parser = _HoldingsTableParser(series, cik)
+    table_parser.feed(html_text)
+    table_parser.close()
+
+    return table_parser.drain()
+
+HTML_ENGINES = {
+    'events': _parse_nq_report_events,
+    'soup':   _parse_nq_report_soup,
+}
 
-                holdings.append(base.Holding(name, shares, value))
+def _parse_nq_html(html_text, engine, series=None, cik=None):
+    """
+    Helper method to parse an N-Q filing's html with the given engine,
+    returning its holdings preceded by the series whose schedules they're in
+    """
+    try:
+        parse = HTML_ENGINES[engine]
+    except KeyError:
+        raise ValueError('Unknown html engine: ' + str(engine))
+
+    with metrics.stage('parse_html'):
+        items = parse(html_text, series, cik)
+    metrics.count('rows_parsed', sum(1 for item in items if not isinstance(item, FundSeries)))
 
-    return holdings
+    return items
+
+def parse_nq_report_html(html_text, engine='events'):
+    """
+    Given the html from the complete submission text for an N-Q filing,
+    find and return the list of holdings for each series in the fund.
+    The engine can be 'events' (the default) for a single pass with
+    html.parser, or 'soup' to search a full BeautifulSoup tree.
+
+    Which columns hold each holding's security, shares and value is detected
+    from the first rows of the document. Only reports whose security, shares
+    and value are in the same rows are supported.
+    """
+    return _parse_nq_html(html_text, engine)
 
-def get_nq_report(complete_text):
+def get_nq_report(complete_text, engine='events'):
     """
     Given the complete submission text for an N-Q filing, parse the document
-    and return its respective ReportNQ DTO object.
+    and return its respective ReportNQ DTO object. See parse_nq_report_html
+    for the available html engines.
     """
     series_flag     = False
     html_flag       = False
@@ -201,18 +631,7 @@ def get_nq_report(complete_text):
 
     for line in complete_text.split('\n'):
         if 'ACCEPTANCE-DATETIME' in line:
-            full_date      = line[line.rfind('>')+1:len(line)]
-            year           = full_date[:4]
-            month          = full_date[4:6]
-            day            = full_date[6:8]
-            formatted_date = year + ' ' + month + ' ' + day
-            try:
-                accepted_date  = datetime.strptime(formatted_date,
-                                                    '%Y %m %d').date()
-            except ValueError:
-                # TODO put actual logging here
-                print('get_13f_xml expected a well-formatted date')
-                raise
+            accepted_date = _parse_acceptance_date(line)
         elif 'CONFORMED SUBMISSION TYPE' in line:
             submission_type = line[line.find(':')+1:].strip()
         ## Parse all series text and add to the series list
@@ -237,11 +656,10 @@ def get_nq_report(complete_text):
             html_text.append(line)
 
     all_series = [parse_series_and_contracts(text) for text in series_list]
-    holdings   = parse_nq_report_html(''.join(html_text))
-
-    for series in all_series:
-        # TODO expand this to differentiate between different series
-        series.holdings = holdings
+    # Each series' holdings follow the heading naming it in the schedule
+    _assign_holdings(all_series,
+                     _parse_nq_html(''.join(html_text), engine, all_series,
+                                    all_series[0].ownerCIK))
 
     report = ReportNQ(all_series[0].ownerCIK,
                       accepted_date,
@@ -249,3 +667,113 @@ def get_nq_report(complete_text):
                       all_series)
 
     return report
+
+def iter_nq_report(chunks):
+    """
+    Streaming counterpart to get_nq_report. Given the complete submission text
+    for an N-Q filing as an iterable of lines or chunks (an open file, an HTTP
+    response body, ...), yield its ReportNQ as soon as the series are known,
+    followed by each Holding as soon as its table row has been parsed.
+    Where the schedule of one of the report's series starts, that FundSeries
+    is yielded, and the holdings that follow belong to it.
+
+    The yielded report's series carry no holdings; the caller decides whether
+    to keep the holdings that follow, so memory use does not grow with the
+    size of the filing.
+    """
+    series_flag     = False
+    html_flag       = False
+    series_text     = []
+    all_series      = []
+    accepted_date   = ''
+    submission_type = ''
+    report          = None
+    table_parser    = _HoldingsTableParser()
+
+    for line in base.iter_lines(chunks):
+        if 'ACCEPTANCE-DATETIME' in line:
+            accepted_date = _parse_acceptance_date(line)
+        elif 'CONFORMED SUBMISSION TYPE' in line:
+            submission_type = line[line.find(':')+1:].strip()
+        ## Parse each series as soon as its text is complete
+        elif '<SERIES>' in line:
+            series_text.append(line)
+            series_flag = True
+        elif series_flag and '</SERIES>' in line:
+            series_text.append(line)
+            all_series.append(parse_series_and_contracts(series_text))
+            series_text = []
+            series_flag = False
+        elif series_flag:
+            series_text.append(line)
+        ## The header is complete once the HTML starts
+        elif '<HTML>' in line:
+            if report is None:
+                report = ReportNQ(all_series[0].ownerCIK,
+                                  accepted_date,
+                                  submission_type,
+                                  all_series)
+                yield report
+                table_parser.track_series(all_series, report.cik)
+            table_parser.feed(line)
+            html_flag = True
+        elif html_flag:
+            table_parser.feed(line)
+            if '</HTML>' in line:
+                html_flag = False
+
+        yield from table_parser.drain()
+
+    if report is None:
+        yield ReportNQ(all_series[0].ownerCIK,
+                       accepted_date,
+                       submission_type,
+                       all_series)
+
+    table_parser.close()
+    yield from table_parser.drain()
+
+def read_nq_report(chunks):
+    """
+    Given the complete submission text for an N-Q filing as an iterable of
+    lines or chunks, parse it without reading the whole text into memory
+    and return its respective ReportNQ DTO object.
+    """
+    report = None
+    items  = []
+
+    for item in iter_nq_report(chunks):
+        if isinstance(item, ReportNQ):
+            report = item
+        else:
+            items.append(item)
+
+    _assign_holdings(report.series, items)
+
+    return report
+
+def parse_nq_submission(buffer):
+    """
+    Given the complete submission text for an N-Q filing as bytes or an mmap,
+    index its documents and return its respective ReportNQ DTO object. The
+    series are read from the header and the holdings only from the primary
+    N-Q document, leaving out exhibits.
+    """
+    filing     = submission.index_submission(buffer)
+    all_series = [parse_series_and_contracts(text)
+                  for text
+                  in _iter_series_text(filing.header_text().split('\n'))]
+    doc        = filing.document(filing.submission_type, 'N-Q', 'N-Q/A')
+
+    table_parser = _HoldingsTableParser(all_series, all_series[0].ownerCIK)
+    if doc is not None:
+        for chunk in filing.iter_text(doc.start, doc.end):
+            # Lines are joined without their newlines, as in get_nq_report
+            table_parser.feed(chunk.replace('\n', ''))
+    table_parser.close()
+    _assign_holdings(all_series, table_parser.drain())
+
+    return ReportNQ(all_series[0].ownerCIK,
+                    filing.accepted_date,
+                    filing.submission_type,
+                    all_series)
@@ -0,0 +1,166 @@
+import re
+import codecs
+from datetime import datetime
+
+################################### Class Definitions #######################################
+
+class Document():
+    """
+    One <DOCUMENT> of a complete submission. Its body is the byte range
+    [start, end) of the submission between <TEXT> and </TEXT>.
+    """
+
+    __slots__ = ('doc_type', 'sequence', 'filename', 'description', 'start', 'end')
+
+    def __init__(self, doc_type, sequence, filename, description, start, end):
+        self.doc_type    = doc_type
+        self.sequence    = sequence
+        self.filename    = filename
+        self.description = description
+        self.start       = start
+        self.end         = end
+
+    def __repr__(self):
+        return '{type}::{filename}'.format(
+            type=self.doc_type,
+            filename=self.filename)
+
+    def __len__(self):
+        return self.end - self.start
+
+
+class Submission():
+    """
+    Index of a complete submission text file: its header fields and the
+    location of each document in the underlying buffer, which can be bytes,
+    a bytearray or an mmap. Documents are sliced out of the buffer on
+    demand, so the buffer is never copied as a whole.
+    """
+
+    def __init__(self, buffer, fields, header_end, documents):
+        self.buffer     = buffer
+        self.fields     = fields
+        self.header_end = header_end
+        self.documents  = documents
+
+    def __repr__(self):
+        return '{accession}::{type}'.format(
+            accession=self.accession_number,
+            type=self.submission_type)
+
+    @property
+    def submission_type(self):
+        return self.fields.get('CONFORMED SUBMISSION TYPE', '')
+
+    @property
+    def accession_number(self):
+        return self.fields.get('ACCESSION NUMBER', '')
+
+    @property
+    def accepted_date(self):
+        full_date = self.fields.get('ACCEPTANCE-DATETIME', '')
+        return datetime.strptime(full_date[:8], '%Y%m%d').date()
+
+    def header_text(self):
+        """Return the submission header, up to its first document, as text."""
+        return _decode(self.buffer[:self.header_end])
+
+    def document(self, *doc_types):
+        """Return the first document of any of the given types, or None."""
+        for doc in self.documents:
+            if doc.doc_type in doc_types:
+                return doc
+        return None
+
+    def find(self, sub, start, end):
+        """Return the offset of sub within [start, end) of the buffer, or -1."""
+        return self.buffer.find(sub, start, end)
+
+    def body(self, doc):
+        """Return a zero-copy memoryview of a document's body."""
+        return memoryview(self.buffer)[doc.start:doc.end]
+
+    def iter_text(self, start, end, chunk_size=64 * 1024):
+        """Yield the text of the buffer between start and end in chunks."""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        for offset in range(start, end, chunk_size):
+            yield decoder.decode(self.buffer[offset:min(offset + chunk_size, end)])
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+################################ Helper Methods ##########################################
+
+_HEADER_FIELD = re.compile(r'^\s*([A-Z][A-Z0-9 ./&-]*?):\s*(.*?)\s*$')
+_HEADER_TAG   = re.compile(r'^<([A-Z][A-Z0-9-]*)>(.+?)\s*$')
+_DOCUMENT_TAG = re.compile(rb'<(TYPE|SEQUENCE|FILENAME|DESCRIPTION)>([^\r\n]*)')
+
+def _decode(data):
+    return bytes(data).decode('utf-8', errors='replace')
+
+def _parse_header(text):
+    """
+    Helper method to read 'KEY: value' and '<KEY>value' header lines into
+    a dict, keeping the first value seen for each key
+    """
+    fields = {}
+
+    for line in text.split('\n'):
+        match = _HEADER_TAG.match(line) or _HEADER_FIELD.match(line)
+        if match and match.group(2):
+            fields.setdefault(match.group(1), match.group(2))
+
+    return fields
+
+def index_submission(buffer):
+    """
+    Given the complete submission text of a filing as bytes, a bytearray
+    or an mmap, scan it once and return a Submission indexing its header
+    fields and the type, filename and body range of each <DOCUMENT>.
+    """
+    size       = len(buffer)
+    header_end = buffer.find(b'<DOCUMENT>')
+    if header_end == -1:
+        header_end = size
+
+    fields    = _parse_header(_decode(buffer[:header_end]))
+    documents = []
+    position  = header_end
+
+    while position < size:
+        doc_start = buffer.find(b'<DOCUMENT>', position)
+        if doc_start == -1:
+            break
+        doc_end = buffer.find(b'</DOCUMENT>', doc_start)
+        if doc_end == -1:
+            doc_end = size
+
+        text_start = buffer.find(b'<TEXT>', doc_start, doc_end)
+        if text_start == -1:
+            text_start = body_start = body_end = doc_end
+        else:
+            body_start = text_start + len(b'<TEXT>')
+            if buffer[body_start:body_start + 2] == b'\r\n':
+                body_start += 2
+            elif buffer[body_start:body_start + 1] == b'\n':
+                body_start += 1
+            body_end = buffer.rfind(b'</TEXT>', body_start, doc_end)
+            if body_end == -1:
+                body_end = doc_end
+
+        # The document's metadata tags all come before its <TEXT>
+        tags = {}
+        for match in _DOCUMENT_TAG.finditer(buffer[doc_start:text_start]):
+            tags.setdefault(match.group(1).decode('ascii'),
+                            _decode(match.group(2)).strip())
+
+        documents.append(Document(tags.get('TYPE', ''),
+                                  tags.get('SEQUENCE', ''),
+                                  tags.get('FILENAME', ''),
+                                  tags.get('DESCRIPTION', ''),
+                                  body_start,
+                                  body_end))
+        position = doc_end + len(b'</DOCUMENT>')
+
+    return Submission(buffer, fields, header_end, documents)
@@ -1,9 +1,17 @@
+import os
 import sys
+import argparse
+import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
+from holdings import api
+from holdings import cli
 from holdings import web
+from holdings import metrics
+from holdings import writers
+from holdings import discovery
 
-from holdings.dto import report13fhr
 from holdings.dto import reportnq
 
 logger    = logging.getLogger()
@@ -15,52 +23,130 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 logger.setLevel(logging.WARN)
 
-def generate_13fhr_report(cik, forms, archives):
-    # The parser looks for the most recent holdings
-    holdings_statement = web.get_holding_info(archives[0])
-    accepted_date, submission_type, holdings_xml = report13fhr.get_13f_xml(holdings_statement[0])
-
-    current_13fhr = report13fhr.get_13f_holdings(cik, accepted_date,
-                                            submission_type, holdings_xml)
-    reportnames   = current_13fhr.generate_report()
-
-    return reportnames
-
-def generate_nq_report(cik, forms, archives):
-    holdings_statement = web.get_holding_info(archives[0])
-    current_nq         = reportnq.get_nq_report(holdings_statement[0])
-    reportnames        = current_nq.generate_report()
+FORMS = api.FORMS
+
+# Accession numbers of the filings history mode has already turned into
+# reports, one per line followed by the names of those reports, kept in the
+# reports' output directory
+HISTORY_FILE  = 'accessions.tsv'
+_history_lock = threading.Lock()
+
+def generate_filing_report(filing, fmt='tsv'):
+    """
+    Given a Filing found by discovery, generate its reports and return their
+    names. Raise discovery.UnsupportedFormException for a form no parser
+    exists for.
+    """
+    sink = api.FileSink(fmt)
+    api.fetch_filing(filing, sink)
+    return sink.reportnames
+
+def generate_report(cik, forms, fmt='tsv'):
+    """
+    Given a ticker or CIK number and a list of forms, generate the reports
+    of its most recent filing of those forms and return their names. Raise
+    discovery.FilingNotFoundException when it has none, and
+    discovery.UnsupportedFormException for a form no parser exists for.
+    """
+    sink = api.FileSink(fmt)
+    api.fetch_holdings(cik, forms, sink)
+    return sink.reportnames
+
+def _read_history():
+    """
+    Return a dict of accession number --> report names for the filings
+    already processed by history mode whose reports are still on disk.
+    """
+    history = {}
 
+    try:
+        with open(writers.report_path(HISTORY_FILE), 'r') as history_file:
+            for line in history_file:
+                fields = line.rstrip('\n').split('\t')
+                if all(os.path.exists(writers.report_path(name)) for name in fields[1:]):
+                    history[fields[0]] = fields[1:]
+    except FileNotFoundError:
+        pass
+
+    return history
+
+def _record_history(accession, reportnames):
+    with _history_lock:
+        with open(writers.report_path(HISTORY_FILE), 'a') as history_file:
+            history_file.write('\t'.join([accession] + reportnames) + '\n')
+
+def generate_recorded_report(filing, fmt='tsv'):
+    """
+    Given a Filing found by discovery, generate its reports as
+    generate_filing_report does and record them in the history, so history
+    mode won't generate them again. Return the report names.
+    """
+    reportnames = generate_filing_report(filing, fmt)
+    _record_history(filing.accession, reportnames)
     return reportnames
 
-def generate_report(cik, forms):
-    submission_type, archives = web.get_archive_links(cik, *forms)
-
-    if submission_type == '13F-HR' or submission_type == '13F-HR/A':
-        logger.info('Found 13F-HR filing, proceeding to generate report...')
-        return generate_13fhr_report(cik, forms, archives)
-    elif submission_type == 'N-Q':
-        logger.info('Found N-Q filing, proceeding to generate report...')
-        return generate_nq_report(cik, forms, archives)
-    else:
-        logger.error('Don\'t know how to parse form' + submission_type)
-        print('Don\'t know how to parse form' + submission_type)
-        sys.exit(1)
+def generate_history(cik, forms, workers=4, fmt='tsv'):
+    """
+    Generate reports for every filing of the given forms on EDGAR, not just
+    the most recent, skipping filings whose reports were already generated.
+    Filings are downloaded and parsed on a pool of `workers` threads; one
+    that fails is logged and left to be retried by the next run.
+    """
+    with metrics.stage('discover'):
+        filings = discovery.backend.find_filings(cik, forms, history=True)
+    history = _read_history()
+    pending = [filing for filing in filings if filing.accession not in history]
+
+    logger.info('Found ' + str(len(filings)) + ' filings, '
+                + str(len(pending)) + ' not yet processed')
+
+    def generate(filing):
+        try:
+            return generate_recorded_report(filing, fmt)
+        except Exception as e:
+            logger.error('Failed to generate reports for ' + filing.archive
+                         + ': ' + repr(e))
+            return []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(generate, pending))
+
+    return [name for reportnames in results for name in reportnames]
 
 def main():
     """Main entry point for the application"""
-    if len(sys.argv) < 2:
-        print('Usage: python -m holdings.main ticker_or_cik')
-        sys.exit(1)
-
-    cik   = sys.argv[1]
-    forms = ['13F-HR', '13F-HR/A', 'N-Q']
+    parser = argparse.ArgumentParser(prog='python -m holdings.main')
+    parser.add_argument('ticker_or_cik')
+    parser.add_argument('--history', action='store_true',
+                        help='generate reports for every past filing, '
+                             'not only the most recent one')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='filings processed at once in history mode')
+    parser.add_argument('--profile',
+                        help='profile the run into this file: cProfile stats, or a '
+                             'pyinstrument html report if the name ends in .html, '
+                             'which needs pyinstrument installed')
+    cli.add_common_arguments(parser)
+    args = parser.parse_args()
+
+    cli.apply_common_arguments(args)
+
+    cik   = args.ticker_or_cik
+    forms = FORMS
 
     try:
         logger.info('Starting to search for report')
-        reportnames = generate_report(cik, forms)
+        with metrics.profiled(args.profile):
+            if args.history:
+                reportnames = generate_history(cik, forms, args.workers, args.format)
+            else:
+                reportnames = generate_report(cik, forms, args.format)
     except web.TickerNotFoundException:
         logger.error('No suck ticker ' + cik + ' found in EDGAR')
+    except (discovery.FilingNotFoundException, discovery.UnsupportedFormException) as e:
+        logger.error(str(e))
+        print(str(e))
+        sys.exit(1)
     except web.HoldingInfoNotFoundException as e:
         logger.error('No submission text found in the following archives:')
         logger.error(str(e))
@@ -77,7 +163,9 @@ def main():
         print('Reports successfully generated and can be found in:')
 
         for name in reportnames:
-            print('reports/' + name)
+            print(writers.report_path(name))
+    finally:
+        metrics.emit(metrics.totals)
 
 
 if __name__ == '__main__':
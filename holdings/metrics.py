@@ -0,0 +1,223 @@
+import json
+import time
+import cProfile
+import threading
+import contextlib
+import contextvars
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+################################### Class Definitions #######################################
+
+class Metrics():
+    """
+    Stage timers and counters for one filing, or for a whole run. Timers
+    accumulate seconds and calls per stage, counters accumulate totals, so
+    recording costs a dict update under a lock.
+    """
+
+    def __init__(self, name=''):
+        self.name     = name
+        self.timers   = {}
+        self.calls    = {}
+        self.counters = {}
+        self._lock    = threading.Lock()
+
+    def __repr__(self):
+        return '{name}::{stages}'.format(
+            name=self.name,
+            stages=len(self.timers))
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+            self.calls[stage]  = self.calls.get(stage, 0) + 1
+
+    def count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def merge(self, other):
+        """Add another Metrics' timers and counters to this one."""
+        with other._lock:
+            timers   = dict(other.timers)
+            calls    = dict(other.calls)
+            counters = dict(other.counters)
+
+        with self._lock:
+            for stage, seconds in timers.items():
+                self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+                self.calls[stage]  = self.calls.get(stage, 0) + calls[stage]
+            for counter, amount in counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @classmethod
+    def from_summary(cls, summary):
+        """
+        Given a dict returned by summary, i.e. by another process, return
+        the Metrics it describes.
+        """
+        metrics = cls(summary['name'])
+        for stage, timer in summary['stages'].items():
+            metrics.timers[stage] = timer['seconds']
+            metrics.calls[stage]  = timer['calls']
+        metrics.counters.update(summary['counters'])
+        return metrics
+
+    def summary(self):
+        """Return the metrics as a dict ready to be dumped as JSON."""
+        with self._lock:
+            return {'name':     self.name,
+                    'stages':   {stage: {'seconds': round(seconds, 6),
+                                         'calls':   self.calls[stage]}
+                                 for stage, seconds in sorted(self.timers.items())},
+                    'counters': dict(sorted(self.counters.items()))}
+
+################################ Helper Methods ##########################################
+
+# Metrics recorded outside of any filing, and of every filing once it ends
+totals       = Metrics('total')
+summary_file = None
+
+_current      = contextvars.ContextVar('metrics', default=None)
+_summary_lock = threading.Lock()
+
+def current():
+    """Return the Metrics of the filing being processed, or the run totals."""
+    metrics = _current.get()
+    return totals if metrics is None else metrics
+
+def write_summaries(path):
+    """
+    Append a JSON summary line for every filing processed from now on to
+    path, or stop writing them when path is None.
+    """
+    global summary_file
+    summary_file = path
+
+def reset():
+    """Start a new run with empty totals."""
+    global totals
+    totals = Metrics('total')
+
+def add_time(stage, seconds):
+    current().add_time(stage, seconds)
+
+def count(counter, amount=1):
+    current().count(counter, amount)
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the enclosed block as the named stage of the current filing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current().add_time(name, time.perf_counter() - start)
+
+@contextlib.contextmanager
+def recording(metrics):
+    """
+    Record the stages and counters of the enclosed block in the given
+    Metrics, i.e. one filing's part of the work done in another thread.
+    """
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+@contextlib.contextmanager
+def filing(name):
+    """
+    Record the stages and counters of the enclosed block as one filing's.
+    When it ends, its summary is written out and added to the run totals.
+    """
+    metrics = Metrics(name)
+    start   = time.perf_counter()
+
+    try:
+        with recording(metrics):
+            yield metrics
+    finally:
+        finish(metrics, time.perf_counter() - start)
+
+def finish(metrics, seconds):
+    """
+    Given the Metrics of a filing and the seconds it took in all, write out
+    its summary and add it to the run totals.
+    """
+    metrics.add_time('total', seconds)
+    totals.merge(metrics)
+    emit(metrics)
+
+def emit(metrics):
+    """Log a Metrics' summary and append it to the summary file, if any."""
+    line = json.dumps(metrics.summary())
+    logger.info(line)
+
+    if summary_file is not None:
+        with _summary_lock:
+            with open(summary_file, 'a') as summaries:
+                summaries.write(line + '\n')
+
+def instrument_stream(chunks, counter='bytes_downloaded'):
+    """
+    Given an iterator of downloaded chunks, yield them while counting their
+    size under counter and the time spent waiting for them, which separates
+    EDGAR latency from the parsing that consumes a streamed download.
+    """
+    chunks = iter(chunks)
+    waited = 0.0
+    size   = 0
+
+    try:
+        while True:
+            start  = time.perf_counter()
+            chunk  = next(chunks, None)
+            waited += time.perf_counter() - start
+            if chunk is None:
+                return
+            size += len(chunk)
+            yield chunk
+    finally:
+        add_time('network', waited)
+        count(counter, size)
+
+@contextlib.contextmanager
+def profiled(path):
+    """
+    Profile the enclosed block into path, with pyinstrument as an html
+    report when path ends in .html, otherwise as cProfile stats for pstats
+    or snakeviz. Does nothing when path is None.
+    """
+    if path is None:
+        yield
+        return
+
+    if path.endswith('.html'):
+        if pyinstrument is None:
+            raise ImportError('html profiles require pyinstrument to be installed')
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, 'w') as report:
+                report.write(profiler.output_html())
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
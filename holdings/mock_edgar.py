@@ -0,0 +1,362 @@
+import os
+import sys
+import json
+import time
+import random
+import itertools
+import argparse
+import threading
+from html import escape
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings.dto import submission
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'resources')
+
+# The complete submissions served when none are given, with their tickers
+FIXTURES = [('gates_fund_complete_text_submission.txt', None),
+            ('vanguard_complete_text_submission.txt', 'VIIIX')]
+
+# Filings listed per company page unless the request asks for a count
+PAGE_SIZE = 40
+
+CONTENT_TYPES = {
+    '.htm':  'text/html; charset=utf-8',
+    '.html': 'text/html; charset=utf-8',
+    '.json': 'application/json',
+    '.txt':  'text/plain; charset=utf-8',
+    '.xml':  'application/xml',
+}
+
+################################### Class Definitions #######################################
+
+class MockFiling():
+
+    __slots__ = ('cik', 'form', 'accession', 'accepted', 'primary_document', 'directory')
+
+    def __init__(self, cik, form, accession, accepted, primary_document, directory):
+        self.cik              = cik
+        self.form             = form
+        self.accession        = accession
+        self.accepted         = accepted
+        self.primary_document = primary_document
+        self.directory        = directory
+
+    def __repr__(self):
+        return '{cik}::{accession}'.format(
+            cik=self.cik,
+            accession=self.accession)
+
+
+class MockEdgar():
+    """
+    A stand-in for EDGAR serving complete submission text files, and the
+    company pages, filing indexes, JSON listings and documents derived from
+    them, from a local HTTP server. Latency, 429 responses and bodies cut
+    short can be injected to test and benchmark the web layer offline;
+    faults are drawn from a seeded generator so runs are repeatable.
+    """
+
+    def __init__(self, latency=0.0, throttle=0.0, truncate=0.0, retry_after=0, seed=0):
+        self.latency     = latency
+        self.throttle    = throttle
+        self.truncate    = truncate
+        self.retry_after = retry_after
+        self.filings     = {}
+        self.tickers     = {}
+        self.documents   = {}
+        self.stats       = {'requests': 0, 'throttled': 0, 'truncated': 0, 'not_found': 0}
+        self._random     = random.Random(seed)
+        self._lock       = threading.Lock()
+        self._server     = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{host}:{port}'.format(host=host, port=port)
+
+    def add_submission(self, text, ticker=None, cik=None):
+        """
+        Serve a complete submission text file, given as bytes, as a filing
+        of the CIK in its header or the given one, listed under ticker too.
+        """
+        filing    = submission.index_submission(text)
+        cik       = str(cik or filing.fields.get('CENTRAL INDEX KEY', '0')).zfill(10)
+        accession = filing.accession_number
+        directory = ('/Archives/edgar/data/' + str(int(cik)) + '/'
+                     + accession.replace('-', '') + '/')
+        documents = {accession + '.txt': text}
+
+        for doc in filing.documents:
+            if doc.filename:
+                documents[doc.filename] = _document_body(filing, doc)
+
+        for name, body in documents.items():
+            self.documents[directory + name] = body
+        self.documents[directory + accession + '-index.htm'] = _archive_index(
+            accession, directory, documents).encode('utf-8')
+        self.documents[directory + 'index.json'] = json.dumps(
+            {'directory': {'name': directory.rstrip('/'),
+                           'item': [{'name': name, 'type': 'text.gif', 'size': str(len(body))}
+                                    for name, body in sorted(documents.items())]}}).encode('utf-8')
+
+        primary = filing.documents[0].filename if filing.documents else ''
+        self.filings.setdefault(cik, []).append(
+            MockFiling(cik, filing.submission_type, accession,
+                       filing.fields.get('ACCEPTANCE-DATETIME', ''), primary, directory))
+        self.filings[cik].sort(key=lambda listed: listed.accepted, reverse=True)
+
+        if ticker:
+            self.tickers[ticker.upper()] = cik
+        return cik
+
+    def start(self, host='127.0.0.1', port=0):
+        """Serve on a background thread, on a free port by default."""
+        self._server       = ThreadingHTTPServer((host, port), _EdgarHandler)
+        self._server.edgar = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def fault(self):
+        """Count a request and return the fault to inject into it, if any."""
+        with self._lock:
+            self.stats['requests'] += 1
+            draw = self._random.random()
+            if draw < self.throttle:
+                self.stats['throttled'] += 1
+                return 'throttle'
+            if draw < self.throttle + self.truncate:
+                self.stats['truncated'] += 1
+                return 'truncate'
+        return None
+
+    def respond(self, path, query):
+        """Return the body and content type served at a path, or None."""
+        if path == '/cgi-bin/browse-edgar' and query.get('action') == ['getcurrent']:
+            return self._current_feed(query).encode('utf-8'), CONTENT_TYPES['.xml']
+        if path == '/cgi-bin/browse-edgar':
+            return self._company_page(query).encode('utf-8'), CONTENT_TYPES['.html']
+        if path.startswith('/submissions/CIK') and path.endswith('.json'):
+            listing = self._listing(path[len('/submissions/CIK'):-len('.json')])
+            if listing is None:
+                return None
+            return json.dumps(listing).encode('utf-8'), CONTENT_TYPES['.json']
+        if path == '/files/company_tickers.json':
+            return json.dumps({str(i): {'cik_str': int(cik), 'ticker': ticker, 'title': ''}
+                               for i, (ticker, cik)
+                               in enumerate(sorted(self.tickers.items()))}).encode('utf-8'), \
+                   CONTENT_TYPES['.json']
+        if path == '/files/company_tickers_mf.json':
+            return json.dumps({'fields': ['cik', 'seriesId', 'classId', 'symbol'],
+                               'data': []}).encode('utf-8'), CONTENT_TYPES['.json']
+
+        body = self.documents.get(path)
+        if body is None:
+            return None
+        return body, CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream')
+
+    def _company_page(self, query):
+        ticker  = query.get('CIK', [''])[0]
+        cik     = ticker.zfill(10) if ticker.isdigit() else self.tickers.get(ticker.upper())
+        filings = self.filings.get(cik)
+
+        if filings is None:
+            return '<html><body><h1>No matching Ticker Symbol.</h1></body></html>'
+
+        start = int(query.get('start', ['0'])[0])
+        count = int(query.get('count', [str(PAGE_SIZE)])[0])
+        rows  = ['<tr><td>{form}</td><td><a href="{directory}{accession}-index.htm">'
+                 'Documents</a></td><td>{accepted}</td></tr>'.format(
+                     form=escape(listed.form),
+                     directory=listed.directory,
+                     accession=listed.accession,
+                     accepted=listed.accepted[:8])
+                 for listed in filings[start:start + count]]
+        html  = '<html><body><table>' + ''.join(rows) + '</table>'
+        if start + count < len(filings):
+            html += '<input type="button" value="Next {count}">'.format(count=count)
+        return html + '</body></html>'
+
+    def _current_feed(self, query):
+        """The latest filings feed: every filing of a form type, newest first"""
+        form    = query.get('type', [''])[0]
+        start   = int(query.get('start', ['0'])[0])
+        count   = int(query.get('count', [str(PAGE_SIZE)])[0])
+        filings = sorted((listed for listed in itertools.chain(*self.filings.values())
+                          if listed.form.startswith(form)),
+                         key=lambda listed: listed.accepted, reverse=True)
+        entries = ['<entry><title>{form} - FILER ({cik}) (Filer)</title>'
+                   '<link rel="alternate" type="text/html" href="{directory}{accession}-index.htm"/>'
+                   '<updated>{updated}</updated>'
+                   '<category scheme="https://www.sec.gov/" label="form type" term="{form}"/>'
+                   '<id>urn:tag:sec.gov,2008:accession-number={accession}</id></entry>'.format(
+                       form=escape(listed.form),
+                       cik=listed.cik,
+                       directory=listed.directory,
+                       accession=listed.accession,
+                       updated=_isoformat(listed.accepted, '-05:00'))
+                   for listed in filings[start:start + count]]
+        return ('<?xml version="1.0" encoding="ISO-8859-1" ?>'
+                '<feed xmlns="http://www.w3.org/2005/Atom"><title>Latest Filings</title>'
+                + ''.join(entries) + '</feed>')
+
+    def _listing(self, cik):
+        filings = self.filings.get(cik)
+        if filings is None:
+            return None
+
+        return {'cik': str(int(cik)),
+                'filings': {'recent': {
+                    'accessionNumber':    [listed.accession for listed in filings],
+                    'form':               [listed.form for listed in filings],
+                    'acceptanceDateTime': [_isoformat(listed.accepted) for listed in filings],
+                    'primaryDocument':    [listed.primary_document for listed in filings]},
+                    'files': []}}
+
+
+class _EdgarHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        edgar = self.server.edgar
+        fault = edgar.fault()
+        url   = urlsplit(self.path)
+
+        if edgar.latency:
+            time.sleep(edgar.latency)
+
+        if fault == 'throttle':
+            self.send_response(429)
+            self.send_header('Retry-After', str(edgar.retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        found = edgar.respond(url.path, parse_qs(url.query))
+        if found is None:
+            with edgar._lock:
+                edgar.stats['not_found'] += 1
+            self.send_error(404)
+            return
+
+        body, content_type = found
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if fault == 'truncate':
+            # Promise the whole body, send half of it and hang up
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+################################ Helper Methods ##########################################
+
+def _document_body(filing, doc):
+    """Helper method to get a document as EDGAR serves it, xml without its <XML> tags"""
+    body  = bytes(filing.body(doc))
+    start = body.find(b'<XML>')
+    if start != -1:
+        end  = body.rfind(b'</XML>')
+        body = body[start + len(b'<XML>'):end if end != -1 else len(body)].strip()
+    return body
+
+def _archive_index(accession, directory, documents):
+    """Helper method to render a filing index page linking its documents"""
+    rows = ['<tr><td>{description}</td><td><a href="{directory}{name}">{name}</a></td></tr>'.format(
+                description='Complete submission text file' if name == accession + '.txt'
+                            else 'Document',
+                directory=directory,
+                name=escape(name))
+            for name in documents]
+    return ('<html><body><table summary="Document Format Files">'
+            + ''.join(rows) + '</table></body></html>')
+
+def _isoformat(accepted, offset='.000Z'):
+    """Helper method to turn 20161115111926 into 2016-11-15T11:19:26.000Z"""
+    if len(accepted) < 14:
+        return ''
+    return '{0}-{1}-{2}T{3}:{4}:{5}{6}'.format(accepted[:4], accepted[4:6], accepted[6:8],
+                                               accepted[8:10], accepted[10:12], accepted[12:14],
+                                               offset)
+
+def load_fixtures(edgar, copies=0):
+    """
+    Serve the fixtures in resources/ from a MockEdgar, plus `copies` more
+    filers of each one under made-up CIKs for load testing. Return the CIKs.
+    """
+    ciks = []
+
+    for name, ticker in FIXTURES:
+        with open(os.path.join(RESOURCES, name), 'rb') as fixture:
+            text = fixture.read()
+        ciks.append(edgar.add_submission(text, ticker))
+        for copy in range(copies):
+            ciks.append(edgar.add_submission(text, cik=9000000000 + len(ciks)))
+
+    return ciks
+
+def main(argv=None):
+    """Entry point for serving a mock EDGAR"""
+    parser = argparse.ArgumentParser(
+        prog='python -m holdings.mock_edgar',
+        description='Serve complete submission text files as a local EDGAR. Point '
+                    'the other entry points at it with --edgar.')
+    parser.add_argument('submissions', nargs='*',
+                        help='complete submission text files to serve '
+                             '(default: the fixtures in resources/)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds to wait before each response')
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='fraction of requests answered with 429 Too Many Requests')
+    parser.add_argument('--truncate', type=float, default=0.0,
+                        help='fraction of responses whose body is cut short')
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help='Retry-After seconds sent with 429s (default: 1)')
+    parser.add_argument('--copies', type=int, default=0,
+                        help='serve each fixture under this many more made-up CIKs')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    edgar = MockEdgar(args.latency, args.throttle, args.truncate, args.retry_after, args.seed)
+    if args.submissions:
+        for path in args.submissions:
+            with open(path, 'rb') as text:
+                edgar.add_submission(text.read())
+    else:
+        load_fixtures(edgar, args.copies)
+
+    edgar.start(args.host, args.port)
+    print('Serving ' + str(sum(len(filings) for filings in edgar.filings.values()))
+          + ' filings of ' + str(len(edgar.filings)) + ' CIKs on ' + edgar.url)
+    print('CIKs: ' + ' '.join(sorted(edgar.filings)))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        edgar.stop()
+        print(json.dumps(edgar.stats))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
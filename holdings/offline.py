@@ -0,0 +1,207 @@
+import os
+import sys
+import mmap
+import json
+import tarfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings import cli
+from holdings import store
+from holdings import writers
+
+from holdings.dto import reportnq
+from holdings.dto import submission
+from holdings.dto import report13fhr
+
+# One JSON line per submission ingested, recording its outcome
+MANIFEST_FILE = 'ingest_manifest.jsonl'
+
+################################ Helper Methods ##########################################
+
+def read_submission(buffer):
+    """
+    Given a complete submission text file as bytes or an mmap, parse it with
+    the 13F-HR or N-Q parser according to its CONFORMED SUBMISSION TYPE.
+    Return the submission type and the Report13FHR or ReportNQ, which is
+    None for submission types that aren't holdings filings.
+    """
+    filing          = submission.index_submission(buffer)
+    submission_type = filing.submission_type
+
+    if submission_type in report13fhr.FORMS_13FHR:
+        cik = filing.fields.get('CENTRAL INDEX KEY', '')
+        return submission_type, report13fhr.parse_13f_submission(cik, buffer)
+    if submission_type in reportnq.FORMS_NQ:
+        return submission_type, reportnq.parse_nq_submission(buffer)
+    return submission_type, None
+
+def generate_submission_report(buffer, fmt='tsv'):
+    """
+    Given a complete submission text file as bytes or an mmap, parse it as
+    read_submission does, generate its reports and load it into the current
+    holdings store, if any. Return the submission type and the report names,
+    which are empty for submission types that aren't holdings filings.
+    """
+    submission_type, report = read_submission(buffer)
+    if report is None:
+        return submission_type, []
+
+    reportnames = report.generate_report(fmt)
+    if store.current is not None:
+        store.current.load_report(report)
+    return submission_type, reportnames
+
+def use_settings(output_dir, store_path):
+    """
+    Process pool initializer: write reports to the parent's output directory
+    and load them into its holdings store, opened again in this process
+    """
+    writers.use_output_dir(output_dir)
+    store.use_store(store.HoldingsStore(store_path) if store_path else None)
+
+def _process(source, data, fmt):
+    """
+    Process pool task: generate the reports of one submission, given either
+    its bytes or, with data None, a path to memory-map. Return the manifest
+    record of the outcome.
+    """
+    record = {'source': source}
+
+    try:
+        if data is None:
+            with open(source, 'rb') as text:
+                with mmap.mmap(text.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    submission_type, reportnames = generate_submission_report(buffer, fmt)
+        else:
+            submission_type, reportnames = generate_submission_report(data, fmt)
+    except Exception as e:
+        record.update(status='failed', error=repr(e))
+    else:
+        record.update(status='ok' if reportnames else 'skipped',
+                      type=submission_type,
+                      reports=reportnames)
+
+    return record
+
+def iter_sources(path):
+    """
+    Given a directory or a tarball of complete submission text files, yield
+    (source, data) for each one: data is None for a file to be memory-mapped
+    from the source path, or the member's bytes for a tarball.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.txt'):
+                    yield os.path.join(root, name), None
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, 'r:*') as tarball:
+            for member in tarball:
+                if member.isfile() and member.name.endswith('.txt'):
+                    yield (path + '::' + member.name,
+                           tarball.extractfile(member).read())
+    else:
+        raise ValueError(path + ' is neither a directory nor a tarball')
+
+def read_manifest(manifest):
+    """
+    Return the sources an earlier run recorded in the manifest as done,
+    i.e. processed or skipped. Failed sources are tried again.
+    """
+    done = set()
+
+    try:
+        with open(manifest, 'r') as records:
+            for line in records:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A run interrupted mid-write leaves a partial last line
+                    continue
+                if record.get('status') in ('ok', 'skipped'):
+                    done.add(record['source'])
+    except FileNotFoundError:
+        pass
+
+    return done
+
+def ingest(path, fmt='tsv', workers=None, manifest=None):
+    """
+    Generate reports for every submission in a directory or tarball on a
+    pool of processes (one per core by default), appending the outcome of
+    each to the manifest as it completes and skipping the ones a previous
+    run already finished. The processes write to the output directory and
+    load the reports into the current holdings store, if any, each through
+    a connection of its own. Return a dict of status --> number of sources.
+    """
+    manifest = writers.bookkeeping_path(manifest, MANIFEST_FILE)
+    done    = read_manifest(manifest)
+    counts  = {'ok': 0, 'skipped': 0, 'failed': 0, 'resumed': 0}
+    workers = workers or os.cpu_count() or 1
+    pending = set()
+
+    def record(futures):
+        for future in futures:
+            result = future.result()
+            counts[result['status']] += 1
+            records.write(json.dumps(result) + '\n')
+            records.flush()
+            if result['status'] == 'failed':
+                logger.error('Failed to process ' + result['source'] + ': '
+                             + result['error'])
+
+        processed = counts['ok'] + counts['skipped'] + counts['failed']
+        if processed and processed % 100 == 0:
+            logger.info('Processed ' + str(processed) + ' submissions')
+
+    with open(manifest, 'a') as records, \
+         ProcessPoolExecutor(max_workers=workers, initializer=use_settings,
+                             initargs=(writers.output_dir,
+                                       store.current.path if store.current else None)) as executor:
+        for source, data in iter_sources(path):
+            if source in done:
+                counts['resumed'] += 1
+                continue
+
+            # Keep a bounded number of submissions in flight
+            if len(pending) >= workers * 4:
+                completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                record(completed)
+            pending.add(executor.submit(_process, source, data, fmt))
+
+        record(wait(pending).done)
+
+    return counts
+
+def main(argv=None):
+    """Entry point for generating reports from local submission files"""
+    parser = argparse.ArgumentParser(
+        prog='python -m holdings.offline',
+        description='Generate holdings reports from a directory or tarball '
+                    'of complete submission text files.')
+    parser.add_argument('source')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of processes (default: one per core)')
+    parser.add_argument('--manifest', default=None,
+                        help='file recording the outcome of each submission, used to '
+                             'resume interrupted runs (default: ' + MANIFEST_FILE
+                             + ' in the output directory)')
+    cli.add_common_arguments(parser, edgar=False)
+    args = parser.parse_args(argv)
+
+    cli.apply_common_arguments(args)
+
+    counts = ingest(args.source, args.format, args.workers, args.manifest)
+    print('{ok} processed, {skipped} skipped, {failed} failed, '
+          '{resumed} already done'.format(**counts))
+
+    return 0 if not counts['failed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
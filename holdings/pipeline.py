@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings import api
+from holdings import cli
+from holdings import web
+from holdings import main
+from holdings import batch
+from holdings import store
+from holdings import metrics
+from holdings import offline
+from holdings import writers
+from holdings import discovery
+
+from holdings.dto import reportnq
+from holdings.dto import report13fhr
+
+################################ Helper Methods ##########################################
+
+def _download(cik, forms, recorded):
+    """
+    Find the most recent filing of the given forms for a ticker or CIK and
+    download the document holding its holdings, recording the time and
+    requests spent in the recorded Metrics, named after the filing. Return
+    the Filing and its information table xml as bytes when the discovery
+    backend can point at that alone, otherwise None and its complete
+    submission text file as bytes.
+    """
+    with metrics.recording(recorded):
+        with metrics.stage('discover'):
+            filings = discovery.backend.find_filings(cik, forms)
+        if not filings:
+            raise ValueError('No ' + ', '.join(forms) + ' filings found for ' + cik)
+
+        filing        = filings[0]
+        recorded.name = filing.accession
+        discovery.check_form(filing.form)
+
+        url = discovery.backend.information_table_url(filing)
+        if url is None:
+            filing = None
+            url    = discovery.backend.submission_url(filings[0])
+
+        response = web.get(url)
+        response.raise_for_status()
+        return filing, response.content
+
+def _parse_submission(data, fmt, filing=None):
+    """
+    Process pool task: parse a downloaded submission, or the information
+    table of the given 13F-HR Filing, generate its reports and load it into
+    the holdings store, if any. Return the submission type,
+    the report names, for an N-Q its series without their holdings for the
+    parent to add to its ticker index, and the summary of the metrics
+    recorded, for the parent to add to the filing's.
+    """
+    recorded = metrics.Metrics()
+
+    with metrics.recording(recorded):
+        with metrics.stage('read'):
+            if filing is None:
+                submission_type, report = offline.read_submission(data)
+            else:
+                submission_type = filing.form
+                report          = report13fhr.read_13f_information_table(
+                    filing.cik, filing.accepted_date, filing.form, [data])
+        if report is None:
+            return submission_type, [], [], recorded.summary()
+        api.count_rows(report)
+
+        with metrics.stage('write'):
+            reportnames = report.generate_report(fmt)
+        if store.current is not None:
+            with metrics.stage('store'):
+                store.current.load_report(report)
+
+    return submission_type, reportnames, [
+        reportnq.FundSeries(series.ID, series.ownerCIK, series.name, series.contracts)
+        for series in getattr(report, 'series', [])], recorded.summary()
+
+async def _fetch(loop, threads, forms, ciks, parse_queue, results):
+    """
+    Download stage: take CIKs off the queue and put their submissions on
+    the parse queue, waiting for room when the parsers fall behind.
+    """
+    while True:
+        index, cik = await ciks.get()
+        start      = time.perf_counter()
+        recorded   = metrics.Metrics(cik)
+
+        try:
+            filing, data = await loop.run_in_executor(threads, _download, cik, forms, recorded)
+        except Exception as e:
+            logger.error('Failed to download ' + cik + ': ' + repr(e))
+            elapsed = time.perf_counter() - start
+            metrics.finish(recorded, elapsed)
+            results[index] = batch.BatchResult(cik, error=e, elapsed=elapsed)
+        else:
+            await parse_queue.put((index, cik, start, recorded, filing, data))
+        finally:
+            ciks.task_done()
+
+async def _parse(loop, processes, fmt, parse_queue, results):
+    """Parse stage: generate the reports of downloaded submissions."""
+    while True:
+        index, cik, start, recorded, filing, data = await parse_queue.get()
+
+        try:
+            submission_type, reportnames, series, summary = await loop.run_in_executor(
+                processes, _parse_submission, data, fmt, filing)
+            recorded.merge(metrics.Metrics.from_summary(summary))
+            if not reportnames:
+                raise discovery.UnsupportedFormException(
+                    'Don\'t know how to parse form ' + submission_type)
+            if series and web.ticker_index is not None:
+                web.ticker_index.add_series(series)
+        except Exception as e:
+            logger.error('Failed to parse ' + cik + ': ' + repr(e))
+            result = batch.BatchResult(cik, error=e, elapsed=time.perf_counter() - start)
+        else:
+            result = batch.BatchResult(cik, reportnames, elapsed=time.perf_counter() - start)
+        finally:
+            parse_queue.task_done()
+
+        metrics.finish(recorded, result.elapsed)
+        results[index] = result
+
+async def run_pipeline(ciks, forms=None, downloads=8, workers=None, fmt='tsv'):
+    """
+    Given a list of tickers or CIKs, generate the reports of their most
+    recent filings with downloads overlapping parsing: `downloads` threads
+    fetch submissions while a pool of `workers` processes (one per core by
+    default) parses them. A bounded queue between the two stages holds at
+    most two submissions per process, so downloads pause rather than pile
+    up in memory when parsing is the bottleneck. Return a BatchSummary of
+    the results, in the same order as the input.
+
+    Downloads run in this process, so they follow its EDGAR, discovery
+    backend, response cache and ticker index; the N-Q series parsed are
+    added to that index. A 13F-HR's information table is downloaded on its
+    own when the backend can find it, as the json one does. The parsing processes write to its output directory
+    and load the reports into its holdings store, each through a connection
+    of its own. The metrics of each filing, recorded partly in a download
+    thread and partly in a parsing process, are written out here once it
+    is done.
+    """
+    if forms is None:
+        forms = main.FORMS
+    if downloads < 1:
+        raise ValueError('downloads must be at least 1')
+
+    workers     = workers or os.cpu_count() or 1
+    loop        = asyncio.get_running_loop()
+    start       = time.perf_counter()
+    results     = [None] * len(ciks)
+    cik_queue   = asyncio.Queue()
+    parse_queue = asyncio.Queue(maxsize=workers * 2)
+
+    for index, cik in enumerate(ciks):
+        cik_queue.put_nowait((index, cik))
+
+    with ThreadPoolExecutor(max_workers=downloads) as threads, \
+         ProcessPoolExecutor(max_workers=workers, initializer=offline.use_settings,
+                             initargs=(writers.output_dir,
+                                       store.current.path if store.current else None)) as processes:
+        stages = ([asyncio.ensure_future(_fetch(loop, threads, forms, cik_queue,
+                                                parse_queue, results))
+                   for _ in range(downloads)]
+                  + [asyncio.ensure_future(_parse(loop, processes, fmt,
+                                                  parse_queue, results))
+                     for _ in range(workers)])
+
+        try:
+            await cik_queue.join()
+            await parse_queue.join()
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+
+    return batch.BatchSummary(results, time.perf_counter() - start)
+
+def main_pipeline(argv=None):
+    """Entry point for generating reports for a list of tickers or CIKs"""
+    parser = argparse.ArgumentParser(
+        prog='python -m holdings.pipeline',
+        description='Generate holdings reports for many tickers or CIKs, '
+                    'downloading filings while earlier ones are parsed.')
+    cli.add_source_argument(parser)
+    parser.add_argument('-d', '--downloads', type=int, default=8,
+                        help='maximum number of filings downloaded at once')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of parsing processes (default: one per core)')
+    cli.add_common_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cli.apply_common_arguments(args)
+
+    ciks = cli.read_source(args.source)
+
+    summary = asyncio.run(run_pipeline(ciks, downloads=args.downloads,
+                                       workers=args.workers, fmt=args.format))
+    print(summary.format())
+    metrics.emit(metrics.totals)
+
+    return 0 if not summary.failed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main_pipeline())
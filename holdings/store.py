@@ -0,0 +1,249 @@
+import re
+import sys
+import sqlite3
+import argparse
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings import diff
+from holdings import tickers
+from holdings import writers
+from holdings.dto import base
+
+# What a HoldingsStore given no path opens in the output directory
+STORE_FILE = 'holdings.db'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS filings (
+    id            INTEGER PRIMARY KEY,
+    cik           TEXT    NOT NULL,
+    series        TEXT    NOT NULL DEFAULT '',
+    form          TEXT    NOT NULL,
+    accepted_date TEXT    NOT NULL,
+    latest        INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (cik, series, accepted_date, form)
+);
+CREATE TABLE IF NOT EXISTS holdings (
+    filing INTEGER NOT NULL REFERENCES filings (id),
+    issuer TEXT    NOT NULL,
+    cusip  TEXT,
+    entity TEXT    NOT NULL,
+    shares INTEGER NOT NULL,
+    value  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS holdings_cusip  ON holdings (cusip) WHERE cusip IS NOT NULL;
+CREATE INDEX IF NOT EXISTS holdings_issuer ON holdings (issuer);
+CREATE INDEX IF NOT EXISTS holdings_filing ON holdings (filing);
+'''
+
+_COLUMNS = '''f.cik, f.series, f.form, f.accepted_date,
+              h.entity, h.cusip, h.shares, h.value'''
+
+_CUSIP = re.compile(r'[0-9A-Z]{8}[0-9]')
+
+################################### Class Definitions #######################################
+
+class HoldingsStore():
+    """
+    SQLite index of the holdings of every filing loaded into it, for the
+    reverse of what the reports answer: which filers hold an issuer, and
+    how much. Holdings are indexed by CUSIP, where the filing reports one,
+    and by normalized issuer name, so lookups take milliseconds however
+    many filings are loaded. Each filer's (or series') most recent filing
+    is flagged, so lookups can skip the history.
+
+    One store can be shared by threads; statements run one at a time.
+    """
+
+    def __init__(self, path=None):
+        self.path  = writers.bookkeeping_path(path, STORE_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.execute('PRAGMA synchronous = NORMAL')
+            self._conn.executescript(SCHEMA)
+
+    def load_report(self, report):
+        """
+        Given a Report13FHR or ReportNQ, replace any holdings stored for the
+        same filing, or series of it, with the report's. Return the number
+        of holdings stored.
+        """
+        date  = report.accepted_date
+        date  = date.isoformat() if hasattr(date, 'isoformat') else str(date)
+        cik   = tickers.normalize_cik(report.cik)
+        parts = ([(series.ID, series.holdings) for series in report.series]
+                 if hasattr(report, 'series') else [('', report.holdings)])
+        rows  = 0
+
+        with self._lock, self._conn:
+            for series, holdings in parts:
+                filing = self._filing(cik, series, report.submission_type, date)
+                self._conn.execute('DELETE FROM holdings WHERE filing = ?', (filing,))
+                rows += self._conn.executemany(
+                    'INSERT INTO holdings VALUES (?, ?, ?, ?, ?, ?)',
+                    _rows(filing, holdings)).rowcount
+
+        return rows
+
+    def holders(self, issuer, latest=True, limit=None):
+        """
+        Given a CUSIP or an issuer name, return the holdings of it as rows of
+        cik, series, form, accepted_date, entity, cusip, shares and value,
+        largest value first. A CUSIP also finds the holdings of filings that
+        report none but name the issuer as the CUSIP's holders do. Only each
+        filer's most recent filing is searched unless latest is False.
+        """
+        issuer = issuer.strip()
+        recent = 'AND f.latest = 1' if latest else ''
+
+        if _CUSIP.fullmatch(issuer.upper()):
+            cusip = issuer.upper()
+            query = ('SELECT ' + _COLUMNS + ' FROM holdings h JOIN filings f ON f.id = h.filing '
+                     'WHERE h.cusip = ? ' + recent + ' UNION ALL '
+                     'SELECT ' + _COLUMNS + ' FROM holdings h JOIN filings f ON f.id = h.filing '
+                     'WHERE h.cusip IS NULL AND h.issuer IN '
+                     '(SELECT DISTINCT issuer FROM holdings WHERE cusip = ?) ' + recent)
+            params = [cusip, cusip]
+        else:
+            query  = ('SELECT ' + _COLUMNS + ' FROM holdings h JOIN filings f ON f.id = h.filing '
+                      'WHERE h.issuer = ? ' + recent)
+            params = [diff.normalize_issuer(issuer)]
+
+        query += ' ORDER BY value DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def filer_holdings(self, cik, series=None, accepted_date=None):
+        """
+        Given a filer's CIK, return the holdings of its most recent filing,
+        or of the filing accepted on accepted_date, as rows like holders'.
+        An N-Q filer's series are all included unless one is given.
+        """
+        query  = ('SELECT ' + _COLUMNS + ' FROM holdings h JOIN filings f ON f.id = h.filing '
+                  'WHERE f.cik = ?')
+        params = [tickers.normalize_cik(cik)]
+
+        if series is not None:
+            query += ' AND f.series = ?'
+            params.append(series)
+        if accepted_date is None:
+            query += ' AND f.latest = 1'
+        else:
+            query += ' AND f.accepted_date = ?'
+            params.append(accepted_date)
+
+        with self._lock:
+            return self._conn.execute(query + ' ORDER BY f.series, h.value DESC',
+                                      params).fetchall()
+
+    def counts(self):
+        """Return the number of filings and holdings stored."""
+        with self._lock:
+            return (self._conn.execute('SELECT COUNT(*) FROM filings').fetchone()[0],
+                    self._conn.execute('SELECT COUNT(*) FROM holdings').fetchone()[0])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _filing(self, cik, series, form, date):
+        self._conn.execute('INSERT OR IGNORE INTO filings (cik, series, form, accepted_date) '
+                           'VALUES (?, ?, ?, ?)', (cik, series, form, date))
+        filing = self._conn.execute('SELECT id FROM filings WHERE cik = ? AND series = ? '
+                                    'AND accepted_date = ? AND form = ?',
+                                    (cik, series, date, form)).fetchone()[0]
+        # Amendments accepted the same day as the filing are current too
+        self._conn.execute('UPDATE filings SET latest = (accepted_date = '
+                           '(SELECT MAX(accepted_date) FROM filings WHERE cik = ? AND series = ?)) '
+                           'WHERE cik = ? AND series = ?', (cik, series, cik, series))
+        return filing
+
+################################ Helper Methods ##########################################
+
+current = None
+
+def use_store(store):
+    """
+    Load the report of every filing main generates into a HoldingsStore from
+    now on, or stop when store is None.
+    """
+    global current
+    current = store
+
+def _rows(filing, holdings):
+    """Helper method to turn holdings into rows of the holdings table"""
+    if isinstance(holdings, base.HoldingsTable):
+        cusips = getattr(holdings, 'cusips', None) or [None] * len(holdings)
+        for entity, cusip, shares, value in zip(holdings.entities, cusips,
+                                                holdings.shares, holdings.values):
+            yield (filing, diff.normalize_issuer(entity), cusip, entity, shares, value)
+        return
+
+    for holding in holdings:
+        yield (filing,
+               diff.normalize_issuer(holding.entity),
+               getattr(holding, 'cusip', None),
+               holding.entity,
+               holding.shares,
+               holding.value)
+
+def _print_rows(rows):
+    for row in rows:
+        print('\t'.join(str(row[column]) if row[column] is not None else ''
+                        for column in row.keys()))
+
+def main(argv=None):
+    """Entry point for querying the holdings store"""
+    parser = argparse.ArgumentParser(
+        prog='python -m holdings.store',
+        description='Query the holdings loaded by holdings.main or holdings.batch '
+                    'with --store.')
+    parser.add_argument('--db', default=None,
+                        help='location of the store (default: ' + STORE_FILE
+                             + ' in ' + writers.REPORTS_DIR + ')')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    holders = commands.add_parser('holders', help='who holds an issuer, by CUSIP or name')
+    holders.add_argument('issuer')
+    holders.add_argument('--all', action='store_true',
+                         help='search every filing, not only each filer\'s most recent')
+    holders.add_argument('-n', '--limit', type=int, default=None)
+
+    filer = commands.add_parser('filer', help='the holdings of a filer')
+    filer.add_argument('cik')
+    filer.add_argument('--series')
+    filer.add_argument('--date', help='accepted date of the filing, YYYY-MM-DD '
+                                      '(default: the most recent)')
+
+    commands.add_parser('stats', help='number of filings and holdings stored')
+
+    args  = parser.parse_args(argv)
+    store = HoldingsStore(args.db)
+
+    try:
+        if args.command == 'holders':
+            rows = store.holders(args.issuer, latest=not args.all, limit=args.limit)
+        elif args.command == 'filer':
+            rows = store.filer_holdings(args.cik, args.series, args.date)
+        else:
+            filings, holdings = store.counts()
+            print(str(filings) + ' filings, ' + str(holdings) + ' holdings')
+            return 0
+    finally:
+        store.close()
+
+    _print_rows(rows)
+    return 0 if rows else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import argparse
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings import web
+
+INDEX_FILE = os.path.join(os.path.expanduser('~'), '.holdings', 'tickers.json')
+
+# EDGAR's bulk ticker files, see https://www.sec.gov/os/accessing-edgar-data
+COMPANY_TICKERS_PATH     = '/files/company_tickers.json'
+MUTUAL_FUND_TICKERS_PATH = '/files/company_tickers_mf.json'
+
+################################### Class Definitions #######################################
+
+class TickerEntry():
+
+    __slots__ = ('ticker', 'cik', 'series_id', 'class_id', 'name')
+
+    def __init__(self, ticker, cik, series_id=None, class_id=None, name=None):
+        self.ticker    = ticker
+        self.cik       = cik
+        self.series_id = series_id
+        self.class_id  = class_id
+        self.name      = name
+
+    def __repr__(self):
+        return '{ticker}::{cik}'.format(
+            ticker=self.ticker,
+            cik=self.cik)
+
+
+class TickerIndex():
+    """
+    In-memory index of ticker --> CIK, series and class, plus CIK --> series,
+    for resolving tickers without searching EDGAR. An index built from
+    EDGAR's complete ticker files is marked complete, meaning a ticker it
+    doesn't know can be reported as missing without asking EDGAR.
+    """
+
+    def __init__(self, complete=False):
+        self.complete = complete
+        self._tickers = {}
+        self._series  = {}
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def add(self, ticker, cik, series_id=None, class_id=None, name=None):
+        entry = TickerEntry(ticker.upper(), normalize_cik(cik),
+                            series_id, class_id, name)
+        self._tickers[entry.ticker] = entry
+        if series_id:
+            self._series.setdefault(entry.cik, set()).add(series_id)
+        return entry
+
+    def lookup(self, ticker):
+        """Return the TickerEntry for a ticker, or None if it isn't known."""
+        return self._tickers.get(ticker.upper())
+
+    def series_for(self, cik):
+        """Return the sorted IDs of the series known for a CIK."""
+        return sorted(self._series.get(normalize_cik(cik), ()))
+
+    def add_company_tickers(self, data):
+        """
+        Add the entries of EDGAR's company_tickers.json, a dict of
+        {"0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}, ...}
+        """
+        for company in data.values():
+            self.add(company['ticker'], company['cik_str'], name=company.get('title'))
+
+    def add_mutual_fund_tickers(self, data):
+        """
+        Add the entries of EDGAR's company_tickers_mf.json, a dict of
+        {"fields": ["cik", "seriesId", "classId", "symbol"], "data": [...]}
+        """
+        fields = data['fields']
+        for row in data['data']:
+            fund = dict(zip(fields, row))
+            self.add(fund['symbol'], fund['cik'], fund['seriesId'], fund['classId'])
+
+    def add_series(self, series_list):
+        """
+        Add the class contract tickers of FundSeries objects parsed from a
+        filing, i.e. by reportnq.parse_series_and_contracts.
+        """
+        for series in series_list:
+            for contract in series.contracts:
+                if contract.ticker:
+                    self.add(contract.ticker, series.ownerCIK, series.ID,
+                             contract.ID, contract.name)
+
+    def save(self, path=INDEX_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as index_file:
+            json.dump({'complete': self.complete,
+                       'tickers':  [[entry.ticker, entry.cik, entry.series_id,
+                                     entry.class_id, entry.name]
+                                    for entry in self._tickers.values()]},
+                      index_file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with open(path, 'r') as index_file:
+            data = json.load(index_file)
+
+        index = cls(data.get('complete', False))
+        for row in data['tickers']:
+            index.add(*row)
+        return index
+
+################################ Helper Methods ##########################################
+
+def normalize_cik(cik):
+    """Return a CIK as EDGAR's 10 digit, zero-padded string."""
+    return str(cik).strip().zfill(10)
+
+def build_index(company_tickers=None, mutual_fund_tickers=None):
+    """
+    Build a complete TickerIndex from EDGAR's bulk ticker files, given their
+    parsed JSON or, when None, downloading them from EDGAR.
+    """
+    if company_tickers is None:
+        company_tickers = web.get(web.base_url + COMPANY_TICKERS_PATH).json()
+    if mutual_fund_tickers is None:
+        mutual_fund_tickers = web.get(web.base_url + MUTUAL_FUND_TICKERS_PATH).json()
+
+    index = TickerIndex(complete=True)
+    index.add_company_tickers(company_tickers)
+    index.add_mutual_fund_tickers(mutual_fund_tickers)
+    return index
+
+def main(argv=None):
+    """Entry point for building and querying the ticker index"""
+    parser = argparse.ArgumentParser(prog='python -m holdings.tickers')
+    parser.add_argument('--index', default=INDEX_FILE,
+                        help='location of the index (default: ' + INDEX_FILE + ')')
+    parser.add_argument('--edgar', default=None,
+                        help='base url of the EDGAR to build the index from')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='build the index from EDGAR\'s ticker files')
+    build.add_argument('--company-tickers',
+                       help='local copy of company_tickers.json')
+    build.add_argument('--mutual-fund-tickers',
+                       help='local copy of company_tickers_mf.json')
+
+    lookup = commands.add_parser('lookup', help='look tickers up in the index')
+    lookup.add_argument('tickers', nargs='+')
+
+    args = parser.parse_args(argv)
+
+    if args.edgar:
+        web.use_edgar(args.edgar)
+
+    if args.command == 'build':
+        files = []
+        for path in (args.company_tickers, args.mutual_fund_tickers):
+            if path is None:
+                files.append(None)
+            else:
+                with open(path, 'r') as ticker_file:
+                    files.append(json.load(ticker_file))
+
+        index = build_index(*files)
+        index.save(args.index)
+        print('Indexed ' + str(len(index)) + ' tickers in ' + args.index)
+        return 0
+
+    index  = TickerIndex.load(args.index)
+    status = 0
+    for ticker in args.tickers:
+        entry = index.lookup(ticker)
+        if entry is None:
+            print(ticker + '\tnot found')
+            status = 1
+        else:
+            print('\t'.join([entry.ticker, entry.cik,
+                             entry.series_id or '', entry.class_id or '']))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+logger = logging.getLogger(__name__)
+
+from holdings import cli
+from holdings import web
+from holdings import main
+from holdings import batch
+from holdings import metrics
+from holdings import tickers
+from holdings import writers
+from holdings import discovery
+
+# The accession numbers seen per filer and when the last poll started
+STATE_FILE = 'watch_state.json'
+
+# Accession numbers remembered per filer, enough to cover its company page
+MAX_ACCESSIONS = 100
+
+# Pages of the latest filings feed read per form before giving up on it and
+# checking every filer's own listing instead
+FEED_PAGES = 10
+FEED_COUNT = 100
+
+# The feed's clock and ours may disagree; look this far before the last poll
+OVERLAP = timedelta(hours=1)
+
+################################### Class Definitions #######################################
+
+class WatchState():
+    """
+    The filings a watch has already seen, as the accession numbers of each
+    watched ticker or CIK, the CIK it resolved to and when the last poll
+    started. Filers whose last check failed are marked stale, so the next
+    poll checks them directly rather than trusting the feed.
+    """
+
+    def __init__(self, polled=None, filers=None):
+        self.polled = polled
+        if filers is None:
+            filers = {}
+        self.filers = filers
+        self._lock  = threading.Lock()
+
+    @classmethod
+    def load(cls, path=None):
+        """Return the state saved at path, or an empty one if there is none."""
+        path = writers.bookkeeping_path(path, STATE_FILE)
+        try:
+            with open(path, 'r') as state_file:
+                saved = json.load(state_file)
+        except FileNotFoundError:
+            return cls()
+
+        polled = saved.get('polled')
+        return cls(datetime.fromisoformat(polled) if polled else None, saved.get('filers', {}))
+
+    def save(self, path=None):
+        """Write the state to path, replacing the previous one in one step."""
+        path = writers.bookkeeping_path(path, STATE_FILE)
+        with self._lock:
+            saved = {'polled': self.polled.isoformat() if self.polled else None,
+                     'filers': self.filers}
+        with open(path + '.tmp', 'w') as state_file:
+            json.dump(saved, state_file, indent=1, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    def seen(self, ticker):
+        with self._lock:
+            return set(self.filers.get(ticker, {}).get('accessions', []))
+
+    def cik(self, ticker):
+        with self._lock:
+            return self.filers.get(ticker, {}).get('cik')
+
+    def stale(self, ticker):
+        with self._lock:
+            return ticker not in self.filers or self.filers[ticker].get('stale', False)
+
+    def record(self, ticker, cik, accessions, stale=False):
+        """Remember accessions as seen for ticker, most recent first."""
+        with self._lock:
+            filer = self.filers.setdefault(ticker, {'cik': None, 'accessions': []})
+            known = [accession for accession in filer['accessions'] if accession not in accessions]
+            filer['accessions'] = (list(accessions) + known)[:MAX_ACCESSIONS]
+            filer['cik']        = cik or filer['cik']
+            filer['stale']      = stale
+
+
+class PollSummary():
+
+    def __init__(self, watched, checked, results, elapsed):
+        self.watched = watched
+        self.checked = checked
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def updated(self):
+        """The results of the CIKs that had new filings."""
+        return [result for result in self.results if result.ok and result.reportnames]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    def format(self):
+        lines = ['Polled {watched} CIKs in {elapsed:.1f}s, {checked} checked: '
+                 '{updated} with new filings ({reports} reports), {failed} failed'.format(
+                     watched=self.watched,
+                     elapsed=self.elapsed,
+                     checked=self.checked,
+                     updated=len(self.updated),
+                     reports=sum(len(result.reportnames) for result in self.updated),
+                     failed=len(self.failed))]
+
+        for result in self.failed:
+            lines.append('  {cik}: {error}'.format(cik=result.cik,
+                                                   error=type(result.error).__name__))
+
+        return '\n'.join(lines)
+
+################################ Helper Methods ##########################################
+
+def read_feed(forms, since):
+    """
+    Given a list of forms and a datetime, return a dict of CIK --> list of
+    Filings of those forms accepted since then according to EDGAR's latest
+    filings feed, or None if the feed doesn't reach back that far.
+    """
+    filings = {}
+
+    # The feed of a form type lists its amendments too
+    for form in sorted({form.split('/')[0] for form in forms}):
+        if not _read_feed_pages(form, forms, since, filings):
+            return None
+
+    return filings
+
+def _read_feed_pages(form, forms, since, filings):
+    """
+    Helper method to add the Filings of a form type's feed since `since` to
+    filings, returning whether the feed reached back that far
+    """
+    for page in range(FEED_PAGES):
+        entries = web.get_current_filings(form, page * FEED_COUNT, FEED_COUNT)
+        for entry_form, cik, archive, updated in entries:
+            if updated < since:
+                return True
+            if entry_form in forms:
+                filings.setdefault(cik, []).append(
+                    discovery.Filing(entry_form, cik, archive, updated.date()))
+        if len(entries) < FEED_COUNT:
+            return False
+
+    return False
+
+def _process(ticker, forms, state, fmt, filings=None):
+    """
+    Helper method to generate the reports of the filings of ticker not seen
+    yet, from the feed's filings when given or its own listing otherwise,
+    and record them in the state. A filer new to the watch only has its
+    most recent filing processed, as main would. Return a BatchResult.
+    """
+    start       = time.perf_counter()
+    reportnames = []
+    seen        = state.seen(ticker)
+
+    try:
+        if filings is None:
+            with metrics.stage('discover'):
+                # A listing cached before the filer's latest filing would hide it
+                filings = discovery.backend.find_filings(ticker, forms, fresh=True)
+        new = [filing for filing in filings if filing.accession not in seen]
+        if not seen:
+            new = new[:1]
+
+        for filing in reversed(new):
+            reportnames.extend(main.generate_recorded_report(filing, fmt))
+    except Exception as e:
+        logger.error('Failed to check ' + ticker + ' for new filings: ' + repr(e))
+        state.record(ticker, None, [], stale=True)
+        return batch.BatchResult(ticker, error=e, elapsed=time.perf_counter() - start)
+
+    cik = (tickers.normalize_cik(ticker) if ticker.isdigit()
+           else next((web.archive_cik(filing.archive) for filing in filings), None))
+    state.record(ticker, cik, [filing.accession for filing in filings])
+    return batch.BatchResult(ticker, reportnames, elapsed=time.perf_counter() - start)
+
+def poll(ciks, forms=None, state=None, workers=4, fmt='tsv'):
+    """
+    Given a list of tickers or CIKs, generate the reports of the filings
+    they made since the state's last poll and return a PollSummary. When
+    the latest filings feed reaches back to the last poll, only the filers
+    it lists are looked at; filers new to the watch, or whose last check
+    failed, are always checked on their own listing.
+    """
+    if forms is None:
+        forms = main.FORMS
+    if state is None:
+        state = WatchState()
+
+    start  = time.perf_counter()
+    polled = datetime.now(timezone.utc)
+    feed   = None
+
+    if state.polled is not None:
+        try:
+            with metrics.stage('discover'):
+                feed = read_feed(forms, state.polled - OVERLAP)
+        except Exception as e:
+            logger.warning('Failed to read the latest filings feed: ' + repr(e))
+        if feed is None:
+            logger.info('The latest filings feed doesn\'t reach back to '
+                        + state.polled.isoformat() + ', checking every CIK')
+
+    # Filers the feed doesn't list have nothing new
+    jobs = []
+    for ticker in ciks:
+        cik = state.cik(ticker)
+        if feed is None or state.stale(ticker) or cik is None:
+            jobs.append((ticker, None))
+        elif cik in feed:
+            jobs.append((ticker, feed[cik]))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda job: _process(job[0], forms, state, fmt, job[1]),
+                                    jobs))
+
+    state.polled = polled
+    return PollSummary(len(ciks), len(jobs), results, time.perf_counter() - start)
+
+def main_watch(argv=None):
+    """Entry point for generating the reports of new filings as they are made"""
+    parser = argparse.ArgumentParser(
+        prog='python -m holdings.watch',
+        description='Generate holdings reports for the filings a list of tickers or '
+                    'CIKs made since the last run.')
+    cli.add_source_argument(parser)
+    parser.add_argument('--state', default=None,
+                        help='file remembering the filings already processed '
+                             '(default: ' + STATE_FILE + ' in the output directory)')
+    parser.add_argument('--interval', type=float, default=None,
+                        help='keep polling, every this many seconds, instead of once')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='maximum number of CIKs checked at once')
+    cli.add_common_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cli.apply_common_arguments(args)
+
+    ciks = cli.read_source(args.source)
+
+    state = WatchState.load(args.state)
+
+    try:
+        while True:
+            summary = poll(ciks, state=state, workers=args.workers, fmt=args.format)
+            state.save(args.state)
+            print(summary.format())
+            metrics.emit(metrics.totals)
+
+            if args.interval is None:
+                return 0 if not summary.failed else 1
+            time.sleep(max(0.0, args.interval - summary.elapsed))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_watch())
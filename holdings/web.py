@@ -1,5 +1,35 @@
+import re
+import time
+import threading
+from datetime import datetime
+from urllib.parse import quote, urljoin
+from xml.etree import ElementTree
+
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from holdings import cache
+from holdings import metrics
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Where EDGAR is served from, see use_edgar
+BASE_URL = 'https://www.sec.gov'
+DATA_URL = 'https://data.sec.gov'
+
+# EDGAR allows at most 10 requests per second from a client and expects
+# automated tools to identify themselves in the User-Agent
+RATE_LIMIT     = 10
+USER_AGENT     = 'holdings/0.1 (https://github.com/cpackard/fundholdings)'
+MAX_RETRIES    = 4
+BACKOFF        = 0.5
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Namespace of the entries of EDGAR's latest filings feed
+ATOM = '{http://www.w3.org/2005/Atom}'
 
 class TickerNotFoundException(Exception):
     pass
@@ -7,25 +37,252 @@ class TickerNotFoundException(Exception):
 class HoldingInfoNotFoundException(Exception):
     pass
 
-def get_archive_links(ticker, *forms):
+
+class RateLimiter():
     """
-    Given a ticker or CIK number and a list of forms to search for,
-    return a list of Archive links containing information for those filings.
-    Forms can be any holding filing to look for, i.e. N-Q, 13F-HR, etc.
+    Token bucket allowing `rate` acquisitions per second on average and at
+    most `burst` at once. A single limiter can be shared between threads.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate     = rate
+        self.burst    = burst
+        self._tokens  = burst
+        self._updated = time.monotonic()
+        self._lock    = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now           = time.monotonic()
+                self._tokens  = min(self.burst,
+                                    self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def _new_session(pool_size=16):
+    """Return a keep-alive session with a connection pool per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+session        = _new_session()
+rate_limiter   = RateLimiter(RATE_LIMIT)
+response_cache = None
+ticker_index   = None
+base_url       = BASE_URL
+data_url       = DATA_URL
+
+def use_edgar(base=BASE_URL, data=None):
+    """
+    Send every request to the EDGAR served at base from now on, i.e. a local
+    mock_edgar server, with its JSON API at data. The JSON API is served by
+    base too unless given, except for the real EDGAR.
+    """
+    global base_url, data_url
+    base_url = base.rstrip('/')
+    if data is None:
+        data = DATA_URL if base_url == BASE_URL else base_url
+    data_url = data.rstrip('/')
+
+def use_ticker_index(index):
+    """
+    Resolve tickers with a tickers.TickerIndex from now on instead of
+    EDGAR's company search, or go back to searching when index is None.
+    """
+    global ticker_index
+    ticker_index = index
+
+def enable_cache(directory, **options):
+    """
+    Serve responses from a cache.DiskCache in directory from now on,
+    where options are passed on to the DiskCache.
+    """
+    global response_cache
+    response_cache = cache.DiskCache(directory, **options)
+    return response_cache
+
+def disable_cache():
+    global response_cache
+    response_cache = None
+
+def _retry_delay(response, attempt):
+    """
+    Return how long to wait before retrying a failed request, preferring the
+    server's Retry-After over exponential backoff.
     """
-    domain   = 'https://www.sec.gov'
-    url      = ('https://www.sec.gov/cgi-bin/browse-edgar?CIK='
-                + ticker + '&owner =exclude&action =getcompany')
-    response = requests.get(url)
+    retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+    if retry_after.isdigit():
+        return int(retry_after)
+    return BACKOFF * 2 ** attempt
+
+def _request(url, **kwargs):
+    """
+    Perform a GET on the shared session once the rate limiter allows it,
+    retrying with backoff on connection errors and 429/5xx responses.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        with metrics.stage('rate_limit'):
+            rate_limiter.acquire()
+        metrics.count('requests')
+        try:
+            with metrics.stage('http'):
+                response = session.get(url, **kwargs)
+            if not kwargs.get('stream'):
+                metrics.count('bytes_downloaded', len(response.content))
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError):
+            # A body cut short surfaces here when it isn't streamed
+            if attempt == MAX_RETRIES:
+                raise
+            response = None
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt == MAX_RETRIES:
+                response.raise_for_status()
+            response.close()
+
+        metrics.count('retries')
+        delay = _retry_delay(response, attempt)
+        logger.info('Retrying ' + url + ' in ' + str(delay) + 's')
+        time.sleep(delay)
+
+def _cached_response(url, entry, stream=False):
+    """Build a response that reads its body from a cache entry."""
+    response             = requests.Response()
+    response.url         = url
+    response.status_code = 200
+    response.encoding    = entry.encoding
+    response.raw         = response_cache.open(entry)
+    response.headers     = CaseInsensitiveDict({'X-Cache': 'HIT'})
+
+    if not stream:
+        # Read the body up front, as requests does, so the file is closed
+        response.content
+        response.raw.close()
+
+    return response
+
+def _store_response(url, response, **kwargs):
+    """
+    Stream a response's body into the cache and return its entry, requesting
+    the body again if it is cut short.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with response:
+                return response_cache.store(url,
+                                            metrics.instrument_stream(response.iter_content(64 * 1024)),
+                                            etag=response.headers.get('ETag'),
+                                            last_modified=response.headers.get('Last-Modified'),
+                                            encoding=response.encoding)
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            if attempt == MAX_RETRIES:
+                raise
+
+        metrics.count('retries')
+        time.sleep(_retry_delay(None, attempt))
+        response = _request(url, stream=True, **kwargs)
+        response.raise_for_status()
+
+def get(url, fresh=False, **kwargs):
+    """
+    Perform a GET for url, going through the response cache when one is
+    enabled. Archive documents are served from the cache forever, anything
+    else is revalidated with the server once its ttl has passed, or every
+    time when fresh is True.
+    """
+    if response_cache is None:
+        return _request(url, **kwargs)
+
+    stream = kwargs.pop('stream', False)
+    entry  = response_cache.lookup(url)
+
+    if entry is not None and (cache.is_immutable(url)
+                              or (not fresh and response_cache.is_fresh(entry))):
+        metrics.count('cache_hits')
+        return _cached_response(url, entry, stream)
+
+    headers = {}
+    if entry is not None and entry.etag:
+        headers['If-None-Match'] = entry.etag
+    if entry is not None and entry.last_modified:
+        headers['If-Modified-Since'] = entry.last_modified
+
+    response = _request(url, headers=headers, stream=True, **kwargs)
+
+    if entry is not None and response.status_code == 304:
+        metrics.count('cache_revalidations')
+        response.close()
+        response_cache.refresh(entry)
+    elif response.status_code == 200:
+        metrics.count('cache_misses')
+        entry = _store_response(url, response, **kwargs)
+    else:
+        return response
+
+    return _cached_response(url, entry, stream)
+
+def resolve_cik(ticker):
+    """
+    Given a ticker or CIK number, return the CIK from the ticker index when
+    it knows the ticker, otherwise return the ticker unchanged for EDGAR to
+    resolve. Raise TickerNotFoundException for a ticker missing from a
+    complete index.
+    """
+    if ticker_index is None or ticker.isdigit():
+        return ticker
+
+    entry = ticker_index.lookup(ticker)
+    if entry is not None:
+        return entry.cik
+    if ticker_index.complete:
+        raise TickerNotFoundException(ticker)
+    return ticker
+
+def get_company_page(ticker, start=None, count=None, fresh=False):
+    """
+    Given a ticker or CIK number, return the soup of its EDGAR company page,
+    optionally starting from the filing at offset `start`. A cached page is
+    revalidated with EDGAR first when fresh is True.
+    """
+    url = (base_url + '/cgi-bin/browse-edgar?CIK='
+           + resolve_cik(ticker) + '&owner =exclude&action =getcompany')
+    if start is not None:
+        url += '&start=' + str(start) + '&count=' + str(count)
+
+    response = get(url, fresh=fresh)
     content  = response.content
     soup     = BeautifulSoup(content, 'html.parser')
 
-    submission_type = ''
-    results         = []
-
     if 'No matching Ticker Symbol' in soup.get_text():
         raise TickerNotFoundException(ticker)
 
+    return soup
+
+def find_archive_links(soup, forms):
+    """
+    Given the soup of a company page, return the last matching form type
+    found and a list of (form type, archive link) pairs for the filings.
+    """
+    domain          = base_url
+    submission_type = ''
+    results         = []
+
     for tr in soup.find_all('tr'):
         tds = tr.find_all('td')
         for td in tds:
@@ -36,32 +293,192 @@ def get_archive_links(ticker, *forms):
                            in tr.find_all('a')
                            if href.get('href').startswith('/Archive')]
                 if archive:
-                    results.append(domain + archive[0])
+                    results.append((submission_type, domain + archive[0]))
 
     return submission_type, results
 
+def _has_next_page(soup):
+    """Whether a company page links to another page of older filings."""
+    return any(button.get('value', '').startswith('Next')
+               for button
+               in soup.find_all('input'))
+
+def get_archive_links(ticker, *forms):
+    """
+    Given a ticker or CIK number and a list of forms to search for,
+    return a list of Archive links containing information for those filings.
+    Forms can be any holding filing to look for, i.e. N-Q, 13F-HR, etc.
+    """
+    soup                     = get_company_page(ticker)
+    submission_type, results = find_archive_links(soup, forms)
+
+    return submission_type, [archive for form, archive in results]
+
+def get_filing_history(ticker, *forms, count=100, fresh=False):
+    """
+    Given a ticker or CIK number and a list of forms to search for, follow
+    every page of the company's filings and return a list of
+    (form type, archive link) pairs, most recent first. Cached pages are
+    revalidated with EDGAR first when fresh is True.
+    """
+    results = []
+    start   = 0
+
+    while True:
+        soup = get_company_page(ticker, start, count, fresh)
+        results.extend(find_archive_links(soup, forms)[1])
+
+        if not _has_next_page(soup):
+            return results
+        start += count
+
+def get_current_filings(form, start=0, count=100):
+    """
+    Given a form type, return a page of EDGAR's latest filings feed of that
+    form and its amendments as (form type, CIK, archive link, updated)
+    tuples, most recent first. The feed changes by the minute, so it is
+    never served from the response cache.
+    """
+    url = (base_url + '/cgi-bin/browse-edgar?action=getcurrent&type=' + quote(form)
+           + '&owner=include&start=' + str(start) + '&count=' + str(count) + '&output=atom')
+
+    response = _request(url)
+    response.raise_for_status()
+
+    results = []
+    for entry in ElementTree.fromstring(response.content).iter(ATOM + 'entry'):
+        title    = entry.findtext(ATOM + 'title', '')
+        link     = entry.find(ATOM + 'link')
+        category = entry.find(ATOM + 'category')
+        cik      = re.search(r'\((\d{10})\)', title)
+        if link is None or category is None or cik is None:
+            continue
+
+        results.append((category.get('term'),
+                        cik.group(1),
+                        urljoin(base_url, link.get('href')),
+                        datetime.fromisoformat(entry.findtext(ATOM + 'updated'))))
+
+    return results
+
+def archive_cik(archive):
+    """
+    Given an archive link, return the 10 digit CIK of the filer whose
+    directory it is in, i.e. 0001418814, or None if it isn't in one.
+    """
+    match = re.search(r'/edgar/data/(\d+)/', archive)
+    return match.group(1).zfill(10) if match else None
+
+def accession_number(archive):
+    """
+    Given an archive link, return the accession number of its filing,
+    i.e. 0001104659-16-156931, or None if the link doesn't contain one.
+    """
+    match = re.search(r'\d{10}-\d{2}-\d{6}', archive)
+    return match.group(0) if match else None
+
+def get_submission_link(archive):
+    """
+    Given an archive link, return the link to the complete submission text
+    file of the filing, or an empty string if the archive has none.
+    """
+    domain       = base_url
+    response     = get(archive)
+    content      = response.content
+    soup         = BeautifulSoup(content, 'html.parser')
+    holding_info = ''
+
+    for tr in soup.find_all('tr'):
+        if 'Complete submission text file' in tr.get_text():
+            holding_info = domain + tr.find('a').get('href')
+
+    return holding_info
+
 def get_holding_info(*archives):
     """
     Given a list of archive links, find and return the complete submission
     text file of each filing.
     """
-    domain  = 'https://www.sec.gov'
     results = []
 
     for archive in archives:
-        response     = requests.get(archive)
-        content      = response.content
-        soup         = BeautifulSoup(content, 'html.parser')
-        holding_info = ''
-
-        for tr in soup.find_all('tr'):
-            if 'Complete submission text file' in tr.get_text():
-                holding_info = domain + tr.find('a').get('href')
+        holding_info = get_submission_link(archive)
 
         if holding_info == '':
             raise HoldingInfoNotFoundException(archives)
         else:
-            r = requests.get(holding_info) # TODO catch exception here?
+            r = get(holding_info) # TODO catch exception here?
             results.append(r.text)
 
     return results
+
+def stream_holding_info(archive, chunk_size=64 * 1024):
+    """
+    Given an archive link, find the complete submission text file of the
+    filing and return an iterator over its text as it is downloaded.
+    """
+    holding_info = get_submission_link(archive)
+
+    if holding_info == '':
+        raise HoldingInfoNotFoundException(archive)
+
+    return stream_document(holding_info, chunk_size)
+
+def stream_document(url, chunk_size=64 * 1024):
+    """
+    Given the link to a document, return an iterator over its text as it
+    is downloaded. A body cut short is requested again and picked up where
+    it stopped. Raise an HTTPError if the document can't be fetched.
+    """
+    response = get(url, stream=True)
+    response.raise_for_status()
+
+    # Cached bodies, including ones just stored, were counted as downloaded already
+    counter = 'bytes_from_cache' if response.headers.get('X-Cache') == 'HIT' else 'bytes_downloaded'
+    return metrics.instrument_stream(
+        requests.utils.stream_decode_response_unicode(
+            _resumed_chunks(url, response, chunk_size), response), counter)
+
+def _resumed_chunks(url, response, chunk_size):
+    """
+    Helper method to yield the byte chunks of a streamed response's body,
+    requesting the document again, and skipping what was already yielded,
+    whenever the body ends early: with an error, or short of its Content-Length
+    """
+    received = 0
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            if response is None:
+                response = get(url, stream=True)
+                response.raise_for_status()
+
+            with response:
+                skip = received
+                read = 0
+                for chunk in response.iter_content(chunk_size):
+                    read += len(chunk)
+                    if skip >= len(chunk):
+                        skip -= len(chunk)
+                        continue
+                    chunk     = chunk[skip:]
+                    skip      = 0
+                    received += len(chunk)
+                    yield chunk
+
+            # A decoded body's length can't be checked against the header
+            length = response.headers.get('Content-Length', '')
+            if 'Content-Encoding' in response.headers or not length.isdigit() or read >= int(length):
+                return
+            if attempt == MAX_RETRIES:
+                raise requests.exceptions.ChunkedEncodingError(
+                    url + ' ended after ' + str(read) + ' of ' + length + ' bytes')
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            if attempt == MAX_RETRIES:
+                raise
+
+        metrics.count('retries')
+        delay = _retry_delay(None, attempt)
+        logger.info('Resuming ' + url + ' after ' + str(received) + ' bytes in ' + str(delay) + 's')
+        time.sleep(delay)
+        response = None
@@ -0,0 +1,323 @@
+import io
+import os
+import csv
+import sys
+import mmap
+import shutil
+import struct
+import itertools
+import threading
+import contextlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from holdings.dto import base
+
+FIELDS = ['entity', 'shares', 'value']
+
+# Where reports are written, see use_output_dir
+REPORTS_DIR = 'reports'
+
+# Rows of a tab-delimited report formatted per write
+BUFFER_ROWS = 512
+
+# Most reports of one filing written at once
+WRITE_WORKERS = 8
+
+# Columnar report layout: a 16 byte header of magic, version and row count,
+# then the shares and values as int64 columns, then rows + 1 int64 offsets
+# into a final blob of utf-8 issuer names. Integers are little-endian, and
+# every column is 8 byte aligned so it can be read in place from an mmap.
+COLUMNAR_MAGIC   = b'HLDC'
+COLUMNAR_VERSION = 1
+COLUMNAR_HEADER  = struct.Struct('<4sIQ')
+
+################################### Class Definitions #######################################
+
+class ReportWriter():
+    """Base class of the report formats, writing one file of holdings."""
+
+    extension = ''
+
+    def write(self, path, holdings):
+        raise NotImplementedError('Please implement this method.')
+
+
+class TSVWriter(ReportWriter):
+    """Tab-delimited text with an entity/shares/value header row."""
+
+    extension = '.txt'
+
+    def write(self, path, holdings):
+        with open(path, 'w', newline='') as report:
+            report.write('\t'.join(FIELDS) + '\r\n')
+            for rows in _row_chunks(holdings, BUFFER_ROWS):
+                report.write(_format_tsv(rows))
+
+
+class ColumnarWriter(ReportWriter):
+    """Dependency-free binary columnar format, read back with ColumnarReport."""
+
+    extension = '.hld'
+
+    def write(self, path, holdings):
+        entities, shares, values = _int_columns(holdings)
+
+        names   = [entity.encode('utf-8') for entity in entities]
+        offsets = array('q', [0])
+        for name in names:
+            offsets.append(offsets[-1] + len(name))
+
+        with open(path, 'wb') as report:
+            report.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION,
+                                              len(entities)))
+            for column in (shares, values, offsets):
+                report.write(_little_endian(column).tobytes())
+            report.write(b''.join(names))
+
+
+class ParquetWriter(ReportWriter):
+    """Apache Parquet, with shares and values as int64 columns. Needs pyarrow."""
+
+    extension = '.parquet'
+
+    def __init__(self):
+        if pyarrow is None:
+            raise ImportError('The parquet format requires pyarrow to be installed')
+
+    def write(self, path, holdings):
+        entities, shares, values = _int_columns(holdings)
+
+        table = pyarrow.table({'entity': entities,
+                               'shares': pyarrow.array(shares, pyarrow.int64()),
+                               'value':  pyarrow.array(values, pyarrow.int64())})
+        pyarrow.parquet.write_table(table, path)
+
+
+class ColumnarReport():
+    """
+    Read-only view of a columnar report. The file is memory-mapped and the
+    shares and values columns are exposed as memoryviews over the map, so
+    opening a report costs nothing until its rows are used.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as report:
+            self._mmap = mmap.mmap(report.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, rows = COLUMNAR_HEADER.unpack_from(self._mmap)
+        if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+            self._mmap.close()
+            raise ValueError(path + ' is not a columnar holdings report')
+
+        view  = memoryview(self._mmap)
+        start = COLUMNAR_HEADER.size
+        size  = 8 * rows
+
+        self.rows     = rows
+        self._view    = view
+        self.shares   = _column(view, start, rows)
+        self.values   = _column(view, start + size, rows)
+        self._offsets = _column(view, start + 2 * size, rows + 1)
+        self._names   = start + 3 * size + 8
+
+    def entity(self, index):
+        """Return the issuer name of the row at index."""
+        start = self._names + self._offsets[index]
+        end   = self._names + self._offsets[index + 1]
+        return bytes(self._view[start:end]).decode('utf-8')
+
+    def to_table(self):
+        """Copy the report into a HoldingsTable."""
+        return base.HoldingsTable([self.entity(i) for i in range(self.rows)],
+                                  self.shares, self.values)
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for index in range(self.rows):
+            yield base.Holding(self.entity(index), self.shares[index], self.values[index])
+
+    def close(self):
+        for column in (self.shares, self.values, self._offsets, self._view):
+            if isinstance(column, memoryview):
+                column.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+################################ Helper Methods ##########################################
+
+output_dir = REPORTS_DIR
+
+def use_output_dir(directory=REPORTS_DIR):
+    """Write reports to directory from now on, creating it if need be."""
+    global output_dir
+    os.makedirs(directory, exist_ok=True)
+    output_dir = directory
+
+def report_path(name):
+    """Given a report name, return where it is written."""
+    return os.path.join(output_dir, name)
+
+def bookkeeping_path(path, name):
+    """
+    Given the path of a file kept alongside the reports, such as a manifest
+    or a store, or None for its default name in the output directory, return
+    the path once the directory it goes in exists.
+    """
+    if path is None:
+        path = report_path(name)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return path
+
+def write_report(writer, name, holdings):
+    """
+    Given a ReportWriter, a report name and holdings, write the report into
+    the output directory and return its path. The report is written to a
+    temporary file beside it and renamed into place, so a reader never sees
+    one half written, even if the process dies mid-write.
+    """
+    path = report_path(name)
+    with _replacing(path) as temp:
+        writer.write(temp, holdings)
+    return path
+
+def write_reports(writer, reports):
+    """
+    Given a ReportWriter and a list of (report name, holdings), write each
+    report as write_report does, several at once. Reports of the same
+    holdings object, like the series of an N-Q sharing one schedule, are
+    formatted once and copied.
+    """
+    unique = {}
+    copies = []
+
+    for name, holdings in reports:
+        if id(holdings) in unique:
+            copies.append((unique[id(holdings)][0], name))
+        else:
+            unique[id(holdings)] = (name, holdings)
+
+    if len(unique) > 1:
+        with ThreadPoolExecutor(max_workers=min(WRITE_WORKERS, len(unique))) as executor:
+            list(executor.map(lambda report: write_report(writer, *report), unique.values()))
+    else:
+        for name, holdings in unique.values():
+            write_report(writer, name, holdings)
+
+    for source, name in copies:
+        with _replacing(report_path(name)) as temp:
+            shutil.copyfile(report_path(source), temp)
+
+@contextlib.contextmanager
+def _replacing(path):
+    """
+    Helper method to yield a temporary path to write in place of path, which
+    is renamed over path once written, or removed if writing fails
+    """
+    directory, name = os.path.split(path)
+    temp = os.path.join(directory, '.{name}.{pid}.{thread}.tmp'.format(
+        name=name, pid=os.getpid(), thread=threading.get_ident()))
+
+    try:
+        yield temp
+        os.replace(temp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp)
+        raise
+
+def _int_columns(holdings):
+    """
+    Helper method to get the entity, shares and value columns of holdings,
+    the amounts as int64 arrays, without building a table for a list
+    """
+    if isinstance(holdings, base.HoldingsTable):
+        return holdings.entities, holdings.shares, holdings.values
+
+    entities, shares, values = [], array('q'), array('q')
+    for holding in holdings:
+        entities.append(holding.entity)
+        shares.append(holding.shares)
+        values.append(holding.value)
+    return entities, shares, values
+
+def _row_chunks(holdings, size):
+    """Helper method to yield lists of size (entity, shares, value) rows of holdings"""
+    if isinstance(holdings, base.HoldingsTable):
+        rows = holdings.rows()
+    else:
+        rows = ((holding.entity, holding.shares, holding.value) for holding in holdings)
+
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _format_tsv(rows):
+    """
+    Helper method to format rows, their amounts as plain integers, as a
+    tab-delimited csv.writer would, with one string operation per row.
+    csv.writer only quotes fields holding a tab, a quote or a line break,
+    so rows are formatted by it only when the text shows one of those.
+    """
+    text = ''.join(['%s\t%d\t%d\r\n' % row for row in rows])
+
+    if ('"' in text
+            or text.count('\t') != 2 * len(rows)
+            or text.count('\n') != len(rows)
+            or text.count('\r') != len(rows)):
+        buffer = io.StringIO()
+        csv.writer(buffer, delimiter='\t').writerows(rows)
+        text = buffer.getvalue()
+
+    return text
+
+WRITERS = {
+    'tsv':      TSVWriter,
+    'columnar': ColumnarWriter,
+    'parquet':  ParquetWriter,
+}
+
+def get_writer(fmt):
+    """Given the name of a report format, return a writer for it."""
+    try:
+        return WRITERS[fmt]()
+    except KeyError:
+        raise ValueError('Unknown report format: ' + str(fmt))
+
+def _little_endian(column):
+    """Helper method to get an int64 array in the columnar byte order"""
+    if sys.byteorder == 'little':
+        return column
+    column = array('q', column)
+    column.byteswap()
+    return column
+
+def _column(view, start, rows):
+    """Helper method to read an int64 column, in place when possible"""
+    column = view[start:start + 8 * rows]
+    if sys.byteorder == 'little':
+        return column.cast('q')
+    return _little_endian(array('q', column.tobytes()))
+
+def read_parquet(path):
+    """Read a parquet report as a pyarrow Table, memory-mapping the file."""
+    if pyarrow is None:
+        raise ImportError('The parquet format requires pyarrow to be installed')
+    return pyarrow.parquet.read_table(path, memory_map=True)
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from holdings import web
+from holdings import store
+from holdings import metrics
+from holdings import writers
+from holdings import discovery
+from holdings import mock_edgar
+
+from holdings.dto import reportnq
+
+# Module settings the code under test may change, restored after every test
+SETTINGS = [(web, 'base_url'), (web, 'data_url'), (web, 'ticker_index'),
+            (web, 'response_cache'), (discovery, 'backend'), (store, 'current'),
+            (writers, 'output_dir'), (metrics, 'summary_file'), (metrics, 'totals')]
+
+class MockEdgarTestCase(unittest.TestCase):
+    """
+    Serves the fixtures from a mock_edgar server, with web pointed at it and
+    retries made quick, from a temporary working directory with a reports
+    directory. Every module setting, and the N-Q layouts learnt per filer,
+    are put back as they were once the test is over.
+    """
+
+    options = {}
+
+    def setUp(self):
+        self._settings = [(module, name, getattr(module, name)) for module, name in SETTINGS]
+        self._layouts  = dict(reportnq._layouts)
+
+        self.edgar = mock_edgar.MockEdgar(**self.options)
+        self.ciks  = mock_edgar.load_fixtures(self.edgar)
+        self.edgar.start()
+        self.addCleanup(self.edgar.stop)
+
+        web.use_edgar(self.edgar.url)
+
+        patcher = mock.patch.object(web, 'BACKOFF', 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'reports'))
+        os.chdir(self.directory)
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(os.chdir, self.cwd)
+
+    def tearDown(self):
+        for module, name, value in self._settings:
+            setattr(module, name, value)
+        reportnq._layouts.clear()
+        reportnq._layouts.update(self._layouts)
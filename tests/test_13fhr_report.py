@@ -1,9 +1,13 @@
+import os
 import unittest
 import datetime
 import xml
 
 from holdings.dto import report13fhr
 
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'resources')
+
 class TestGet13FXML(unittest.TestCase):
 
     def test_returns_empty_string_for_other_xml(self):
@@ -75,12 +79,12 @@ class TestGet13FHoldings(unittest.TestCase):
         holding2 = result.holdings[1]
 
         self.assertEqual(holding1.entity, 'ALLIANCE DATA SYSTEMS CORP')
-        self.assertEqual(holding1.shares, '5000000')
-        self.assertEqual(holding1.value, '1072650')
+        self.assertEqual(holding1.shares, 5000000)
+        self.assertEqual(holding1.value, 1072650)
 
         self.assertEqual(holding2.entity, 'ALLISON TRANSMISSION HLDGS I')
-        self.assertEqual(holding2.shares, '19125204')
-        self.assertEqual(holding2.value, '548511')
+        self.assertEqual(holding2.shares, 19125204)
+        self.assertEqual(holding2.value, 548511)
 
     def test_parse_valid_xml_without_namespace(self):
         holding_xml     = '/home/chpack/Documents/python/quovo_challenge/christian_packard/fund_holdings/resources/13f_hr_no_namespace.xml'
@@ -95,12 +99,105 @@ class TestGet13FHoldings(unittest.TestCase):
         holding2 = result.holdings[1]
 
         self.assertEqual(holding1.entity, 'ARCOS DORADOS HOLDINGS INC')
-        self.assertEqual(holding1.shares, '3060500')
-        self.assertEqual(holding1.value, '16129')
+        self.assertEqual(holding1.shares, 3060500)
+        self.assertEqual(holding1.value, 16129)
 
         self.assertEqual(holding2.entity, 'AUTONATION INC')
-        self.assertEqual(holding2.shares, '1898717')
-        self.assertEqual(holding2.value, '92487')
+        self.assertEqual(holding2.shares, 1898717)
+        self.assertEqual(holding2.value, 92487)
+
+
+class TestHolding13F(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(RESOURCES, '13f_hr_with_namespace.xml'), 'r') as holdings:
+            self.report = report13fhr.get_13f_holdings('0001166559', datetime.date(2016, 11, 14),
+                                                       '13F-HR', holdings.read())
+
+    def test_keeps_every_infotable_field(self):
+        holding = self.report.holdings[0]
+
+        self.assertIsInstance(holding, report13fhr.Holding13F)
+        self.assertEqual('018581108', holding.cusip)
+        self.assertEqual('COM', holding.title_of_class)
+        self.assertEqual('SH', holding.amount_type)
+        self.assertIsNone(holding.put_call)
+        self.assertEqual('SOLE', holding.investment_discretion)
+        self.assertEqual('1', holding.other_manager)
+        self.assertEqual((5000000, 1072650), (holding.shares, holding.value))
+        self.assertEqual((5000000, 0, 0),
+                         (holding.voting_sole, holding.voting_shared, holding.voting_none))
+        self.assertFalse(hasattr(holding, '__dict__'))
+
+    def test_interns_repeated_values(self):
+        first, second = self.report.holdings[:2]
+
+        self.assertIs(first.title_of_class, second.title_of_class)
+        self.assertIs(first.investment_discretion, second.investment_discretion)
+
+    def test_reads_put_call_and_missing_fields(self):
+        informationTable = ('<informationTable><infoTable><nameOfIssuer>APPLE INC</nameOfIssuer>'
+                            '<titleOfClass>CALL</titleOfClass><cusip>037833950</cusip>'
+                            '<value>1,000</value><shrsOrPrnAmt><sshPrnamt>100</sshPrnamt>'
+                            '<sshPrnamtType>SH</sshPrnamtType></shrsOrPrnAmt><putCall>Call</putCall>'
+                            '<investmentDiscretion>DFND</investmentDiscretion>'
+                            '</infoTable></informationTable>')
+        holding = list(report13fhr.iter_13f_holdings([informationTable]))[0]
+
+        self.assertEqual((100, 1000), (holding.shares, holding.value))
+        self.assertEqual('Call', holding.put_call)
+        self.assertEqual('DFND', holding.investment_discretion)
+        self.assertIsNone(holding.other_manager)
+        self.assertEqual(0, holding.voting_sole)
+
+    def test_compacts_into_encoded_columns(self):
+        holdings = list(self.report.holdings)
+        self.report.compact_holdings()
+        table = self.report.holdings
+
+        self.assertIsInstance(table, report13fhr.Holdings13FTable)
+        self.assertEqual(['COM', 'CL A', 'COM NEW', 'SHS', 'CL B'], table.coded['title_of_class'].values)
+        self.assertEqual(len(holdings), len(table.coded['title_of_class'].codes))
+        self.assertEqual([h.cusip for h in holdings], table.cusips)
+        self.assertEqual([repr(h) for h in holdings], [repr(h) for h in table])
+        self.assertEqual([h.voting_sole for h in holdings[1:3]],
+                         [h.voting_sole for h in table[1:3]])
+        self.assertEqual('SOLE', table[5].investment_discretion)
+        self.assertRaises(TypeError, report13fhr.Holdings13FTable, ['APPLE INC'], [1], [2])
+
+
+class TestStream13FHoldings(unittest.TestCase):
+
+    def test_yields_holdings_from_chunks(self):
+        with open(os.path.join(RESOURCES, '13f_hr_with_namespace.xml'), 'r') as holdings:
+            chunks = iter(lambda: holdings.read(100), '')
+            result = list(report13fhr.iter_13f_holdings(chunks))
+
+        self.assertEqual(result[0].entity, 'ALLIANCE DATA SYSTEMS CORP')
+        self.assertEqual(result[0].shares, 5000000)
+        self.assertEqual(result[0].value, 1072650)
+        self.assertEqual(result[1].entity, 'ALLISON TRANSMISSION HLDGS I')
+
+    def test_matches_get_13f_holdings(self):
+        path = os.path.join(RESOURCES, 'gates_fund_complete_text_submission.txt')
+        with open(path, 'r') as text_submission:
+            accepted_date, submission_type, holdings_xml = report13fhr.get_13f_xml(text_submission.read())
+        expected = report13fhr.get_13f_holdings('0001166559', accepted_date,
+                                                submission_type, holdings_xml)
+
+        with open(path, 'r') as text_submission:
+            result = report13fhr.read_13f_report('0001166559', text_submission)
+
+        self.assertEqual(result.accepted_date, expected.accepted_date)
+        self.assertEqual(result.submission_type, '13F-HR')
+        self.assertEqual(13, len(result.holdings))
+        self.assertEqual([str(h) for h in result.holdings],
+                         [str(h) for h in expected.holdings])
+
+    def test_raises_exception_with_malformed_chunks(self):
+        chunks = ['<informationTable><infoTable>', '</informationTable>']
+        self.assertRaises(xml.etree.ElementTree.ParseError,
+                          list, report13fhr.iter_13f_holdings(chunks))
 
 
 if __name__ == '__main__':
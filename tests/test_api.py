@@ -0,0 +1,51 @@
+import os
+import unittest
+from unittest import mock
+
+from holdings import api
+from holdings import main
+from holdings import discovery
+
+from tests.helpers import MockEdgarTestCase
+
+class TestFetchHoldings(MockEdgarTestCase):
+
+    def test_returns_reports_without_writing_them(self):
+        report = api.fetch_holdings('0001418814')
+
+        self.assertEqual(13, len(report.holdings))
+        self.assertEqual('13F-HR', report.submission_type)
+        self.assertEqual(['S000002853', 'S000002855'],
+                         [series.ID for series in api.fetch_holdings('VIIIX').series])
+        self.assertEqual([], os.listdir('reports'))
+
+    def test_hands_reports_to_the_sink(self):
+        sink     = api.FileSink('columnar')
+        received = []
+
+        api.fetch_holdings('0001418814', sink=sink)
+        report = api.fetch_holdings('0000862084', sink=received.append)
+
+        self.assertEqual(['0001418814_2016_11_15.hld'], sink.reportnames)
+        self.assertEqual(['0001418814_2016_11_15.hld'], os.listdir('reports'))
+        self.assertEqual([report], received)
+        self.assertRaises(ValueError, api.get_sink, 42)
+        self.assertRaises(ValueError, api.get_sink, 'xlsx')
+
+    def test_raises_instead_of_exiting(self):
+        self.assertRaises(discovery.FilingNotFoundException,
+                          api.fetch_holdings, '0001418814', ['10-K'])
+        self.assertRaises(discovery.FilingNotFoundException,
+                          main.generate_report, '0001418814', ['10-K'])
+
+        filing = discovery.Filing('10-K', '0001418814', self.edgar.url + '/Archives/edgar/data/'
+                                  '1418814/000141881216000209/0001418812-16-000209-index.htm')
+        with mock.patch.object(discovery.backend, 'find_filings', return_value=[filing]):
+            self.assertRaises(discovery.UnsupportedFormException,
+                              api.fetch_holdings, '0001418814', ['10-K'])
+            self.assertRaises(discovery.UnsupportedFormException,
+                              main.generate_report, '0001418814', ['10-K'])
+
+
+if __name__ == '__main__':
+    unittest.main()
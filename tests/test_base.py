@@ -0,0 +1,78 @@
+import datetime
+import unittest
+
+from holdings.dto import base
+from holdings.dto import reportnq
+from holdings.dto import report13fhr
+
+class TestHolding(unittest.TestCase):
+
+    def test_has_no_instance_dict(self):
+        holding = base.Holding('* Amazon.com Inc.', 4365551, 3655319)
+        self.assertFalse(hasattr(holding, '__dict__'))
+        self.assertEqual('* Amazon.com Inc.\t4365551\t3655319', str(holding))
+
+
+class TestParseAmount(unittest.TestCase):
+
+    def test_parses_reported_amounts(self):
+        self.assertEqual(4365551, base.parse_amount('4,365,551'))
+        self.assertEqual(5000000, base.parse_amount(' 5000000 '))
+        self.assertEqual(-1500, base.parse_amount('(1,500)'))
+
+    def test_raises_exception_for_text(self):
+        self.assertRaises(ValueError, base.parse_amount, 'Shares')
+
+
+class TestHoldingsTable(unittest.TestCase):
+
+    def setUp(self):
+        self.holdings = [base.Holding('* Amazon.com Inc.', 4365551, 3655319),
+                         base.Holding('Comcast Corp. Class A', 26655358, 1768316)]
+
+    def test_round_trips_holdings(self):
+        table = base.HoldingsTable.from_holdings(self.holdings)
+
+        self.assertEqual(2, len(table))
+        self.assertEqual([4365551, 26655358], list(table.shares))
+        self.assertEqual([3655319, 1768316], list(table.values))
+        self.assertEqual(['* Amazon.com Inc.\t4365551\t3655319',
+                          'Comcast Corp. Class A\t26655358\t1768316'],
+                         [str(holding) for holding in table.to_holdings()])
+
+    def test_keeps_amounts_as_ints(self):
+        holdings = [base.Holding('Plain Inc.', 5000000, 1200),
+                    base.Holding('Short Corp.', -1500, -12)]
+        table    = base.HoldingsTable.from_holdings(holdings)
+
+        self.assertEqual([(5000000, 1200), (-1500, -12)],
+                         [(holding.shares, holding.value) for holding in table])
+        self.assertEqual([('Short Corp.', -1500, -12)], list(table[1:].rows()))
+
+    def test_indexes_rows_and_slices(self):
+        table = base.HoldingsTable.from_holdings(self.holdings)
+
+        self.assertEqual('Comcast Corp. Class A', table[1].entity)
+        self.assertEqual(26655358, table[-1].shares)
+        self.assertEqual(['* Amazon.com Inc.'], table[:1].entities)
+
+    def test_compacts_report_holdings(self):
+        series = [reportnq.FundSeries('S000002853', '0000862084', 'Index Fund'),
+                  reportnq.FundSeries('S000002855', '0000862084', 'Total Stock Market')]
+        for s in series:
+            s.holdings = self.holdings
+        report = reportnq.ReportNQ('0000862084', datetime.date(2016, 11, 30), 'N-Q', series)
+
+        report.compact_holdings()
+
+        self.assertIsInstance(series[0].holdings, base.HoldingsTable)
+        self.assertIs(series[0].holdings, series[1].holdings)
+
+        report = report13fhr.Report13FHR('0001166559', datetime.date(2016, 11, 14),
+                                         '13F-HR', self.holdings)
+        report.compact_holdings()
+        self.assertEqual(2, len(report.holdings))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+from holdings import web
+from holdings import batch
+from holdings import discovery
+
+from holdings.dto import reportnq
+
+class TestRunBatch(unittest.TestCase):
+
+    def test_isolates_failures_per_cik(self):
+        def generate_report(cik, forms, fmt='tsv'):
+            if cik == 'whatever':
+                raise web.TickerNotFoundException(cik)
+            if cik == 'broken':
+                raise reportnq.InvalidSeriesTextException('bad series')
+            if cik == 'unknown':
+                raise discovery.UnsupportedFormException('10-K')
+            return [cik + '.txt']
+
+        ciks = ['viiix', 'whatever', 'broken', 'unknown', '0001166559']
+
+        with mock.patch('holdings.main.generate_report', generate_report):
+            summary = batch.run_batch(ciks, workers=2)
+
+        self.assertEqual(ciks, [result.cik for result in summary.results])
+        self.assertEqual(['viiix', '0001166559'],
+                         [result.cik for result in summary.succeeded])
+        self.assertEqual(['viiix.txt'], summary.results[0].reportnames)
+        self.assertEqual({'TickerNotFoundException': ['whatever'],
+                          'InvalidSeriesTextException': ['broken'],
+                          'UnsupportedFormException': ['unknown']},
+                         summary.failures_by_type())
+        self.assertGreater(summary.throughput, 0)
+
+    def test_respects_worker_limit(self):
+        lock    = threading.Lock()
+        active  = [0]
+        highest = [0]
+
+        def generate_report(cik, forms, fmt='tsv'):
+            with lock:
+                active[0] += 1
+                highest[0] = max(highest[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return []
+
+        with mock.patch('holdings.main.generate_report', generate_report):
+            summary = batch.run_batch([str(i) for i in range(20)], workers=3)
+
+        self.assertEqual(20, len(summary.succeeded))
+        self.assertLessEqual(highest[0], 3)
+        self.assertGreater(highest[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from benchmarks import suite
+
+from holdings.dto import report13fhr
+
+def _results(calibration, seconds, peak_bytes):
+    return {'calibration': calibration,
+            'cases': {'get_nq_report@10x': {'rows': 15550, 'bytes': 1,
+                                            'seconds': seconds,
+                                            'peak_bytes': peak_bytes}}}
+
+class TestCompare(unittest.TestCase):
+
+    def setUp(self):
+        self.baselines = _results(0.1, 1.5, 40 * 2 ** 20)
+
+    def test_accepts_results_within_tolerance(self):
+        self.assertEqual([], suite.compare(_results(0.1, 2.0, 45 * 2 ** 20), self.baselines))
+
+    def test_flags_slowdowns_and_memory_growth(self):
+        regressions = suite.compare(_results(0.1, 3.0, 60 * 2 ** 20), self.baselines)
+
+        self.assertEqual(2, len(regressions))
+        self.assertTrue(all(message.startswith('get_nq_report@10x')
+                            for message in regressions))
+
+    def test_normalizes_timings_for_slower_machines(self):
+        self.assertEqual([], suite.compare(_results(0.2, 3.0, 40 * 2 ** 20), self.baselines))
+
+    def test_skips_cases_without_baselines(self):
+        self.baselines['cases'] = {}
+        self.assertEqual([], suite.compare(_results(0.1, 30.0, 2 ** 30), self.baselines))
+
+
+class TestScaling(unittest.TestCase):
+
+    def test_repeats_every_holding(self):
+        text   = suite._read('gates_fund_complete_text_submission.txt')
+        scaled = suite.scale_13f_submission(text, 10)
+
+        holdings = report13fhr.get_13f_holdings('0001418814',
+                                                *report13fhr.get_13f_xml(scaled))
+        self.assertEqual(130, len(holdings.holdings))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from holdings import web
+from holdings import cache
+
+class _ValidatingHandler(BaseHTTPRequestHandler):
+    """Serve a fixed body with an ETag, answering 304 to a matching request."""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = ('body of ' + self.path).encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_round_trips_compressed_bodies(self):
+        store = cache.DiskCache(self.directory)
+        url   = 'https://www.sec.gov/Archives/edgar/data/1/0001.txt'
+        store.store(url, [b'<SEC-DOCUMENT>', b' ' * 10000], etag='"abc"')
+
+        entry = store.lookup(url)
+        with store.open(entry) as body:
+            self.assertEqual(b'<SEC-DOCUMENT>' + b' ' * 10000, body.read())
+        self.assertEqual('"abc"', entry.etag)
+        self.assertLess(entry.size, 1000)
+
+    def test_misses_unknown_urls(self):
+        store = cache.DiskCache(self.directory)
+        self.assertIsNone(store.lookup('https://www.sec.gov/unknown'))
+
+    def test_evicts_least_recently_used(self):
+        store = cache.DiskCache(self.directory, max_bytes=2500, compress=False)
+        for name in ('a', 'b'):
+            store.store(name, [b'x' * 1000])
+            time.sleep(0.01)
+        # Using 'a' makes 'b' the least recently used body
+        store.lookup('a')
+        time.sleep(0.01)
+        store.store('c', [b'x' * 1000])
+
+        self.assertIsNotNone(store.lookup('a'))
+        self.assertIsNone(store.lookup('b'))
+        self.assertIsNotNone(store.lookup('c'))
+
+    def test_only_archives_are_immutable(self):
+        self.assertTrue(cache.is_immutable(
+            'https://www.sec.gov/Archives/edgar/data/1166559/0001104659-16-156931.txt'))
+        self.assertFalse(cache.is_immutable(
+            'https://www.sec.gov/cgi-bin/browse-edgar?CIK=viiix'))
+
+
+class TestCachedGet(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _ValidatingHandler)
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.shutdown)
+        self.base = 'http://127.0.0.1:%d' % self.server.server_port
+
+        web.enable_cache(self.directory, ttl=0)
+        self.addCleanup(web.disable_cache)
+
+    def test_serves_archives_without_revalidating(self):
+        url = self.base + '/Archives/edgar/data/1/0001.txt'
+        self.assertEqual('body of /Archives/edgar/data/1/0001.txt', web.get(url).text)
+        self.assertEqual('body of /Archives/edgar/data/1/0001.txt', web.get(url).text)
+        self.assertEqual(1, len(self.server.paths))
+
+    def test_revalidates_company_pages(self):
+        url = self.base + '/cgi-bin/browse-edgar?CIK=viiix'
+        web.get(url)
+        response = web.get(url)
+
+        self.assertEqual('body of /cgi-bin/browse-edgar?CIK=viiix', response.text)
+        self.assertEqual('HIT', response.headers['X-Cache'])
+        self.assertEqual(2, len(self.server.paths))
+
+    def test_streams_cached_bodies(self):
+        url = self.base + '/Archives/edgar/data/1/0002.txt'
+        web.get(url)
+        chunks = web.get(url, stream=True).iter_content(4)
+        self.assertEqual(b'body of /Archives/edgar/data/1/0002.txt', b''.join(chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()
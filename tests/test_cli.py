@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import argparse
+import tempfile
+import unittest
+from unittest import mock
+
+from holdings import cli
+from holdings import web
+from holdings import store
+from holdings import metrics
+from holdings import writers
+from holdings import discovery
+
+from tests import helpers
+
+class TestCommonArguments(unittest.TestCase):
+
+    def setUp(self):
+        for module, name in helpers.SETTINGS:
+            self.addCleanup(setattr, module, name, getattr(module, name))
+
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(os.chdir, self.cwd)
+
+    def _parse(self, argv, **options):
+        parser = argparse.ArgumentParser()
+        cli.add_common_arguments(parser, **options)
+        return parser.parse_args(argv)
+
+    def test_sets_up_every_module(self):
+        args = self._parse(['-f', 'columnar', '-o', 'out', '--edgar', 'http://127.0.0.1:8000/',
+                            '--discovery', 'json', '--cache-dir', 'cache',
+                            '--store', '--metrics', 'metrics.jsonl'])
+        cli.apply_common_arguments(args)
+        self.addCleanup(store.current.close)
+
+        self.assertEqual('columnar', args.format)
+        self.assertEqual('out', writers.output_dir)
+        self.assertEqual(('http://127.0.0.1:8000', 'http://127.0.0.1:8000'),
+                         (web.base_url, web.data_url))
+        self.assertIsInstance(discovery.backend, discovery.JSONDiscovery)
+        self.assertIsNotNone(web.response_cache)
+        # The store defaults to the output directory, once it exists
+        self.assertEqual(os.path.join('out', store.STORE_FILE), store.current.path)
+        self.assertEqual('metrics.jsonl', metrics.summary_file)
+
+    def test_leaves_defaults_alone(self):
+        cli.apply_common_arguments(self._parse([]))
+
+        self.assertEqual(writers.REPORTS_DIR, writers.output_dir)
+        self.assertEqual(web.BASE_URL, web.base_url)
+        self.assertIsNone(store.current)
+        self.assertIsNone(metrics.summary_file)
+
+    def test_offers_only_report_options_without_edgar(self):
+        args = self._parse(['-o', 'out', '--store'], edgar=False)
+        cli.apply_common_arguments(args)
+        self.addCleanup(store.current.close)
+
+        self.assertEqual('out', writers.output_dir)
+        self.assertEqual(os.path.join('out', store.STORE_FILE), store.current.path)
+        self.assertFalse(hasattr(args, 'cache_dir'))
+        with self.assertRaises(SystemExit):
+            self._parse(['--edgar', 'http://127.0.0.1:8000'], edgar=False)
+
+
+class TestReadSource(unittest.TestCase):
+
+    def test_skips_blank_lines_and_comments(self):
+        lines = ['viiix\n', '\n', '# nightly list\n', '0001166559  # gates\n']
+        self.assertEqual(['viiix', '0001166559'], cli.read_ciks(lines))
+
+    def test_reads_a_file_or_stdin(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'ciks.txt')
+        with open(path, 'w') as source:
+            source.write('viiix\n0001166559\n')
+
+        parser = argparse.ArgumentParser()
+        cli.add_source_argument(parser)
+
+        self.assertEqual(['viiix', '0001166559'],
+                         cli.read_source(parser.parse_args([path]).source))
+        with mock.patch('sys.stdin', io.StringIO('0000862084\n')):
+            self.assertEqual(['0000862084'], cli.read_source(parser.parse_args([]).source))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import datetime
+import unittest
+
+from holdings import diff
+
+from holdings.dto import base
+from holdings.dto import reportnq
+from holdings.dto import report13fhr
+
+class TestNormalizeIssuer(unittest.TestCase):
+
+    def test_ignores_markers_and_punctuation(self):
+        self.assertEqual('AMAZON COM INC', diff.normalize_issuer('* Amazon.com Inc.'))
+        self.assertEqual(diff.normalize_issuer('Johnson & Johnson'),
+                         diff.normalize_issuer('JOHNSON & JOHNSON '))
+
+
+class TestDiffHoldings(unittest.TestCase):
+
+    def setUp(self):
+        self.old = [base.Holding('* Amazon.com Inc.', 4365551, 3655319),
+                    base.Holding('Comcast Corp. Class A', 26655358, 1768316),
+                    base.Holding('Home Depot Inc.', 13709218, 1764102),
+                    base.Holding('Walt Disney Co.', 16405242, 1523391)]
+        self.new = [base.Holding('Amazon.com Inc.', 4400000, 3700000),
+                    base.Holding('Comcast Corp. Class A', 26000000, 1700000),
+                    base.Holding('Home Depot Inc.', 13709218, 1800000),
+                    base.Holding('Netflix Inc.', 1000, 100)]
+
+    def test_classifies_positions(self):
+        result = diff.diff_holdings(self.old, self.new)
+
+        self.assertEqual([('AMAZON COM INC', diff.INCREASED),
+                          ('COMCAST CORP CLASS A', diff.DECREASED),
+                          ('HOME DEPOT INC', diff.UNCHANGED),
+                          ('NETFLIX INC', diff.NEW),
+                          ('WALT DISNEY CO', diff.CLOSED)],
+                         [(change.key, change.status) for change in result])
+
+        amazon = result.changes[0]
+        self.assertEqual(34449, amazon.share_delta)
+        self.assertEqual(44681, amazon.value_delta)
+        self.assertEqual(-16405242, result.by_status(diff.CLOSED)[0].share_delta)
+
+    def test_accepts_holdings_tables(self):
+        from_lists  = diff.diff_holdings(self.old, self.new)
+        from_tables = diff.diff_holdings(base.HoldingsTable.from_holdings(self.old),
+                                         base.HoldingsTable.from_holdings(self.new))
+
+        self.assertEqual(from_lists.counts(), from_tables.counts())
+        self.assertEqual([c.share_delta for c in from_lists],
+                         [c.share_delta for c in from_tables])
+
+    def test_matches_13f_positions_on_cusip(self):
+        old = [report13fhr.Holding13F('ALPHABET INC', 10, 1, cusip='02079K305'),
+               report13fhr.Holding13F('ALPHABET INC', 20, 2, cusip='02079K107')]
+        new = [report13fhr.Holding13F('ALPHABET INC CAP STK CL C', 10, 1, cusip='02079K305'),
+               report13fhr.Holding13F('ALPHABET INC CAP STK CL A', 25, 3, cusip='02079K107')]
+
+        for holdings in ((old, new), [report13fhr.Holdings13FTable.from_holdings(h)
+                                      for h in (old, new)]):
+            result = diff.diff_holdings(*holdings)
+            self.assertEqual([(('02079K305', None, None), diff.UNCHANGED),
+                              (('02079K107', None, None), diff.INCREASED)],
+                             [(change.key, change.status) for change in result])
+
+    def test_keeps_options_apart_from_shares(self):
+        def holdings(shares, puts):
+            return [report13fhr.Holding13F('APPLE INC', shares, 100, cusip='037833100',
+                                           amount_type='SH'),
+                    report13fhr.Holding13F('APPLE INC', puts, 5, cusip='037833100',
+                                           amount_type='SH', put_call='Put')]
+
+        old, new = holdings(1000, 500), holdings(1200, 300)
+        for pair in ((old, new), [report13fhr.Holdings13FTable.from_holdings(h)
+                                  for h in (old, new)]):
+            result = diff.diff_holdings(*pair)
+            self.assertEqual([(('037833100', None, 'SH'), diff.INCREASED, 200),
+                              (('037833100', 'Put', 'SH'), diff.DECREASED, -200)],
+                             [(change.key, change.status, change.share_delta)
+                              for change in result])
+
+    def test_totals_repeated_positions(self):
+        old = [base.Holding('APPLE INC', 100, 10), base.Holding('APPLE INC', 50, 5)]
+        new = [base.Holding('APPLE INC', 150, 20)]
+
+        result = diff.diff_holdings(old, new)
+        self.assertEqual(1, len(result))
+        self.assertEqual(diff.UNCHANGED, result.changes[0].status)
+        self.assertEqual(5, result.changes[0].value_delta)
+
+
+class TestDiffNQ(unittest.TestCase):
+
+    def test_lines_up_series(self):
+        def report(day, series_holdings):
+            series = []
+            for ID, holdings in series_holdings:
+                fund = reportnq.FundSeries(ID, '0000862084', ID)
+                fund.holdings = holdings
+                series.append(fund)
+            return reportnq.ReportNQ('0000862084', datetime.date(2016, 11, day), 'N-Q', series)
+
+        old = report(1, [('S1', [base.Holding('A', 1, 1)]),
+                         ('S2', [base.Holding('B', 1, 1)])])
+        new = report(30, [('S1', [base.Holding('A', 2, 2)]),
+                          ('S3', [base.Holding('C', 1, 1)])])
+
+        result = diff.diff_nq(old, new)
+
+        self.assertEqual(['S1', 'S3', 'S2'], list(result))
+        self.assertEqual(diff.INCREASED, result['S1'].changes[0].status)
+        self.assertEqual(diff.NEW, result['S3'].changes[0].status)
+        self.assertEqual(diff.CLOSED, result['S2'].changes[0].status)
+
+
+if __name__ == '__main__':
+    unittest.main()
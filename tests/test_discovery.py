@@ -0,0 +1,169 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from holdings import web
+from holdings import main
+from holdings import tickers
+from holdings import discovery
+
+from holdings.dto import reportnq
+from holdings.dto import report13fhr
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'resources')
+
+# Complete submissions are served from the fixtures the other tests use,
+# everything else from the recorded responses under resources/edgar
+SUBMISSIONS = {
+    '/Archives/edgar/data/1418814/000141881216000209/0001418812-16-000209.txt':
+        'gates_fund_complete_text_submission.txt',
+    '/Archives/edgar/data/862084/000093247116014756/0000932471-16-014756.txt':
+        'vanguard_complete_text_submission.txt',
+}
+
+class _RecordedHandler(BaseHTTPRequestHandler):
+    """Serve the recorded EDGAR responses by path, 404 for anything else."""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.path in SUBMISSIONS:
+            path = os.path.join(RESOURCES, SUBMISSIONS[self.path])
+        else:
+            path = os.path.join(RESOURCES, 'edgar', self.path.lstrip('/'))
+
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, 'rb') as recorded:
+            body = recorded.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json' if path.endswith('.json')
+                                         else 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestJSONDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _RecordedHandler)
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        url          = 'http://127.0.0.1:%d' % self.server.server_port
+        self.backend = discovery.JSONDiscovery(url, url + '/Archives')
+
+    def _read(self, name):
+        with open(os.path.join(RESOURCES, name), 'rb') as text:
+            return text.read()
+
+    def test_finds_recent_filings_of_the_forms(self):
+        filings = self.backend.find_filings('1418814', ['13F-HR', '13F-HR/A'])
+
+        self.assertEqual(['0001418812-16-000209', '0001418812-16-000160'],
+                         [filing.accession for filing in filings])
+        self.assertEqual('0001418814', filings[0].cik)
+        self.assertEqual('2016-11-15', filings[0].accepted_date.isoformat())
+        self.assertTrue(filings[0].archive.endswith(
+            '/Archives/edgar/data/1418814/000141881216000209/0001418812-16-000209-index.htm'))
+        self.assertEqual(['/submissions/CIK0001418814.json'], self.server.paths)
+
+    def test_follows_older_listings_for_history(self):
+        filings = self.backend.find_filings('0001418814', ['13F-HR', '13F-HR/A'],
+                                            history=True)
+
+        self.assertEqual(['13F-HR', '13F-HR', '13F-HR/A'],
+                         [filing.form for filing in filings])
+        self.assertEqual('0001418812-16-000100', filings[-1].accession)
+
+    def test_reads_13fhr_from_information_table_only(self):
+        filing = self.backend.find_filings('0001418814', ['13F-HR'])[0]
+        report = self.backend.read_report(filing)
+
+        expected = report13fhr.parse_13f_submission(
+            '0001418814', self._read('gates_fund_complete_text_submission.txt'))
+        self.assertEqual(expected.accepted_date, report.accepted_date)
+        self.assertEqual('13F-HR', report.submission_type)
+        self.assertEqual([str(holding) for holding in expected.holdings],
+                         [str(holding) for holding in report.holdings])
+        self.assertNotIn(
+            '/Archives/edgar/data/1418814/000141881216000209/0001418812-16-000209.txt',
+            self.server.paths)
+
+    def test_reads_nq_from_submission_without_index_pages(self):
+        filing = self.backend.find_filings('862084', ['N-Q'])[0]
+        report = self.backend.read_report(filing)
+
+        expected = reportnq.parse_nq_submission(
+            self._read('vanguard_complete_text_submission.txt'))
+        self.assertEqual([series.ID for series in expected.series],
+                         [series.ID for series in report.series])
+        self.assertEqual(sum(len(series.holdings) for series in expected.series),
+                         sum(len(series.holdings) for series in report.series))
+        self.assertEqual(['/submissions/CIK0000862084.json',
+                          '/Archives/edgar/data/862084/000093247116014756/0000932471-16-014756.txt'],
+                         self.server.paths)
+
+    def test_resolves_tickers_with_the_ticker_index(self):
+        index = tickers.TickerIndex()
+        index.add('VIIIX', '862084', 'S000002853', 'C000007826')
+        web.use_ticker_index(index)
+        self.addCleanup(web.use_ticker_index, None)
+
+        self.assertEqual('0000862084', self.backend.resolve_cik('viiix'))
+
+    def test_rejects_forms_without_a_parser(self):
+        filing = discovery.Filing('N-CSR', '0000862084', self.backend.archives_url
+                                  + '/edgar/data/862084/000093247116013000/0000932471-16-013000-index.htm')
+        self.assertRaises(ValueError, self.backend.read_report, filing)
+        self.assertEqual([], self.server.paths)
+
+    def test_generates_report_through_main(self):
+        cwd       = os.getcwd()
+        directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(directory, 'reports'))
+        os.chdir(directory)
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(os.chdir, cwd)
+
+        with mock.patch.object(discovery, 'backend', self.backend):
+            reportnames = main.generate_report('0001418814', main.FORMS)
+
+        self.assertEqual(['0001418814_2016_11_15.txt'], reportnames)
+        self.assertTrue(os.path.exists('reports/0001418814_2016_11_15.txt'))
+
+
+class TestHTMLDiscovery(unittest.TestCase):
+
+    def test_wraps_archive_links_in_filings(self):
+        archive = ('https://www.sec.gov/Archives/edgar/data/1166559/000110465916156931/'
+                   '0001104659-16-156931-index.htm')
+
+        with mock.patch.object(web, 'get_filing_history', return_value=[('13F-HR', archive)]):
+            filings = discovery.HTMLDiscovery().find_filings('0001166559', ['13F-HR'],
+                                                             history=True)
+
+        self.assertEqual(1, len(filings))
+        self.assertEqual('0001104659-16-156931', filings[0].accession)
+        self.assertEqual('https://www.sec.gov/Archives/edgar/data/1166559/000110465916156931/',
+                         filings[0].directory)
+
+    def test_selects_backends_by_name(self):
+        self.assertIsInstance(discovery.get_backend('json'), discovery.JSONDiscovery)
+        self.assertRaises(ValueError, discovery.get_backend, 'xbrl')
+
+
+if __name__ == '__main__':
+    unittest.main()
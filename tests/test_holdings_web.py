@@ -1,6 +1,34 @@
+import time
+import threading
 import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 from holdings import web
 
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Answer with each status in the server's queue, then with 200s."""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body   = b'<SEC-DOCUMENT>' if status == 200 else b''
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _start_server(statuses):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FlakyHandler)
+    server.statuses = list(statuses)
+    server.paths    = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
 class TestArchiveLinks(unittest.TestCase):
 
     def test_doesnt_return_links_for_bad_ticker(self):
@@ -47,5 +75,93 @@ class TestGetHoldingInfo(unittest.TestCase):
                             info)
 
 
+class TestRateLimiter(unittest.TestCase):
+
+    def test_spaces_out_acquisitions(self):
+        limiter = web.RateLimiter(50)
+        start   = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        # The first token is free, the other five wait 1/50s each
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_is_shared_safely_between_threads(self):
+        limiter = web.RateLimiter(100, burst=5)
+        start   = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+class TestSessionGet(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(web, 'BACKOFF', 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_throttled_and_failed_responses(self):
+        server = _start_server([429, 503])
+        self.addCleanup(server.shutdown)
+
+        url      = 'http://127.0.0.1:%d/Archives/submission.txt' % server.server_port
+        response = web.get(url)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('<SEC-DOCUMENT>', response.text)
+        self.assertEqual(3, len(server.paths))
+
+    def test_raises_after_exhausting_retries(self):
+        server = _start_server([500] * (web.MAX_RETRIES + 1))
+        self.addCleanup(server.shutdown)
+
+        url = 'http://127.0.0.1:%d/' % server.server_port
+        self.assertRaises(web.requests.HTTPError, web.get, url)
+        self.assertEqual(web.MAX_RETRIES + 1, len(server.paths))
+
+
+def _company_page(rows, next_page):
+    html = '<table>'
+    for form, accession in rows:
+        html += ('<tr><td>' + form + '</td><td><a href="/Archives/edgar/data/1/'
+                 + accession.replace('-', '') + '/' + accession + '-index.htm">'
+                 + 'Documents</a></td></tr>')
+    html += '</table>'
+    if next_page:
+        html += '<input type="button" value="Next 100">'
+    return mock.Mock(content=html.encode('utf-8'))
+
+
+class TestFilingHistory(unittest.TestCase):
+
+    def test_follows_every_page(self):
+        pages = [_company_page([('N-Q', '0000932471-16-014756'),
+                                ('N-CSR', '0000932471-16-013000')], True),
+                 _company_page([('N-Q', '0000932471-16-011111')], False)]
+        urls  = []
+
+        def get(url, fresh=False):
+            urls.append(url)
+            return pages[len(urls) - 1]
+
+        with mock.patch.object(web, 'get', get):
+            filings = web.get_filing_history('viiix', 'N-Q', count=100)
+
+        self.assertEqual(
+            [('N-Q', 'https://www.sec.gov/Archives/edgar/data/1/000093247116014756/0000932471-16-014756-index.htm'),
+             ('N-Q', 'https://www.sec.gov/Archives/edgar/data/1/000093247116011111/0000932471-16-011111-index.htm')],
+            filings)
+        self.assertTrue(urls[0].endswith('&start=0&count=100'))
+        self.assertTrue(urls[1].endswith('&start=100&count=100'))
+
+    def test_extracts_accession_number(self):
+        archive = 'https://www.sec.gov/Archives/edgar/data/1166559/000110465916156931/0001104659-16-156931-index.htm'
+        self.assertEqual('0001104659-16-156931', web.accession_number(archive))
+        self.assertIsNone(web.accession_number('https://www.google.com'))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from holdings import main
+
+ARCHIVE = 'https://www.sec.gov/Archives/edgar/data/1/{0}/{1}-index.htm'
+
+class TestGenerateHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'reports'))
+        os.chdir(self.directory)
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(os.chdir, self.cwd)
+
+        self.filings = [('13F-HR', ARCHIVE.format('000110465916156931', '0001104659-16-156931')),
+                        ('13F-HR/A', ARCHIVE.format('000110465916150000', '0001104659-16-150000')),
+                        ('13F-HR', ARCHIVE.format('000110465916140000', '0001104659-16-140000'))]
+
+    def _generate(self, filing, fmt='tsv'):
+        name = filing.accession + '.txt'
+        if '140000' in name:
+            raise ValueError('unparseable filing')
+        with open('reports/' + name, 'w') as report:
+            report.write('entity\tshares\tvalue\n')
+        return [name]
+
+    def test_generates_one_report_per_filing_and_skips_processed(self):
+        with mock.patch('holdings.web.get_filing_history', return_value=self.filings), \
+             mock.patch.object(main, 'generate_filing_report', side_effect=self._generate) as generate:
+            first  = main.generate_history('0001166559', main.FORMS, workers=2)
+            second = main.generate_history('0001166559', main.FORMS, workers=2)
+
+        self.assertEqual(['0001104659-16-156931.txt', '0001104659-16-150000.txt'], first)
+        self.assertEqual([], second)
+        # The failed filing is retried by the second run, the others are not
+        self.assertEqual(4, generate.call_count)
+
+    def test_regenerates_reports_deleted_from_disk(self):
+        with mock.patch('holdings.web.get_filing_history', return_value=self.filings[:1]), \
+             mock.patch.object(main, 'generate_filing_report', side_effect=self._generate):
+            main.generate_history('0001166559', main.FORMS)
+            os.remove('reports/0001104659-16-156931.txt')
+            result = main.generate_history('0001166559', main.FORMS)
+
+        self.assertEqual(['0001104659-16-156931.txt'], result)
+
+
+if __name__ == '__main__':
+    unittest.main()
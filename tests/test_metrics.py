@@ -0,0 +1,124 @@
+import os
+import json
+import pstats
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from holdings import web
+from holdings import metrics
+
+from tests.test_holdings_web import _start_server
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(metrics.write_summaries, None)
+
+    def test_records_stages_per_filing_and_in_totals(self):
+        path = os.path.join(self.directory, 'metrics.jsonl')
+        metrics.write_summaries(path)
+
+        with metrics.stage('discover'):
+            pass
+        with metrics.filing('0001418812-16-000209') as filing:
+            with metrics.stage('read'):
+                metrics.count('rows', 13)
+            with metrics.stage('read'):
+                pass
+
+        self.assertEqual(2, filing.calls['read'])
+        self.assertEqual({'rows': 13}, filing.counters)
+        self.assertNotIn('discover', filing.timers)
+        self.assertEqual(['discover', 'read', 'total'], sorted(metrics.totals.timers))
+
+        with open(path, 'r') as summaries:
+            summary = json.loads(summaries.readline())
+        self.assertEqual('0001418812-16-000209', summary['name'])
+        self.assertEqual(2, summary['stages']['read']['calls'])
+        self.assertEqual(13, summary['counters']['rows'])
+
+    def test_keeps_filings_on_different_threads_apart(self):
+        filings = {}
+
+        def process(name, rows):
+            with metrics.filing(name) as filing:
+                metrics.count('rows', rows)
+                filings[name] = filing
+
+        threads = [threading.Thread(target=process, args=(str(rows), rows))
+                   for rows in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for name, filing in filings.items():
+            self.assertEqual({'rows': int(name)}, filing.counters)
+        self.assertEqual(36, metrics.totals.counters['rows'])
+
+    def test_merges_metrics_recorded_elsewhere(self):
+        recorded = metrics.Metrics('0001418812-16-000209')
+        with metrics.recording(recorded):
+            with metrics.stage('read'):
+                metrics.count('rows', 13)
+        self.assertEqual({}, metrics.totals.counters)
+
+        copy = metrics.Metrics.from_summary(json.loads(json.dumps(recorded.summary())))
+        metrics.finish(copy, 1.5)
+
+        self.assertEqual('0001418812-16-000209', copy.name)
+        self.assertEqual(({'rows': 13}, 1), (copy.counters, copy.calls['read']))
+        self.assertEqual(1.5, metrics.totals.timers['total'])
+
+    def test_counts_streamed_bytes_and_waiting(self):
+        with metrics.filing('stream') as filing:
+            self.assertEqual(['ab', 'cde'],
+                             list(metrics.instrument_stream(iter(['ab', 'cde']))))
+
+        self.assertEqual(5, filing.counters['bytes_downloaded'])
+        self.assertIn('network', filing.timers)
+
+    def test_counts_downloads_and_cache_hits(self):
+        server = _start_server([])
+        self.addCleanup(server.shutdown)
+        web.enable_cache(os.path.join(self.directory, 'cache'))
+        self.addCleanup(web.disable_cache)
+
+        url = 'http://127.0.0.1:%d/Archives/submission.txt' % server.server_port
+        with metrics.filing('cache') as filing:
+            for _ in range(2):
+                self.assertEqual(b'<SEC-DOCUMENT>', b''.join(web.stream_document(url)))
+
+        self.assertEqual(1, filing.counters['requests'])
+        self.assertEqual(1, filing.counters['cache_misses'])
+        self.assertEqual(1, filing.counters['cache_hits'])
+        self.assertEqual(len('<SEC-DOCUMENT>'), filing.counters['bytes_downloaded'])
+        self.assertEqual(2 * len('<SEC-DOCUMENT>'), filing.counters['bytes_from_cache'])
+
+    def test_writes_cprofile_stats(self):
+        path = os.path.join(self.directory, 'run.prof')
+
+        with metrics.profiled(path):
+            sorted(range(1000), key=lambda number: -number)
+
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_requires_pyinstrument_for_html_profiles(self):
+        path = os.path.join(self.directory, 'run.html')
+
+        with mock.patch.object(metrics, 'pyinstrument', None):
+            with self.assertRaises(ImportError):
+                with metrics.profiled(path):
+                    pass
+
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
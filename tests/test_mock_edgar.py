@@ -0,0 +1,113 @@
+import os
+import unittest
+from unittest import mock
+
+from holdings import web
+from holdings import main
+from holdings import store
+from holdings import metrics
+from holdings import writers
+from holdings import discovery
+
+from holdings.dto import reportnq
+
+from tests import helpers
+from tests.helpers import MockEdgarTestCase
+
+class TestMockEdgar(MockEdgarTestCase):
+
+    def test_serves_company_pages_by_cik_and_ticker(self):
+        self.assertEqual(['0001418814', '0000862084'], self.ciks)
+
+        submission_type, archives = web.get_archive_links('viiix', 'N-Q')
+        self.assertEqual('N-Q', submission_type)
+        self.assertEqual([self.edgar.url + '/Archives/edgar/data/862084/000093247116014756/'
+                          '0000932471-16-014756-index.htm'], archives)
+        self.assertRaises(web.TickerNotFoundException,
+                          web.get_archive_links, 'whatever', 'N-Q')
+
+    def test_generates_reports_with_each_discovery_backend(self):
+        for name in sorted(discovery.BACKENDS):
+            with mock.patch.object(discovery, 'backend', discovery.get_backend(name)):
+                self.assertEqual(['0001418814_2016_11_15.txt'],
+                                 main.generate_report('0001418814', main.FORMS), name)
+                self.assertEqual(['0000862084_S000002853_2016_11_30.txt',
+                                  '0000862084_S000002855_2016_11_30.txt'],
+                                 sorted(main.generate_report('0000862084', main.FORMS)), name)
+
+    def test_serves_information_table_documents(self):
+        response = web.get(self.edgar.url + '/Archives/edgar/data/1418814/'
+                            '000141881216000209/vac13f111516.xml')
+
+        self.assertTrue(response.content.startswith(b'<?xml'))
+        self.assertEqual(0, self.edgar.stats['not_found'])
+
+
+class TestFaultInjection(MockEdgarTestCase):
+
+    options = {'throttle': 0.2, 'truncate': 0.1, 'seed': 7}
+
+    def test_web_layer_recovers_from_throttling_and_truncation(self):
+        for _ in range(10):
+            response = web.get(self.edgar.url + '/submissions/CIK0001418814.json')
+            self.assertEqual('0001418812-16-000209',
+                             response.json()['filings']['recent']['accessionNumber'][0])
+
+        self.assertGreater(self.edgar.stats['throttled'], 0)
+        self.assertGreater(self.edgar.stats['truncated'], 0)
+        self.assertEqual(10 + self.edgar.stats['throttled'] + self.edgar.stats['truncated'],
+                         self.edgar.stats['requests'])
+
+
+class TestTruncatedStreams(MockEdgarTestCase):
+
+    options = {'truncate': 0.3, 'seed': 3}
+
+    def test_resumes_streamed_documents_cut_short(self):
+        url  = (self.edgar.url + '/Archives/edgar/data/1418814/'
+                '000141881216000209/0001418812-16-000209.txt')
+        body = ''.join(web.stream_document(url))
+
+        for _ in range(20):
+            self.assertEqual(body, ''.join(web.stream_document(url, chunk_size=512)))
+        self.assertGreater(self.edgar.stats['truncated'], 0)
+        self.assertIn('<SEC-DOCUMENT>', body)
+        self.assertTrue(body.rstrip().endswith('</SEC-DOCUMENT>'))
+
+    def test_refills_the_cache_when_cut_short(self):
+        self.addCleanup(web.disable_cache)
+        url = (self.edgar.url + '/Archives/edgar/data/862084/'
+               '000093247116014756/0000932471-16-014756.txt')
+
+        # An empty cache each time, so every body is downloaded into it
+        for attempt in range(5):
+            web.enable_cache(os.path.join(self.directory, 'cache' + str(attempt)))
+            self.assertTrue(''.join(web.stream_document(url)).rstrip().endswith('</SEC-DOCUMENT>'))
+        self.assertGreater(self.edgar.stats['truncated'], 0)
+
+
+class TestMockEdgarTestCase(unittest.TestCase):
+
+    def test_puts_module_settings_back(self):
+        settings = [getattr(module, name) for module, name in helpers.SETTINGS]
+        layouts  = dict(reportnq._layouts)
+
+        class Changing(MockEdgarTestCase):
+            def test_changes_settings(self):
+                writers.use_output_dir('elsewhere')
+                store.use_store(object())
+                web.use_ticker_index(object())
+                discovery.use_backend('json')
+                metrics.write_summaries('metrics.jsonl')
+                reportnq._layouts['0000862084'] = None
+
+        result = unittest.TestResult()
+        Changing('test_changes_settings').run(result)
+
+        self.assertTrue(result.wasSuccessful(), result.errors)
+        self.assertEqual(settings, [getattr(module, name) for module, name in helpers.SETTINGS])
+        self.assertEqual(layouts, reportnq._layouts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,13 @@
+import os
 import unittest
 import datetime
 import xml
 
 from holdings.dto import reportnq
 
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'resources')
+
 class TestGetSeriesAndContracts(unittest.TestCase):
 
     def test_raises_exception_for_invalid_contract_text(self):
@@ -54,8 +58,8 @@ class TestGetSeriesHoldings(unittest.TestCase):
 
         holding = holdings[0]
         self.assertEqual(holding.entity, '* Amazon.com Inc.')
-        self.assertEqual(holding.shares, '4,365,551')
-        self.assertEqual(holding.value, '3,655,319')
+        self.assertEqual(holding.shares, 4365551)
+        self.assertEqual(holding.value, 3655319)
 
     def test_get_nq_report(self):
         with open('/home/chpack/Documents/python/quovo_challenge/christian_packard/fund_holdings/resources/vanguard_complete_text_submission.txt', 'r') as vanguard_text:
@@ -70,8 +74,191 @@ class TestGetSeriesHoldings(unittest.TestCase):
 
         holding = nq_report.series[0].holdings[0]
         self.assertEqual(holding.entity, '* Amazon.com Inc.')
-        self.assertEqual(holding.shares, '4,365,551')
-        self.assertEqual(holding.value, '3,655,319')
+        self.assertEqual(holding.shares, 4365551)
+        self.assertEqual(holding.value, 3655319)
+
+
+class TestHtmlEngines(unittest.TestCase):
+
+    def test_engines_agree_on_vanguard_html(self):
+        with open(os.path.join(RESOURCES, 'vanguard_html.html'), 'r') as vanguard_html:
+            html_text = vanguard_html.read()
+
+        soup_holdings   = reportnq.parse_nq_report_html(html_text, engine='soup')
+        events_holdings = reportnq.parse_nq_report_html(html_text, engine='events')
+
+        self.assertGreater(len(soup_holdings), 1)
+        self.assertEqual([(h.entity, h.shares, h.value) for h in soup_holdings],
+                         [(h.entity, h.shares, h.value) for h in events_holdings])
+
+    def test_engines_agree_on_unclosed_and_nested_rows(self):
+        html_text = ('<table><tr><td>A Corp.<td>1,000<td>20</tr>'
+                     '<tr><td>B &amp; Co.</td><td>2,000</td><td>30</td>'
+                     '<tr><td>Total</td><td>n/a</td><td>50</td></tr>'
+                     '<tr><td><table><tr><td>C Inc.</td><td>5</td>'
+                     '<td>6</td></tr></table></td></tr></table>'
+                     '<tr><td>D Ltd.</td><td>7</td><td>8</td>')
+
+        soup_holdings   = reportnq.parse_nq_report_html(html_text, engine='soup')
+        events_holdings = reportnq.parse_nq_report_html(html_text, engine='events')
+
+        self.assertEqual(sorted(str(h) for h in soup_holdings),
+                         sorted(str(h) for h in events_holdings))
+
+    def test_engines_agree_on_series_headings(self):
+        html_text = ('<p><b>Alpha Fund</b></p><table><tr><td>A Corp.</td><td>1</td><td>2</td></tr>'
+                     '<tr><td>Beta&nbsp;Fund</td></tr><tr><td>B Corp.</td><td>3</td><td>4</td></tr>'
+                     '</table><div>ALPHA FUND</div><table><tr><td>C Corp.</td><td>5</td>'
+                     '<td>6</td></tr></table>')
+        series    = [reportnq.FundSeries('S1', '0000000001', 'Alpha Fund'),
+                     reportnq.FundSeries('S2', '0000000001', 'Beta Fund')]
+
+        for engine in reportnq.HTML_ENGINES:
+            items = reportnq.HTML_ENGINES[engine](html_text, series)
+            self.assertEqual(['S1', 'A Corp.', 'S2', 'B Corp.', 'S1', 'C Corp.'],
+                             [getattr(item, 'ID', None) or item.entity for item in items],
+                             engine)
+
+    def test_raises_exception_for_unknown_engine(self):
+        self.assertRaises(ValueError,
+                          reportnq.parse_nq_report_html, '<table></table>', 'lxml')
+
+
+class TestTableLayouts(unittest.TestCase):
+
+    def setUp(self):
+        reportnq._layouts.clear()
+        self.addCleanup(reportnq._layouts.clear)
+
+    def _holdings(self, rows, engine='events', cik=None):
+        html_text = '<table>' + ''.join(
+            '<tr>' + ''.join('<td>' + cell + '</td>' for cell in row) + '</tr>'
+            for row in rows) + '</table>'
+        return [(h.entity, h.shares, h.value)
+                for h in reportnq.HTML_ENGINES[engine](html_text, None, cik)]
+
+    def test_reads_percent_split_and_footnoted_columns(self):
+        rows = [['', 'Security', 'Shares', '', 'Value', '% of Net Assets'],
+                ['', 'Apple Inc.(a)', '1,000(b)', '$', '150,000', '2.5%'],
+                ['', 'Short Co.', '(200)', '$', '(3,000)', '(0.1)%'],
+                ['', 'Total Common Stocks', '', '$', '147,000', '2.4%']]
+
+        for engine in reportnq.HTML_ENGINES:
+            self.assertEqual([('Apple Inc.(a)', 1000, 150000),
+                              ('Short Co.', -200, -3000)],
+                             self._holdings(rows, engine), engine)
+
+    def test_detects_the_most_common_layout(self):
+        rows = [['1,000', 'US Treasury Note 2.875%, 05/15/43', '1,020'],
+                ['2,000', 'US Treasury Note 1.500%, 02/28/23', '1,990'],
+                ['Cover page', '2016', '11']]
+
+        self.assertEqual([('US Treasury Note 2.875%, 05/15/43', 1000, 1020),
+                          ('US Treasury Note 1.500%, 02/28/23', 2000, 1990)],
+                         self._holdings(rows))
+
+    def test_caches_layout_by_cik(self):
+        rows = [['A Corp.', '5.0%', '1', '2'], ['B Corp.', '3.0%', '3', '4']]
+        self._holdings(rows, cik='0000000001')
+
+        self.assertEqual(reportnq._TableLayout(4, 0, 2, 3), reportnq._layouts['0000000001'])
+        # The cached layout is used without sampling the next filing
+        self.assertEqual([('C Corp.', 5, 6)],
+                         self._holdings([['C Corp.', '1', '5', '6']], cik='0000000001'))
+        self.assertEqual([('C Corp.', 1, 5)],
+                         self._holdings([['C Corp.', '1', '5', '6']]))
+
+        # and forgotten when it finds nothing
+        self.assertEqual([], self._holdings([['E Corp.', '9', '10']], cik='0000000001'))
+        self.assertNotIn('0000000001', reportnq._layouts)
+        self.assertEqual([('E Corp.', 9, 10)],
+                         self._holdings([['E Corp.', '9', '10']], cik='0000000001'))
+
+
+class TestSeriesHoldings(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(RESOURCES, 'vanguard_complete_text_submission.txt'), 'r') as vanguard_text:
+            self.complete_text = vanguard_text.read()
+
+    def test_attributes_holdings_to_the_series_named_above_them(self):
+        nq_report = reportnq.get_nq_report(self.complete_text)
+        index, total_market = nq_report.series
+
+        self.assertEqual(500, len(index.holdings))
+        self.assertEqual(3147, len(total_market.holdings))
+        self.assertEqual('* Amazon.com Inc.', index.holdings[0].entity)
+        self.assertEqual('NRG Energy Inc.', index.holdings[-1].entity)
+        self.assertEqual('EI du Pont de Nemours & Co.', total_market.holdings[0].entity)
+
+    def test_every_parser_attributes_holdings_alike(self):
+        expected = reportnq.get_nq_report(self.complete_text)
+        reports  = [reportnq.get_nq_report(self.complete_text, engine='soup'),
+                    reportnq.read_nq_report([self.complete_text]),
+                    reportnq.parse_nq_submission(self.complete_text.encode('utf-8'))]
+
+        for report in reports:
+            self.assertEqual([[str(h) for h in s.holdings] for s in expected.series],
+                             [[str(h) for h in s.holdings] for s in report.series])
+
+    def test_series_share_holdings_without_headings(self):
+        all_series = [reportnq.FundSeries('S1', '0000000001', 'Alpha Fund'),
+                      reportnq.FundSeries('S2', '0000000001', 'Beta Fund')]
+        reportnq._assign_holdings(all_series,
+                                  reportnq.parse_nq_report_html(
+                                      '<table><tr><td>A Corp.</td><td>1</td><td>2</td></tr></table>'))
+
+        self.assertIs(all_series[0].holdings, all_series[1].holdings)
+        self.assertEqual(1, len(all_series[0].holdings))
+
+
+class TestStreamNQReport(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(RESOURCES, 'vanguard_complete_text_submission.txt')
+
+    def test_yields_report_before_holdings(self):
+        with open(self.path, 'r') as vanguard_text:
+            items = reportnq.iter_nq_report(vanguard_text)
+            report = next(items)
+            series = next(items)
+            holding = next(items)
+
+        self.assertIsInstance(report, reportnq.ReportNQ)
+        self.assertEqual(report.cik, '0000862084')
+        self.assertEqual(report.submission_type, 'N-Q')
+        self.assertEqual(len(report.series), 2)
+
+        self.assertIs(series, report.series[0])
+
+        self.assertEqual(holding.entity, '* Amazon.com Inc.')
+        self.assertEqual(holding.shares, 4365551)
+        self.assertEqual(holding.value, 3655319)
+
+    def test_matches_get_nq_report(self):
+        with open(self.path, 'r') as vanguard_text:
+            expected = reportnq.get_nq_report(vanguard_text.read())
+
+        with open(self.path, 'r') as vanguard_text:
+            result = reportnq.read_nq_report(vanguard_text)
+
+        self.assertEqual(result.cik, expected.cik)
+        self.assertEqual(result.accepted_date, expected.accepted_date)
+        self.assertEqual([s.ID for s in result.series],
+                         [s.ID for s in expected.series])
+        for result_series, expected_series in zip(result.series, expected.series):
+            self.assertEqual([str(h) for h in result_series.holdings],
+                             [str(h) for h in expected_series.holdings])
+
+    def test_reads_arbitrary_byte_chunks(self):
+        with open(self.path, 'rb') as vanguard_text:
+            expected = reportnq.read_nq_report(vanguard_text)
+            vanguard_text.seek(0)
+            chunks = iter(lambda: vanguard_text.read(1000), b'')
+            result = reportnq.read_nq_report(chunks)
+
+        self.assertEqual([str(h) for h in result.series[0].holdings],
+                         [str(h) for h in expected.series[0].holdings])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,99 @@
+import os
+import json
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from holdings import store
+from holdings import offline
+from holdings import writers
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'resources')
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.chdir(self.directory)
+        self.addCleanup(os.chdir, self.cwd)
+        os.makedirs('reports')
+        os.makedirs('corpus/2016/QTR4')
+
+        for name in ('gates_fund_complete_text_submission.txt',
+                     'vanguard_complete_text_submission.txt'):
+            shutil.copy(os.path.join(RESOURCES, name), 'corpus/2016/QTR4/' + name)
+        with open('corpus/2016/QTR4/8k.txt', 'w') as other:
+            other.write('<SEC-HEADER>\nCONFORMED SUBMISSION TYPE:\t8-K\n</SEC-HEADER>\n')
+        with open('corpus/2016/QTR4/broken.txt', 'w') as broken:
+            broken.write('<SEC-HEADER>\nCONFORMED SUBMISSION TYPE:\tN-Q\n</SEC-HEADER>\n')
+
+    def _manifest(self):
+        with open(writers.report_path(offline.MANIFEST_FILE), 'r') as records:
+            return {record['source']: record
+                    for record in (json.loads(line) for line in records)}
+
+    def test_routes_submissions_by_type(self):
+        counts = offline.ingest('corpus', workers=2)
+
+        self.assertEqual({'ok': 2, 'skipped': 1, 'failed': 1, 'resumed': 0}, counts)
+        manifest = self._manifest()
+        self.assertEqual(['0000862084_S000002853_2016_11_30.txt',
+                          '0000862084_S000002855_2016_11_30.txt'],
+                         manifest['corpus/2016/QTR4/vanguard_complete_text_submission.txt']['reports'])
+        self.assertEqual('13F-HR',
+                         manifest['corpus/2016/QTR4/gates_fund_complete_text_submission.txt']['type'])
+        self.assertTrue(os.path.exists('reports/0001418814_2016_11_15.txt'))
+
+    def test_loads_the_store(self):
+        holdings_store = store.HoldingsStore('holdings.db')
+        self.addCleanup(holdings_store.close)
+        store.use_store(holdings_store)
+        self.addCleanup(store.use_store, None)
+
+        offline.ingest('corpus', workers=2)
+
+        # The 13F-HR and both series of the N-Q, loaded by the processes
+        self.assertEqual(3, holdings_store.counts()[0])
+        self.assertEqual({'0001418814'},
+                         {row['cik'] for row in holdings_store.holders('594918104')
+                          if row['series'] == ''})
+
+    def test_resumes_from_manifest(self):
+        offline.ingest('corpus', workers=2)
+        counts = offline.ingest('corpus', workers=2)
+
+        # Only the failed submission is tried again
+        self.assertEqual({'ok': 0, 'skipped': 0, 'failed': 1, 'resumed': 3}, counts)
+
+    def test_reads_tarballs(self):
+        with tarfile.open('corpus.tar.gz', 'w:gz') as tarball:
+            tarball.add('corpus/2016/QTR4/gates_fund_complete_text_submission.txt',
+                        arcname='gates.txt')
+
+        counts = offline.ingest('corpus.tar.gz', workers=1)
+
+        self.assertEqual(1, counts['ok'])
+        self.assertIn('corpus.tar.gz::gates.txt', self._manifest())
+
+    def test_keeps_its_manifest_with_the_reports(self):
+        self.addCleanup(setattr, writers, 'output_dir', writers.output_dir)
+        writers.use_output_dir('out')
+
+        offline.ingest('corpus', workers=1)
+
+        self.assertEqual(['0001418814_2016_11_15.txt'],
+                         self._manifest()['corpus/2016/QTR4/gates_fund_complete_text_submission.txt']['reports'])
+        self.assertTrue(os.path.exists('out/ingest_manifest.jsonl'))
+        self.assertFalse(os.path.exists('reports/ingest_manifest.jsonl'))
+
+        # A manifest given by path gets its directory created
+        offline.ingest('corpus', workers=1, manifest='runs/1/manifest.jsonl')
+        self.assertTrue(os.path.exists('runs/1/manifest.jsonl'))
+
+
+if __name__ == '__main__':
+    unittest.main()
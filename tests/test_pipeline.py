@@ -0,0 +1,112 @@
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import ThreadingHTTPServer
+
+from holdings import web
+from holdings import store
+from holdings import metrics
+from holdings import tickers
+from holdings import pipeline
+from holdings import discovery
+
+from tests.test_discovery import _RecordedHandler
+
+class TestRunPipeline(unittest.TestCase):
+
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _RecordedHandler)
+        server.paths = []
+        self.server  = server
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        url     = 'http://127.0.0.1:%d' % server.server_port
+        patcher = mock.patch.object(discovery, 'backend',
+                                    discovery.JSONDiscovery(url, url + '/Archives'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'reports'))
+        os.chdir(self.directory)
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(os.chdir, self.cwd)
+
+    def test_generates_reports_in_input_order(self):
+        summary = asyncio.run(pipeline.run_pipeline(['862084', '0000000001', '0001418814'],
+                                                    downloads=2, workers=2))
+
+        self.assertEqual(['862084', '0000000001', '0001418814'],
+                         [result.cik for result in summary.results])
+        self.assertEqual(2, len(summary.succeeded))
+        self.assertIsInstance(summary.results[1].error, web.requests.HTTPError)
+        self.assertEqual(['0001418814_2016_11_15.txt'], summary.results[2].reportnames)
+        # The 13F-HR's information table is downloaded without the rest of the filing
+        self.assertNotIn('/Archives/edgar/data/1418814/000141881216000209/0001418812-16-000209.txt',
+                         self.server.paths)
+        for name in summary.results[0].reportnames + summary.results[2].reportnames:
+            self.assertTrue(os.path.exists('reports/' + name), name)
+
+    def test_reports_filings_without_parsers_as_failures(self):
+        summary = asyncio.run(pipeline.run_pipeline(['0001418814'], forms=['SC 13D'],
+                                                    downloads=1, workers=1))
+
+        self.assertEqual(1, len(summary.failed))
+        self.assertIsInstance(summary.results[0].error, ValueError)
+        self.assertFalse(os.listdir('reports'))
+
+    def test_loads_the_store_and_ticker_index(self):
+        holdings_store = store.HoldingsStore(os.path.join(self.directory, 'holdings.db'))
+        self.addCleanup(holdings_store.close)
+        store.use_store(holdings_store)
+        self.addCleanup(store.use_store, None)
+        web.use_ticker_index(tickers.TickerIndex())
+        self.addCleanup(web.use_ticker_index, None)
+
+        summary = asyncio.run(pipeline.run_pipeline(['862084', '0001418814'],
+                                                    downloads=2, workers=2))
+
+        self.assertEqual(2, len(summary.succeeded))
+        # The 13F-HR and both series of the N-Q, loaded by the parsing processes
+        self.assertEqual(3, holdings_store.counts()[0])
+        self.assertEqual({'0001418814'},
+                         {row['cik'] for row in holdings_store.holders('594918104')
+                          if row['series'] == ''})
+        self.assertEqual('0000862084', web.ticker_index.lookup('VIIIX').cik)
+
+    def test_writes_the_metrics_of_each_filing(self):
+        self.addCleanup(setattr, metrics, 'totals', metrics.totals)
+        self.addCleanup(metrics.write_summaries, metrics.summary_file)
+        metrics.reset()
+        metrics.write_summaries('metrics.jsonl')
+
+        asyncio.run(pipeline.run_pipeline(['862084', '0000000001', '0001418814'],
+                                          downloads=2, workers=2))
+
+        with open('metrics.jsonl', 'r') as summaries:
+            filings = {summary['name']: summary
+                       for summary in (json.loads(line) for line in summaries)}
+        self.assertEqual({'0000000001', '0000932471-16-014756', '0001418812-16-000209'},
+                         set(filings))
+        # Downloaded in this process, parsed and written in another
+        self.assertLessEqual({'discover', 'http', 'read', 'write', 'total'},
+                             set(filings['0001418812-16-000209']['stages']))
+        self.assertEqual(13, filings['0001418812-16-000209']['counters']['rows'])
+        self.assertEqual(sum(filing['counters'].get('rows', 0) for filing in filings.values()),
+                         metrics.totals.counters['rows'])
+
+    def test_requires_a_download_slot(self):
+        self.assertRaises(ValueError, asyncio.run,
+                          pipeline.run_pipeline(['0001418814'], downloads=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
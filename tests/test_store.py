@@ -0,0 +1,135 @@
+import os
+import io
+import shutil
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+
+from holdings import main
+from holdings import store
+from holdings import discovery
+
+from holdings.dto import reportnq
+from holdings.dto import report13fhr
+
+from tests.helpers import MockEdgarTestCase
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'resources')
+
+def _read_13fhr():
+    with open(os.path.join(RESOURCES, 'gates_fund_complete_text_submission.txt'), 'r') as text:
+        return report13fhr.read_13f_report('0001166559', text)
+
+def _read_nq():
+    with open(os.path.join(RESOURCES, 'vanguard_complete_text_submission.txt'), 'r') as text:
+        return reportnq.read_nq_report(text)
+
+class TestHoldingsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = store.HoldingsStore(os.path.join(self.directory, 'holdings.db'))
+        self.addCleanup(self.store.close)
+
+        self.assertEqual(13, self.store.load_report(_read_13fhr()))
+        self.store.load_report(_read_nq())
+
+    def test_finds_holders_by_cusip_and_name(self):
+        by_cusip = self.store.holders('594918104')
+        by_name  = self.store.holders('Microsoft Corp.')
+
+        self.assertEqual({('0001166559', ''), ('0000862084', 'S000002853'),
+                          ('0000862084', 'S000002855')},
+                         {(row['cik'], row['series']) for row in by_cusip})
+        # N-Q filings report no CUSIPs but name the issuer as the 13F does
+        self.assertEqual([38624678], [row['shares'] for row in by_cusip if row['cusip']])
+        self.assertEqual(['0000862084'] * 2, [row['cik'] for row in by_cusip if not row['cusip']])
+        self.assertEqual(sorted(tuple(row) for row in by_cusip),
+                         sorted(tuple(row) for row in by_name))
+        self.assertEqual([], self.store.holders('000000000'))
+
+    def test_only_searches_the_latest_filings(self):
+        older = _read_13fhr()
+        older.accepted_date = datetime.date(2016, 8, 15)
+        older.holdings      = older.holdings[:1]
+        self.store.load_report(older)
+
+        def dates(rows):
+            return sorted(row['accepted_date'] for row in rows if row['cik'] == '0001166559')
+
+        self.assertEqual(['2016-11-15'], dates(self.store.holders('018581108')))
+        self.assertEqual(['2016-08-15', '2016-11-15'],
+                         dates(self.store.holders('018581108', latest=False)))
+
+    def test_reloading_a_filing_replaces_its_holdings(self):
+        self.store.load_report(_read_13fhr())
+
+        self.assertEqual(13, len(self.store.filer_holdings('1166559')))
+        self.assertEqual((3, 13 + sum(len(series.holdings) for series in _read_nq().series)),
+                         self.store.counts())
+
+    def test_looks_up_filer_holdings(self):
+        rows = self.store.filer_holdings('0000862084', series='S000002853')
+
+        self.assertEqual(500, len(rows))
+        self.assertEqual('2016-11-30', rows[0]['accepted_date'])
+        self.assertEqual([], self.store.filer_holdings('0000862084', accepted_date='2016-08-30'))
+
+    def test_loads_holdings_tables(self):
+        report = _read_13fhr()
+        report.compact_holdings()
+        report.accepted_date = datetime.date(2017, 2, 14)
+        self.store.load_report(report)
+
+        rows = [row for row in self.store.holders('MICROSOFT CORP') if row['cusip']]
+        self.assertEqual([('2017-02-14', '594918104', 38624678)],
+                         [(row['accepted_date'], row['cusip'], row['shares']) for row in rows])
+
+    def test_queries_from_the_command_line(self):
+        self.store.close()
+        path = os.path.join(self.directory, 'holdings.db')
+
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as output:
+            self.assertEqual(0, store.main(['--db', path, 'holders', '594918104', '-n', '1']))
+            self.assertEqual(1, store.main(['--db', path, 'holders', 'nobody']))
+            self.assertEqual(0, store.main(['--db', path, 'stats']))
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual('0000862084\tS000002853\tN-Q\t2016-11-30\tMicrosoft Corp.\t'
+                         '\t86454214\t4979763', lines[0])
+        self.assertTrue(lines[1].startswith('3 filings'))
+
+
+class TestMainLoadsStore(MockEdgarTestCase):
+
+    def test_generated_reports_are_loaded(self):
+        holdings_store = store.HoldingsStore(os.path.join(self.directory, 'holdings.db'))
+        self.addCleanup(holdings_store.close)
+        store.use_store(holdings_store)
+        self.addCleanup(store.use_store, None)
+
+        with mock.patch.object(discovery, 'backend', discovery.get_backend('json')):
+            main.generate_report('0001418814', main.FORMS)
+            main.generate_report('0000862084', main.FORMS)
+
+        self.assertEqual(3, holdings_store.counts()[0])
+        self.assertEqual(13, len(holdings_store.filer_holdings('0001418814')))
+        self.assertEqual({'S000002853', 'S000002855'},
+                         {row['series'] for row in holdings_store.filer_holdings('0000862084')})
+
+    def test_tickers_are_stored_under_their_cik(self):
+        holdings_store = store.HoldingsStore(os.path.join(self.directory, 'holdings.db'))
+        self.addCleanup(holdings_store.close)
+        store.use_store(holdings_store)
+        self.addCleanup(store.use_store, None)
+        self.edgar.tickers['GATES'] = '0001418814'
+
+        with mock.patch.object(discovery, 'backend', discovery.get_backend('html')):
+            self.assertEqual(['0001418814_2016_11_15.txt'],
+                             main.generate_report('gates', main.FORMS))
+
+        self.assertEqual({'0001418814'},
+                         {row['cik'] for row in holdings_store.holders('594918104')})
@@ -0,0 +1,89 @@
+import os
+import mmap
+import unittest
+
+from holdings.dto import reportnq
+from holdings.dto import submission
+from holdings.dto import report13fhr
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'resources')
+
+class TestIndexSubmission(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(RESOURCES, 'vanguard_complete_text_submission.txt'), 'rb') as text:
+            self.buffer = text.read()
+
+    def test_reads_header_fields(self):
+        filing = submission.index_submission(self.buffer)
+
+        self.assertEqual('N-Q', filing.submission_type)
+        self.assertEqual('0000932471-16-014756', filing.accession_number)
+        self.assertEqual('2016-11-30', filing.accepted_date.isoformat())
+        self.assertEqual('0000862084', filing.fields['CENTRAL INDEX KEY'])
+
+    def test_indexes_each_document(self):
+        filing = submission.index_submission(self.buffer)
+
+        self.assertEqual(['N-Q', 'EX-99.CERT'],
+                         [doc.doc_type for doc in filing.documents])
+        self.assertEqual('institutionalindex_certs.htm', filing.documents[1].filename)
+
+        body = filing.body(filing.documents[0])
+        self.assertTrue(bytes(body).lstrip().startswith(b'<HTML>'))
+        self.assertTrue(bytes(body).rstrip().endswith(b'</HTML>'))
+        self.assertIs(filing.document('EX-99.CERT'), filing.documents[1])
+        self.assertIsNone(filing.document('INFORMATION TABLE'))
+
+    def test_indexes_memory_mapped_files(self):
+        path = os.path.join(RESOURCES, 'gates_fund_complete_text_submission.txt')
+        with open(path, 'rb') as text:
+            with mmap.mmap(text.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                filing = submission.index_submission(buffer)
+                doc    = filing.document('INFORMATION TABLE')
+                body   = buffer[doc.start:doc.end]
+
+        self.assertEqual('13F-HR', filing.submission_type)
+        self.assertEqual('vac13f111516.xml', doc.filename)
+        self.assertTrue(body.startswith(b'<XML>'))
+
+    def test_returns_header_only_for_text_without_documents(self):
+        filing = submission.index_submission(b'<SEC-HEADER>\nACCESSION NUMBER:\t1\n')
+        self.assertEqual('1', filing.accession_number)
+        self.assertEqual([], filing.documents)
+
+
+class TestParseSubmissions(unittest.TestCase):
+
+    def test_parses_13f_information_table_document(self):
+        path = os.path.join(RESOURCES, 'gates_fund_complete_text_submission.txt')
+        with open(path, 'rb') as text:
+            buffer = text.read()
+
+        accepted_date, submission_type, holdings_xml = report13fhr.get_13f_xml(buffer.decode('utf-8'))
+        expected = report13fhr.get_13f_holdings('0001166559', accepted_date,
+                                                submission_type, holdings_xml)
+        result   = report13fhr.parse_13f_submission('0001166559', buffer)
+
+        self.assertEqual(expected.accepted_date, result.accepted_date)
+        self.assertEqual([str(h) for h in expected.holdings],
+                         [str(h) for h in result.holdings])
+
+    def test_parses_nq_primary_document(self):
+        path = os.path.join(RESOURCES, 'vanguard_complete_text_submission.txt')
+        with open(path, 'rb') as text:
+            buffer = text.read()
+
+        expected = reportnq.get_nq_report(buffer.decode('utf-8'))
+        result   = reportnq.parse_nq_submission(buffer)
+
+        self.assertEqual(expected.cik, result.cik)
+        self.assertEqual([s.ID for s in expected.series], [s.ID for s in result.series])
+        self.assertEqual(2, len(result.series[1].contracts))
+        self.assertEqual([str(h) for h in expected.series[0].holdings],
+                         [str(h) for h in result.series[0].holdings])
+
+
+if __name__ == '__main__':
+    unittest.main()
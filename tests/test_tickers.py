@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from holdings import web
+from holdings import tickers
+
+from holdings.dto import reportnq
+
+COMPANY_TICKERS = {'0': {'cik_str': 1166559, 'ticker': 'GATES', 'title': 'Gates Foundation Trust'}}
+MUTUAL_FUND_TICKERS = {'fields': ['cik', 'seriesId', 'classId', 'symbol'],
+                       'data': [[862084, 'S000002853', 'C000007826', 'VIIIX']]}
+
+class TestTickerIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = tickers.build_index(COMPANY_TICKERS, MUTUAL_FUND_TICKERS)
+
+    def test_looks_up_tickers_from_bulk_files(self):
+        entry = self.index.lookup('viiix')
+        self.assertEqual('0000862084', entry.cik)
+        self.assertEqual('S000002853', entry.series_id)
+        self.assertEqual('C000007826', entry.class_id)
+
+        self.assertEqual('0001166559', self.index.lookup('GATES').cik)
+        self.assertIsNone(self.index.lookup('whatever'))
+
+    def test_learns_tickers_from_parsed_series(self):
+        series = reportnq.parse_series_and_contracts(
+            ['<SERIES>', '<OWNER-CIK>0000862084', '<SERIES-ID>S000002855',
+             '<SERIES-NAME>Vanguard Institutional Total Stock Market Index Fund',
+             '<CLASS-CONTRACT>', '<CLASS-CONTRACT-ID>C000007828',
+             '<CLASS-CONTRACT-NAME>Institutional Shares',
+             '<CLASS-CONTRACT-TICKER-SYMBOL>VITNX', '</CLASS-CONTRACT>', '</SERIES>'])
+        self.index.add_series([series])
+
+        self.assertEqual('S000002855', self.index.lookup('VITNX').series_id)
+        self.assertEqual(['S000002853', 'S000002855'], self.index.series_for('862084'))
+
+    def test_saves_and_loads(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'index', 'tickers.json')
+
+        self.index.save(path)
+        loaded = tickers.TickerIndex.load(path)
+
+        self.assertTrue(loaded.complete)
+        self.assertEqual(2, len(loaded))
+        self.assertEqual('C000007826', loaded.lookup('VIIIX').class_id)
+
+
+class TestResolveCik(unittest.TestCase):
+
+    def setUp(self):
+        web.use_ticker_index(tickers.build_index(COMPANY_TICKERS, MUTUAL_FUND_TICKERS))
+        self.addCleanup(web.use_ticker_index, None)
+
+    def test_resolves_known_tickers(self):
+        self.assertEqual('0000862084', web.resolve_cik('viiix'))
+        self.assertEqual('0000862084', web.resolve_cik('0000862084'))
+
+    def test_reports_missing_tickers_without_searching(self):
+        with mock.patch.object(web, 'get') as get:
+            self.assertRaises(web.TickerNotFoundException,
+                              web.get_archive_links, 'whatever', 'N-Q')
+        get.assert_not_called()
+
+    def test_searches_tickers_missing_from_partial_index(self):
+        web.use_ticker_index(tickers.TickerIndex())
+        self.assertEqual('whatever', web.resolve_cik('whatever'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from holdings import web
+from holdings import main
+from holdings import watch
+from holdings import discovery
+from holdings import mock_edgar
+
+from tests.helpers import MockEdgarTestCase
+
+def _new_filing():
+    """The Gates fund's 13F-HR again under a new accession number, accepted now"""
+    with open(os.path.join(mock_edgar.RESOURCES, 'gates_fund_complete_text_submission.txt'),
+              'rb') as fixture:
+        text = fixture.read()
+    accepted = time.strftime('%Y%m%d%H%M%S').encode('ascii')
+    return (text.replace(b'0001418812-16-000209', b'0001418812-26-000001')
+                .replace(b'<ACCEPTANCE-DATETIME>20161115111926',
+                         b'<ACCEPTANCE-DATETIME>' + accepted))
+
+class TestWatch(MockEdgarTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(discovery, 'backend', discovery.get_backend('json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_polls_only_new_filings(self):
+        state   = watch.WatchState()
+        summary = watch.poll(self.ciks, state=state)
+
+        self.assertEqual(2, summary.checked)
+        self.assertEqual(['0001418814_2016_11_15.txt'], summary.updated[0].reportnames)
+        self.assertEqual('0000862084', state.cik('0000862084'))
+
+        # Nothing new: one page of the feed per form type and no other request
+        requests = self.edgar.stats['requests']
+        summary  = watch.poll(self.ciks, state=state)
+        self.assertEqual((0, []), (summary.checked, summary.results))
+        self.assertEqual(requests + 2, self.edgar.stats['requests'])
+
+        self.edgar.add_submission(_new_filing())
+        summary = watch.poll(self.ciks, state=state)
+        self.assertEqual(1, summary.checked)
+        self.assertEqual(['0001418814'], [result.cik for result in summary.updated])
+        self.assertEqual('0001418812-26-000001', state.filers['0001418814']['accessions'][0])
+
+    def test_saves_and_loads_its_state(self):
+        path  = os.path.join(self.directory, 'reports', 'watch_state.json')
+        state = watch.WatchState()
+        watch.poll(self.ciks, state=state)
+        state.save(path)
+
+        loaded = watch.WatchState.load(path)
+        self.assertEqual(state.polled, loaded.polled)
+        self.assertEqual({'0001418812-16-000209'}, loaded.seen('0001418814'))
+        self.assertEqual(None, watch.WatchState.load(path + '.missing').polled)
+
+    def test_checks_every_cik_when_the_feed_falls_short(self):
+        state = watch.WatchState()
+        watch.poll(self.ciks, state=state)
+
+        # The feed ends in 2016, well after a last poll in 2000
+        state.polled = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        self.assertEqual(None, watch.read_feed(main.FORMS, state.polled))
+        self.assertEqual(2, watch.poll(self.ciks, state=state).checked)
+
+    def test_revalidates_cached_listings(self):
+        web.enable_cache(os.path.join(self.directory, 'cache'))
+        state = watch.WatchState()
+        watch.poll(self.ciks, state=state)
+
+        # Checked on its own listing, which is cached well within its ttl
+        self.edgar.add_submission(_new_filing())
+        state.polled = None
+        summary = watch.poll(self.ciks, state=state)
+
+        self.assertEqual(['0001418814'], [result.cik for result in summary.updated])
+        self.assertEqual('0001418812-26-000001', state.filers['0001418814']['accessions'][0])
+
+    def test_retries_failed_ciks_on_their_listing(self):
+        state = watch.WatchState()
+        with mock.patch.object(main, 'generate_recorded_report', side_effect=ValueError('boom')):
+            summary = watch.poll(self.ciks, state=state)
+        self.assertEqual(['0001418814', '0000862084'], [result.cik for result in summary.failed])
+        self.assertTrue(state.stale('0001418814'))
+
+        summary = watch.poll(self.ciks, state=state)
+        self.assertEqual((2, 2, []), (summary.checked, len(summary.updated), summary.failed))
+        self.assertFalse(state.stale('0001418814'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import io
+import os
+import csv
+import shutil
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+
+from holdings import writers
+
+from holdings.dto import base
+from holdings.dto import reportnq
+from holdings.dto import report13fhr
+
+class TestWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.holdings = [base.Holding('* Amazon.com Inc.', 4365551, 3655319),
+                         base.Holding('Société Générale', 26655358, 1768316),
+                         base.Holding('', 0, 0)]
+
+    def test_writes_tsv_like_dict_writer(self):
+        path = os.path.join(self.directory, 'report.txt')
+        writers.TSVWriter().write(path, self.holdings)
+
+        with open(path, 'r') as report:
+            rows = list(csv.DictReader(report, delimiter='\t'))
+
+        self.assertEqual({'entity': '* Amazon.com Inc.', 'shares': '4365551',
+                          'value': '3655319'}, rows[0])
+        self.assertEqual(3, len(rows))
+
+    def test_formats_rows_in_bulk_as_csv_writer_would(self):
+        holdings = self.holdings + [base.Holding('Tab\tand "quoted" Inc.', 1, 2),
+                                    base.Holding('Line\nbreak Corp.', 3, 4)]
+        path     = os.path.join(self.directory, 'report.txt')
+
+        for rows in (holdings, base.HoldingsTable.from_holdings(holdings)):
+            expected = io.StringIO()
+            writer   = csv.writer(expected, delimiter='\t')
+            writer.writerow(writers.FIELDS)
+            writer.writerows((holding.entity, holding.shares, holding.value)
+                             for holding in rows)
+
+            with mock.patch.object(writers, 'BUFFER_ROWS', 2):
+                writers.TSVWriter().write(path, rows)
+            with open(path, 'r', newline='') as report:
+                self.assertEqual(expected.getvalue(), report.read())
+
+    def test_writes_the_same_tsv_after_compaction(self):
+        holdings = self.holdings + [base.Holding('Plain Inc.', 5000000, 1200),
+                                    base.Holding('Short Corp.', -1500, -12)]
+        report   = report13fhr.Report13FHR('0001418814', datetime.date(2016, 11, 15),
+                                           '13F-HR', holdings)
+
+        def tsv():
+            path = os.path.join(self.directory, 'report.txt')
+            writers.TSVWriter().write(path, report.holdings)
+            with open(path, 'r', newline='') as written:
+                return written.read()
+
+        before = tsv()
+        report.compact_holdings()
+
+        self.assertIsInstance(report.holdings, report13fhr.Holdings13FTable)
+        self.assertEqual(before, tsv())
+        self.assertIn('* Amazon.com Inc.\t4365551\t3655319\r\n', before)
+        self.assertIn('Short Corp.\t-1500\t-12\r\n', before)
+
+        report.holdings = base.HoldingsTable.from_holdings(report.holdings)
+        self.assertEqual(before, tsv())
+
+    def test_round_trips_columnar_report(self):
+        path = os.path.join(self.directory, 'report.hld')
+        writers.ColumnarWriter().write(path, self.holdings)
+
+        with writers.ColumnarReport(path) as report:
+            self.assertEqual(3, len(report))
+            self.assertEqual([4365551, 26655358, 0], list(report.shares))
+            self.assertEqual([3655319, 1768316, 0], list(report.values))
+            self.assertEqual('Société Générale', report.entity(1))
+            self.assertEqual('', report.entity(2))
+            self.assertEqual(['* Amazon.com Inc.\t4365551\t3655319',
+                              'Société Générale\t26655358\t1768316',
+                              '\t0\t0'],
+                             [str(holding) for holding in report])
+
+            table = report.to_table()
+        self.assertEqual(list(table.values), [3655319, 1768316, 0])
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.directory, 'report.txt')
+        writers.TSVWriter().write(path, self.holdings)
+        self.assertRaises(ValueError, writers.ColumnarReport, path)
+
+    def test_raises_exception_for_unknown_format(self):
+        self.assertRaises(ValueError, writers.get_writer, 'xlsx')
+
+    @unittest.skipIf(writers.pyarrow is None, 'pyarrow is not installed')
+    def test_round_trips_parquet_report(self):
+        path = os.path.join(self.directory, 'report.parquet')
+        writers.ParquetWriter().write(path, self.holdings)
+
+        table = writers.read_parquet(path)
+        self.assertEqual([4365551, 26655358, 0], table.column('shares').to_pylist())
+
+    def test_report_uses_format_extension(self):
+        cwd = os.getcwd()
+        os.makedirs(os.path.join(self.directory, 'reports'))
+        os.chdir(self.directory)
+        self.addCleanup(os.chdir, cwd)
+
+        report = report13fhr.Report13FHR('0001166559', datetime.date(2016, 11, 14),
+                                         '13F-HR', self.holdings)
+
+        self.assertEqual(['0001166559_2016_11_14.hld'], report.generate_report('columnar'))
+        self.assertEqual(['0001166559_2016_11_14.txt'], report.generate_report())
+        self.assertTrue(os.path.exists('reports/0001166559_2016_11_14.hld'))
+
+
+class TestReportOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        writers.use_output_dir(os.path.join(self.directory, 'out'))
+        self.addCleanup(setattr, writers, 'output_dir', writers.REPORTS_DIR)
+        self.holdings = [base.Holding('Apple Inc.', 1000, 100)]
+
+    def test_leaves_no_partial_report_behind(self):
+        writers.write_report(writers.TSVWriter(), 'report.txt', self.holdings)
+
+        broken = self.holdings + [None]
+        self.assertRaises(AttributeError, writers.write_report,
+                          writers.TSVWriter(), 'report.txt', broken)
+        self.assertRaises(AttributeError, writers.write_report,
+                          writers.TSVWriter(), 'other.txt', broken)
+
+        # The earlier report survives whole and no temporary file is left
+        self.assertEqual(['report.txt'], os.listdir(writers.output_dir))
+        with open(writers.report_path('report.txt'), 'r') as report:
+            self.assertEqual(2, len(report.readlines()))
+
+    def test_writes_each_series_report(self):
+        shared = base.HoldingsTable.from_holdings(self.holdings)
+        report = reportnq.ReportNQ('0000862084', datetime.date(2016, 11, 30), 'N-Q', [
+            reportnq.FundSeries('S000002853', '0000862084', 'One', holdings=shared),
+            reportnq.FundSeries('S000002854', '0000862084', 'Two', holdings=shared),
+            reportnq.FundSeries('S000002855', '0000862084', 'Three',
+                                holdings=self.holdings * 2)])
+
+        names = report.generate_report()
+
+        self.assertEqual(['0000862084_S000002853_2016_11_30.txt',
+                          '0000862084_S000002854_2016_11_30.txt',
+                          '0000862084_S000002855_2016_11_30.txt'], names)
+        self.assertEqual(sorted(names), sorted(os.listdir(writers.output_dir)))
+        with open(writers.report_path(names[1]), 'r') as report:
+            self.assertEqual('Apple Inc.\t1000\t100\n', report.readlines()[1])
+        with open(writers.report_path(names[2]), 'r') as report:
+            self.assertEqual(3, len(report.readlines()))
+
+
+if __name__ == '__main__':
+    unittest.main()